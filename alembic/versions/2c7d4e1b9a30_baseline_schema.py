@@ -0,0 +1,564 @@
+"""Baseline schema
+
+Creates every table of ``apps.core.models`` with its keys, constraints and
+column indexes. The indexes of the list endpoints are built concurrently by
+the next revision, f58d67e9cc2d. A database whose tables already exist only
+needs to be stamped, ``alembic stamp 2c7d4e1b9a30``, before
+``alembic upgrade heads``.
+
+Revision ID: 2c7d4e1b9a30
+Revises:
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "2c7d4e1b9a30"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ENUMS = [
+    "roleenum",
+    "genderenum",
+    "appointmentstatusenum",
+    "transactionmethodenum",
+    "emailstatusenum",
+    "notificationstatusenum",
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "organizations",
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        sa.Column("zipcode", sa.String(), nullable=True),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_index(op.f("ix_organizations_id"), "organizations", ["id"], unique=False)
+    op.create_table(
+        "otp_storage",
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("otp", sa.String(), nullable=True),
+        sa.Column("expiration_time", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("email"),
+    )
+    op.create_index(
+        op.f("ix_otp_storage_expiration_time"),
+        "otp_storage",
+        ["expiration_time"],
+        unique=False,
+    )
+    op.create_index(op.f("ix_otp_storage_otp"), "otp_storage", ["otp"], unique=False)
+    op.create_table(
+        "roles",
+        sa.Column("name", sa.String(length=255), nullable=True),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_roles_id"), "roles", ["id"], unique=False)
+    op.create_table(
+        "schools",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=False),
+        sa.Column("address", sa.String(), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        sa.Column("zipcode", sa.String(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=False),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_index(op.f("ix_schools_id"), "schools", ["id"], unique=False)
+    op.create_table(
+        "token_revocations",
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("revoked_at", sa.Integer(), nullable=False),
+        sa.Column("expiration_time", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index(
+        op.f("ix_token_revocations_expiration_time"),
+        "token_revocations",
+        ["expiration_time"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_token_revocations_revoked_at"),
+        "token_revocations",
+        ["revoked_at"],
+        unique=False,
+    )
+    op.create_table(
+        "users",
+        sa.Column("first_name", sa.String(length=50), nullable=False),
+        sa.Column("middle_name", sa.String(length=50), nullable=True),
+        sa.Column("last_name", sa.String(length=50), nullable=True),
+        sa.Column("email", sa.String(length=255), nullable=True),
+        sa.Column("password", sa.String(length=255), nullable=True),
+        sa.Column("initial_password", sa.String(length=255), nullable=True),
+        sa.Column("is_verified", sa.Boolean(), nullable=True),
+        sa.Column("instructor_id", sa.Integer(), nullable=True),
+        sa.Column(
+            "role",
+            sa.Enum(
+                "SUPER_ADMIN", "ADMIN", "CSR", "INSTRUCTOR", "STUDENT", name="roleenum"
+            ),
+            nullable=False,
+        ),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["instructor_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+    )
+    op.create_index(op.f("ix_users_id"), "users", ["id"], unique=False)
+    op.create_table(
+        "instructor_availability",
+        sa.Column("instructor_id", sa.Integer(), nullable=True),
+        sa.Column("availability_date", sa.Date(), nullable=True),
+        sa.Column("start_time", sa.Time(), nullable=True),
+        sa.Column("end_time", sa.Time(), nullable=True),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["instructor_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_instructor_availability_id"),
+        "instructor_availability",
+        ["id"],
+        unique=False,
+    )
+    op.create_table(
+        "instructor_organizations",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("instructor_id", sa.BigInteger(), nullable=True),
+        sa.Column("organization_id", sa.BigInteger(), nullable=True),
+        sa.Column("student_id", sa.BigInteger(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["instructor_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["organization_id"],
+            ["organizations.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["student_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_instructor_organizations_id"),
+        "instructor_organizations",
+        ["id"],
+        unique=False,
+    )
+    op.create_table(
+        "notifications",
+        sa.Column("subject", sa.String(length=255), nullable=False),
+        sa.Column("template_name", sa.String(length=255), nullable=False),
+        sa.Column("body", sa.JSON(), nullable=False),
+        sa.Column("filters", sa.JSON(), nullable=False),
+        sa.Column("created_by", sa.BigInteger(), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum("EXPANDING", "ENQUEUED", name="notificationstatusenum"),
+            nullable=False,
+        ),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("enqueued", sa.Integer(), nullable=False),
+        sa.Column("last_user_id", sa.BigInteger(), nullable=False),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["created_by"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_notifications_id"), "notifications", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_notifications_status"), "notifications", ["status"], unique=False
+    )
+    op.create_table(
+        "student_appointment",
+        sa.Column("instructor_id", sa.Integer(), nullable=True),
+        sa.Column("student_id", sa.Integer(), nullable=True),
+        sa.Column("appointment_date", sa.Date(), nullable=True),
+        sa.Column("start_time", sa.Time(), nullable=True),
+        sa.Column("end_time", sa.Time(), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum(
+                "COMPLETED",
+                "CONFIRMED",
+                "CANCELLED",
+                "PENDING",
+                "UPCOMING",
+                "ON_GOING",
+                name="appointmentstatusenum",
+            ),
+            nullable=False,
+        ),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["instructor_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["student_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_student_appointment_id"), "student_appointment", ["id"], unique=False
+    )
+    op.create_table(
+        "transactions",
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("discount", sa.Float(), nullable=True),
+        sa.Column(
+            "method",
+            sa.Enum(
+                "CASH",
+                "CREDIT_CARD",
+                "DEBIT_CARD",
+                "DIGITAL",
+                name="transactionmethodenum",
+            ),
+            nullable=True,
+        ),
+        sa.Column("location", sa.String(), nullable=True),
+        sa.Column("date_charged", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("refund", sa.Boolean(), nullable=True),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_transactions_id"), "transactions", ["id"], unique=False)
+    op.create_table(
+        "user_permit_informations",
+        sa.Column("permit_number", sa.String(length=255), nullable=True),
+        sa.Column("permit_issue_date", sa.DateTime(), nullable=True),
+        sa.Column("permit_expiration_date", sa.DateTime(), nullable=True),
+        sa.Column("permit_endorse_date", sa.DateTime(), nullable=True),
+        sa.Column("permit_endorse_by_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("created_by_id", sa.Integer(), nullable=True),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["created_by_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["permit_endorse_by_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_user_permit_informations_id"),
+        "user_permit_informations",
+        ["id"],
+        unique=False,
+    )
+    op.create_table(
+        "user_profiles",
+        sa.Column("address", sa.String(), nullable=True),
+        sa.Column("office_note", sa.String(), nullable=True),
+        sa.Column("apartment", sa.String(), nullable=True),
+        sa.Column("city", sa.String(), nullable=True),
+        sa.Column("state", sa.String(), nullable=True),
+        sa.Column("zip_code", sa.Integer(), nullable=True),
+        sa.Column("dob", sa.Date(), nullable=True),
+        sa.Column(
+            "gender",
+            sa.Enum("MALE", "FEMALE", "OTHER", name="genderenum"),
+            nullable=True,
+        ),
+        sa.Column("cell_phone", sa.BigInteger(), nullable=True),
+        sa.Column("certificate_received", sa.Boolean(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_user_profiles_id"), "user_profiles", ["id"], unique=False)
+    op.create_table(
+        "user_schools",
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("school_id", sa.BigInteger(), nullable=False),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["school_id"],
+            ["schools.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "school_id", "id"),
+    )
+    op.create_index(op.f("ix_user_schools_id"), "user_schools", ["id"], unique=False)
+    op.create_table(
+        "email_outbox",
+        sa.Column("subject", sa.String(length=255), nullable=False),
+        sa.Column("recipients", sa.JSON(), nullable=False),
+        sa.Column("template_name", sa.String(length=255), nullable=False),
+        sa.Column("body", sa.JSON(none_as_null=True), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "SENT", "FAILED", name="emailstatusenum"),
+            nullable=False,
+        ),
+        sa.Column("priority", sa.Integer(), nullable=False),
+        sa.Column("notification_id", sa.BigInteger(), nullable=True),
+        sa.Column("dedupe_key", sa.String(length=255), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["notification_id"],
+            ["notifications.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_email_outbox_dedupe_key"), "email_outbox", ["dedupe_key"], unique=False
+    )
+    op.create_index(op.f("ix_email_outbox_id"), "email_outbox", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_email_outbox_next_attempt_at"),
+        "email_outbox",
+        ["next_attempt_at"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_email_outbox_notification_id"),
+        "email_outbox",
+        ["notification_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_email_outbox_status"), "email_outbox", ["status"], unique=False
+    )
+    op.create_table(
+        "pickup_locations",
+        sa.Column("name", sa.String(length=255), nullable=True),
+        sa.Column("address", sa.String(length=255), nullable=True),
+        sa.Column("apartment", sa.String(length=255), nullable=True),
+        sa.Column("city", sa.String(length=255), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("created_by_id", sa.Integer(), nullable=True),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["created_by_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user_profiles.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_pickup_locations_id"), "pickup_locations", ["id"], unique=False
+    )
+    op.create_table(
+        "refunds",
+        sa.Column("transaction_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("refund_amount", sa.Float(), nullable=False),
+        sa.Column("refund_date", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("reason", sa.String(), nullable=False),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["transaction_id"],
+            ["transactions.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_refunds_id"), "refunds", ["id"], unique=False)
+    op.create_table(
+        "user_contact_informations",
+        sa.Column("contact_name", sa.String(length=255), nullable=True),
+        sa.Column("contact_relationship", sa.String(length=255), nullable=True),
+        sa.Column("contact_phone", sa.Integer(), nullable=True),
+        sa.Column("contact_email", sa.String(), nullable=True),
+        sa.Column("contact_type", sa.String(length=255), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("created_by_id", sa.Integer(), nullable=True),
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["created_by_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user_profiles.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_user_contact_informations_id"),
+        "user_contact_informations",
+        ["id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_user_contact_informations_id"), table_name="user_contact_informations"
+    )
+    op.drop_table("user_contact_informations")
+    op.drop_index(op.f("ix_refunds_id"), table_name="refunds")
+    op.drop_table("refunds")
+    op.drop_index(op.f("ix_pickup_locations_id"), table_name="pickup_locations")
+    op.drop_table("pickup_locations")
+    op.drop_index(op.f("ix_email_outbox_status"), table_name="email_outbox")
+    op.drop_index(op.f("ix_email_outbox_notification_id"), table_name="email_outbox")
+    op.drop_index(op.f("ix_email_outbox_next_attempt_at"), table_name="email_outbox")
+    op.drop_index(op.f("ix_email_outbox_id"), table_name="email_outbox")
+    op.drop_index(op.f("ix_email_outbox_dedupe_key"), table_name="email_outbox")
+    op.drop_table("email_outbox")
+    op.drop_index(op.f("ix_user_schools_id"), table_name="user_schools")
+    op.drop_table("user_schools")
+    op.drop_index(op.f("ix_user_profiles_id"), table_name="user_profiles")
+    op.drop_table("user_profiles")
+    op.drop_index(
+        op.f("ix_user_permit_informations_id"), table_name="user_permit_informations"
+    )
+    op.drop_table("user_permit_informations")
+    op.drop_index(op.f("ix_transactions_id"), table_name="transactions")
+    op.drop_table("transactions")
+    op.drop_index(op.f("ix_student_appointment_id"), table_name="student_appointment")
+    op.drop_table("student_appointment")
+    op.drop_index(op.f("ix_notifications_status"), table_name="notifications")
+    op.drop_index(op.f("ix_notifications_id"), table_name="notifications")
+    op.drop_table("notifications")
+    op.drop_index(
+        op.f("ix_instructor_organizations_id"), table_name="instructor_organizations"
+    )
+    op.drop_table("instructor_organizations")
+    op.drop_index(
+        op.f("ix_instructor_availability_id"), table_name="instructor_availability"
+    )
+    op.drop_table("instructor_availability")
+    op.drop_index(op.f("ix_users_id"), table_name="users")
+    op.drop_table("users")
+    op.drop_index(
+        op.f("ix_token_revocations_revoked_at"), table_name="token_revocations"
+    )
+    op.drop_index(
+        op.f("ix_token_revocations_expiration_time"), table_name="token_revocations"
+    )
+    op.drop_table("token_revocations")
+    op.drop_index(op.f("ix_schools_id"), table_name="schools")
+    op.drop_table("schools")
+    op.drop_index(op.f("ix_roles_id"), table_name="roles")
+    op.drop_table("roles")
+    op.drop_index(op.f("ix_otp_storage_otp"), table_name="otp_storage")
+    op.drop_index(op.f("ix_otp_storage_expiration_time"), table_name="otp_storage")
+    op.drop_table("otp_storage")
+    op.drop_index(op.f("ix_organizations_id"), table_name="organizations")
+    op.drop_table("organizations")
+    # PostgreSQL keeps the enum types of dropped tables
+    for name in ENUMS:
+        sa.Enum(name=name).drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,168 @@
+"""Indexes for the filters, sorts and foreign keys of the list endpoints
+
+Every index is built with CREATE INDEX CONCURRENTLY, outside of a transaction,
+so the tables stay writable while it runs. A build that fails leaves an
+INVALID index behind: drop it and run the upgrade again. Compare the plans
+before and after with ``python -m benchmarks.list_plans``.
+
+Revision ID: f58d67e9cc2d
+Revises: 2c7d4e1b9a30
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f58d67e9cc2d"
+down_revision: Union[str, None] = "2c7d4e1b9a30"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# name, table, columns, create_index keyword arguments
+INDEXES = [
+    # GET /api/user/get: sort options followed by the id tie-breaker
+    ("ix_users_updated_at_id", "users", ["updated_at", "id"], {}),
+    ("ix_users_created_at_id", "users", ["created_at", "id"], {}),
+    ("ix_users_first_name_id", "users", ["first_name", "id"], {}),
+    ("ix_users_role_updated_at_id", "users", ["role", "updated_at", "id"], {}),
+    # Prefix filters, lower(column) LIKE 'value%'
+    (
+        "ix_users_first_name_prefix",
+        "users",
+        [sa.text("lower(first_name) text_pattern_ops")],
+        {},
+    ),
+    (
+        "ix_user_profiles_city_prefix",
+        "user_profiles",
+        [sa.text("lower(city) text_pattern_ops")],
+        {},
+    ),
+    (
+        "ix_user_profiles_state_prefix",
+        "user_profiles",
+        [sa.text("lower(state) text_pattern_ops")],
+        {},
+    ),
+    ("ix_user_profiles_zip_code", "user_profiles", ["zip_code"], {}),
+    # Joins and foreign keys
+    ("ix_users_instructor_id", "users", ["instructor_id"], {}),
+    ("ix_user_profiles_user_id", "user_profiles", ["user_id"], {}),
+    ("ix_user_schools_user_id", "user_schools", ["user_id"], {}),
+    ("ix_user_schools_school_id", "user_schools", ["school_id"], {}),
+    (
+        "ix_user_contact_informations_user_id",
+        "user_contact_informations",
+        ["user_id"],
+        {},
+    ),
+    ("ix_pickup_locations_user_id", "pickup_locations", ["user_id"], {}),
+    # GET /api/appointment/get
+    (
+        "ix_student_appointment_status_date_id",
+        "student_appointment",
+        ["status", "appointment_date", "id"],
+        {},
+    ),
+    (
+        "ix_student_appointment_student_date_id",
+        "student_appointment",
+        ["student_id", "appointment_date", "id"],
+        {},
+    ),
+    (
+        "ix_student_appointment_instructor_date_id",
+        "student_appointment",
+        ["instructor_id", "appointment_date", "id"],
+        {},
+    ),
+    # GET /api/instructor-availability/filter/get
+    (
+        "ix_instructor_availability_updated_at_id",
+        "instructor_availability",
+        ["updated_at", "id"],
+        {},
+    ),
+    (
+        "ix_instructor_availability_date_id",
+        "instructor_availability",
+        ["availability_date", "id"],
+        {},
+    ),
+    (
+        "ix_instructor_availability_instructor_date_id",
+        "instructor_availability",
+        ["instructor_id", "availability_date", "id"],
+        {},
+    ),
+    # GET /api/account/get
+    (
+        "ix_transactions_date_charged_id",
+        "transactions",
+        ["date_charged", "id"],
+        {"postgresql_include": ["method", "is_deleted"]},
+    ),
+    (
+        "ix_transactions_user_date_charged_id",
+        "transactions",
+        ["user_id", "date_charged", "id"],
+        {},
+    ),
+    # GET /api/user/search, must match user_search_document and
+    # profile_search_document
+    (
+        "ix_users_search_trgm",
+        "users",
+        [
+            sa.text(
+                "(first_name || ' ' || coalesce(last_name, '') || ' ' || "
+                "coalesce(email, '')) gist_trgm_ops"
+            )
+        ],
+        {"postgresql_using": "gist"},
+    ),
+    (
+        "ix_user_profiles_search_trgm",
+        "user_profiles",
+        [
+            sa.text(
+                "(coalesce(city, '') || ' ' || "
+                "coalesce(CAST(cell_phone AS TEXT), '')) gist_trgm_ops"
+            )
+        ],
+        {"postgresql_using": "gist"},
+    ),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                **options,
+            )
+        op.execute(
+            "ANALYZE users, user_profiles, user_schools, student_appointment, "
+            "instructor_availability, transactions"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, if_exists=True, postgresql_concurrently=True
+            )
@@ -1,24 +1,33 @@
+from typing import List, Optional
+
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
     status,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from apps.config.db.conn import get_db
+from apps.common.enum import ExportFormatEnum, TransactionMethodEnum
+from apps.config.db.conn import get_async_session, get_read_session
 from apps.core.models.transaction import Transaction
 from apps.core.schemas.transaction import (
     TransactionCreate,
     TransactionCreateResponse,
     TransactionFilterSchema,
+    TransactionResponseSchema,
     TransactionResponseSchemaTotal,
     TransactionUpdate,
 )
 from apps.core.models.users import Users
 from apps.rbac.role_permission_decorator import check_role_permissions
 from apps.security.auth import jwt_service
+from apps.utils.database_utils import fetch_one, load_fields, paginate, statement_cache
+from apps.utils.export import export_response
+from apps.utils.sparse_fields import parse_fields, sparse_response
 
 from apps.apis.v1.users.filter_sort import Filter, Sort
 
@@ -26,67 +35,158 @@ from apps.apis.v1.users.filter_sort import Filter, Sort
 router = APIRouter(prefix="/account", tags=["account"])
 
 
+def transactions_query(
+    transactions_filter_params: TransactionFilterSchema,
+    method: List[TransactionMethodEnum],
+    transaction_fields: Optional[tuple[str, ...]],
+) -> tuple[Select, dict]:
+    """Filtered and sorted transactions statement of the list and the export
+
+    Returns:
+        tuple[Select, dict]: statement without a limit, its parameters
+    """
+    filter_params = {
+        "amount": transactions_filter_params.amount,
+        "discount": transactions_filter_params.discount,
+        "method": method,
+        "location": transactions_filter_params.location,
+        "transaction_id": transactions_filter_params.transaction_id,
+        "user_id": transactions_filter_params.user_id,
+        "is_deleted": transactions_filter_params.is_deleted,
+        "date_charged": transactions_filter_params.date_charged,
+        "date_charged_from": transactions_filter_params.date_charged_from,
+        "date_charged_to": transactions_filter_params.date_charged_to,
+    }
+
+    params = Filter().transaction_params(**filter_params)
+    sort, order = transactions_filter_params.sort, transactions_filter_params.order
+
+    def build_query():
+        query = select(Transaction)
+        if not transaction_fields or "user" in transaction_fields:
+            query = query.options(
+                joinedload(Transaction.user).load_only(
+                    Users.first_name,
+                    Users.middle_name,
+                    Users.last_name,
+                )
+            )
+        query = Filter().filter_transaction(query, **params)
+        query = Sort().sort_transaction(query=query, sort=sort, order=order)
+        return load_fields(query, Transaction, transaction_fields)
+
+    query = statement_cache.get(
+        ("transactions", tuple(sorted(params)), sort, order, transaction_fields),
+        build_query,
+    )
+    return query, params
+
+
 @router.get("/get", response_model=TransactionResponseSchemaTotal)
 # @check_role_permissions(["ADMIN", "CSR"])
-def get_transactions(
+async def get_transactions(
     offset: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     transactions_filter_params: TransactionFilterSchema = Depends(),
-    db: Session = Depends(get_db),
+    method: List[TransactionMethodEnum] = Query([TransactionMethodEnum.CASH]),
+    db: AsyncSession = Depends(get_read_session),
 ):
     """API to get transactions for ADMIN and CSR
 
     Args:
         offset (int, optional): Defaults to 0.
         limit (int, optional): Defaults to 10.
+        cursor (str, optional): next_cursor of the previous page, replaces
+            offset. Defaults to None.
+        fields (str, optional): Comma separated fields of each transaction to
+            return, eg. id,amount,user. Defaults to None, all fields.
         transactions_filter_params (TransactionFilterSchema, optional):
-            transaction_id, user_id, sort, order. Defaults to Depends().
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+            transaction_id, user_id, date_charged or date_charged_from /
+            date_charged_to, sort, order. Defaults to Depends().
+        method (List[TransactionMethodEnum], optional): repeatable. Defaults
+            to [CASH].
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_read_session).
 
     Returns:
         response: {total: int, transactions: list[TransactionResponseSchema]}
     """
-    query = db.query(Transaction).options(
-        joinedload(Transaction.user).load_only(
-            Users.first_name,
-            Users.middle_name,
-            Users.last_name,
-        )
+    transaction_fields = parse_fields(fields, TransactionResponseSchema)
+    filter_query, params = transactions_query(
+        transactions_filter_params, method, transaction_fields
     )
 
-    filter_params = {
-        "amount": transactions_filter_params.amount,
-        "discount": transactions_filter_params.discount,
-        "method": transactions_filter_params.method,
-        "location": transactions_filter_params.location,
-        "transaction_id": transactions_filter_params.transaction_id,
-        "user_id": transactions_filter_params.user_id,
-        "is_deleted": transactions_filter_params.is_deleted,
-        "date_charged": transactions_filter_params.date_charged,
+    page = await paginate(db, filter_query, offset, limit, params, cursor)
+
+    response = {
+        "total": page.total,
+        "total_exact": page.total_exact,
+        "transactions": page.items,
+        "next_cursor": page.next_cursor,
     }
 
-    filter_query = Filter().filter_transaction(query, **filter_params)
-    filter_query = Sort().sort_transaction(
-        query=filter_query,
-        sort=transactions_filter_params.sort,
-        order=transactions_filter_params.order,
-    )
+    if transaction_fields:
+        return sparse_response(
+            TransactionResponseSchemaTotal,
+            transaction_fields,
+            response,
+            items_key="transactions",
+        )
+    return response
 
-    total = filter_query.with_entities(Transaction.id).count()
-    transactions = filter_query.offset(offset).limit(limit).all()
 
-    return {
-        "total": total,
-        "transactions": transactions,
-    }
+@router.get("/export")
+@check_role_permissions(["ADMIN", "CSR"])
+async def export_transactions(
+    fields: Optional[str] = None,
+    export_format: ExportFormatEnum = Query(ExportFormatEnum.CSV, alias="format"),
+    transactions_filter_params: TransactionFilterSchema = Depends(),
+    method: List[TransactionMethodEnum] = Query([TransactionMethodEnum.CASH]),
+    current_user=Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """API to stream every transaction matching the filters of the list
+
+    Args:
+        fields (str, optional): Comma separated fields of each transaction to
+            export, eg. id,amount,user. Defaults to None, all fields.
+        export_format (ExportFormatEnum, optional): format query param, csv
+            or ndjson. Defaults to csv. The user is flattened to user.id,
+            user.first_name... columns in csv.
+        transactions_filter_params (TransactionFilterSchema, optional): Same
+            filters and sort as the list. Defaults to Depends().
+        method (List[TransactionMethodEnum], optional): repeatable. Defaults
+            to [CASH].
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_read_session).
+
+    Returns:
+        StreamingResponse: transactions.csv or transactions.ndjson attachment
+    """
+    transaction_fields = parse_fields(fields, TransactionResponseSchema)
+    query, params = transactions_query(
+        transactions_filter_params, method, transaction_fields
+    )
+    return export_response(
+        db,
+        query,
+        params,
+        TransactionResponseSchema,
+        transaction_fields,
+        export_format,
+        "transactions",
+    )
 
 
 @router.post("/post", response_model=TransactionCreateResponse)
 # @check_role_permissions("ADMIN", "CSR")
-def create_transaction(
+async def create_transaction(
     transaction_data: TransactionCreate = Depends(),
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to create transaction for ADMIN and CSR
 
@@ -101,7 +201,7 @@ def create_transaction(
         current_user (Any, optional):
                 Used for check_role_permissions decorator DO NOT REMOVE.
             Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, User not found
@@ -110,7 +210,9 @@ def create_transaction(
     Returns:
         db_transaction: TransactionCreateResponse
     """
-    user_id_check = db.query(Users).filter(Users.id == transaction_data.user_id).first()
+    user_id_check = await fetch_one(
+        db, select(Users).filter(Users.id == transaction_data.user_id)
+    )
 
     if not user_id_check:
         raise HTTPException(
@@ -121,9 +223,10 @@ def create_transaction(
         transaction_dict = transaction_data.model_dump()
         db_transaction = Transaction(**transaction_dict)
         db.add(db_transaction)
-        db.commit()
-        db.refresh(db_transaction)
+        await db.commit()
+        await db.refresh(db_transaction)
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -133,10 +236,10 @@ def create_transaction(
 
 @router.put("/update")
 # @check_role_permissions(["ADMIN", "CSR"])
-def update_transaction(
+async def update_transaction(
     transaction_data: TransactionUpdate = Depends(),
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to update transaction for ADMIN and CSR
 
@@ -154,7 +257,7 @@ def update_transaction(
         current_user (Any, optional):
             Used for check_role_permissions decorator DO NOT REMOVE.
             Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, Transaction not found
@@ -165,8 +268,8 @@ def update_transaction(
     Returns:
         message: Transaction updated successfully
     """
-    transaction = (
-        db.query(Transaction).filter(Transaction.id == transaction_data.id).first()
+    transaction = await fetch_one(
+        db, select(Transaction).filter(Transaction.id == transaction_data.id)
     )
 
     if not transaction:
@@ -176,8 +279,8 @@ def update_transaction(
 
     try:
         if transaction_data.user_id:
-            user_id_check = (
-                db.query(Users).filter(Users.id == transaction_data.user_id).first()
+            user_id_check = await fetch_one(
+                db, select(Users).filter(Users.id == transaction_data.user_id)
             )
             if not user_id_check:
                 raise HTTPException(
@@ -201,10 +304,10 @@ def update_transaction(
             setattr(transaction, "location", transaction_data.location)
 
         db.add(transaction)
-        db.commit()
-        db.refresh(transaction)
+        await db.commit()
+        await db.refresh(transaction)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -214,10 +317,10 @@ def update_transaction(
 
 @router.patch("/delete/{transaction_id}")
 # @check_role_permissions(["ADMIN", "CSR"])
-def delete_transaction(
+async def delete_transaction(
     transaction_id: int,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to soft delete transaction by transaction_id for ADMIN and CSR
 
@@ -226,7 +329,7 @@ def delete_transaction(
         current_user (Any, optional):
                 Used for check_role_permissions decorator DO NOT REMOVE.
             Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, Transaction not found
@@ -236,7 +339,9 @@ def delete_transaction(
         message: Transaction deleted successfully
         (not really deleted, just updated is_deleted to True)
     """
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    transaction = await fetch_one(
+        db, select(Transaction).filter(Transaction.id == transaction_id)
+    )
 
     if not transaction:
         raise HTTPException(
@@ -246,10 +351,10 @@ def delete_transaction(
     try:
         setattr(transaction, "is_deleted", True)
         db.add(transaction)
-        db.commit()
+        await db.commit()
         # db.refresh(transaction)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -0,0 +1,169 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.config import settings
+from apps.config.db.base import async_engine, async_replica_engine, engine
+from apps.config.db.conn import get_async_session
+from apps.config.db.pool import collect_pool_metrics
+from apps.config.db.telemetry import query_telemetry
+from apps.rbac.role_permission_decorator import check_role_permissions
+from apps.security.auth import jwt_service
+from apps.security.email_filter import email_filter
+from apps.security.hashing import password_hasher
+from apps.security.rate_limit import login_limiter, otp_limiter
+from apps.security.revocation import revocation_store
+from apps.services.email_outbox import outbox_worker
+from apps.services.send_email import mail_transport
+from apps.utils.database_utils import statement_cache, total_counter
+
+
+router = APIRouter(prefix="/admin/metrics", tags=["admin"])
+
+
+@router.get("/db/pool")
+@check_role_permissions(["ADMIN", "SUPER_ADMIN"])
+async def get_pool_metrics(current_user=Depends(jwt_service.get_current_user)):
+    """API to inspect database connection pool saturation
+
+    Args:
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+
+    Returns:
+        dict: pool name -> size, checked out, overflow, wait time and timeouts
+    """
+    return collect_pool_metrics(
+        async_engine.pool, async_replica_engine.pool, engine.pool
+    )
+
+
+@router.get("/db/queries")
+@check_role_permissions(["ADMIN", "SUPER_ADMIN"])
+async def get_query_metrics(
+    limit: int = 50,
+    reset: bool = False,
+    current_user=Depends(jwt_service.get_current_user),
+):
+    """API to inspect query telemetry aggregated per statement fingerprint
+
+    Args:
+        limit (int, optional): Fingerprints to return, slowest total first.
+            Defaults to 50.
+        reset (bool, optional): Clear the aggregates after reading them.
+            Defaults to False.
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+
+    Returns:
+        dict: queries (count, total/mean/p95/max time), sampled executions
+            (fingerprint and parameter types), suspected N+1 patterns, statement cache hit rates and how list
+            totals were computed
+    """
+    report = query_telemetry.report(limit=limit)
+    report["caches"]["statements"] = statement_cache.stats()
+    report["caches"]["totals"] = total_counter.stats()
+    if reset:
+        query_telemetry.reset()
+    return report
+
+
+@router.get("/password-hashing")
+@check_role_permissions(["ADMIN", "SUPER_ADMIN"])
+async def get_password_hashing_metrics(
+    current_user=Depends(jwt_service.get_current_user),
+):
+    """API to inspect the password hashing worker pool
+
+    Args:
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+
+    Returns:
+        dict: in flight and queued operations, rejections and wait/run times
+    """
+    return password_hasher.metrics()
+
+
+@router.get("/rate-limits")
+@check_role_permissions(["ADMIN", "SUPER_ADMIN"])
+async def get_rate_limit_metrics(
+    current_user=Depends(jwt_service.get_current_user),
+):
+    """API to inspect the failed login and OTP attempt limiters
+
+    Args:
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+
+    Returns:
+        dict: limits, failures recorded and requests rejected by this worker
+    """
+    return {
+        "backend": settings.RATE_LIMIT_BACKEND,
+        "login": login_limiter.metrics(),
+        "otp": otp_limiter.metrics(),
+    }
+
+
+@router.get("/token-revocations")
+@check_role_permissions(["ADMIN", "SUPER_ADMIN"])
+async def get_token_revocation_metrics(
+    current_user=Depends(jwt_service.get_current_user),
+):
+    """API to inspect the in-memory refresh token revocations
+
+    Args:
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+
+    Returns:
+        dict: revocations held, filter size and false positive counts
+    """
+    return revocation_store.metrics()
+
+
+@router.get("/email-filter")
+@check_role_permissions(["ADMIN", "SUPER_ADMIN"])
+async def get_email_filter_metrics(
+    current_user=Depends(jwt_service.get_current_user),
+):
+    """API to inspect the registered email Bloom filter
+
+    Args:
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+
+    Returns:
+        dict: lookups short-circuited, observed and estimated false positive
+            rates and filter size
+    """
+    return email_filter.metrics()
+
+
+@router.get("/email-outbox")
+@check_role_permissions(["ADMIN", "SUPER_ADMIN"])
+async def get_email_outbox_metrics(
+    current_user=Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """API to inspect the email outbox backlog and delivery worker
+
+    Args:
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+        db (AsyncSession, optional): Defaults to Depends(get_async_session).
+
+    Returns:
+        dict: pending, sent and failed emails, this worker's counters and
+            SMTP connection pool
+    """
+    report = await outbox_worker.metrics(db)
+    report["transport"] = mail_transport.metrics()
+    return report
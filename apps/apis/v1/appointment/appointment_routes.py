@@ -1,80 +1,178 @@
 from datetime import date, time
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Form, HTTPException, status
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, status
 
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from apps.apis.v1.users.filter_sort import (
     Filter,
     Sort,
 )
-from apps.common.enum import AppointmentStatusEnum, RoleEnum
-from apps.config.db.conn import get_db
+from apps.common.enum import AppointmentStatusEnum, ExportFormatEnum, RoleEnum
+from apps.config.db.conn import get_async_session, get_read_session
 from apps.core.models.users import StudentAppointment
 from apps.core.schemas.appointment import (
     AppointmentRequestSchema,
     AppointmentFilterSchema,
+    AppointmentResponseSchema,
     AppointmentResponseSchemaTotal,
 )
 
+from apps.rbac.role_permission_decorator import check_role_permissions
 from apps.security.auth import jwt_service
+from apps.utils.database_utils import fetch_one, load_fields, paginate, statement_cache
+from apps.utils.export import export_response
+from apps.utils.sparse_fields import parse_fields, sparse_response
 
 
 router = APIRouter(prefix="/appointment", tags=["appointment"])
 
 
+def appointments_query(
+    appointment_filter_params: AppointmentFilterSchema,
+    appointment_status: List[AppointmentStatusEnum],
+    appointment_fields: Optional[tuple[str, ...]],
+) -> tuple[Select, dict]:
+    """Filtered and sorted appointments statement of the list and the export
+
+    Returns:
+        tuple[Select, dict]: statement without a limit, its parameters
+    """
+    filter_params = {
+        "student_id": appointment_filter_params.student_id,
+        "instructor_id": appointment_filter_params.instructor_id,
+        "appointment_date": appointment_filter_params.appointment_date,
+        "appointment_date_from": appointment_filter_params.appointment_date_from,
+        "appointment_date_to": appointment_filter_params.appointment_date_to,
+        "status": appointment_status,
+    }
+
+    params = Filter().appointment_params(**filter_params)
+    sort, order = appointment_filter_params.sort, appointment_filter_params.order
+
+    query = statement_cache.get(
+        ("appointments", tuple(sorted(params)), sort, order, appointment_fields),
+        lambda: load_fields(
+            Sort().sorting_appointment(
+                query=Filter().filter_appointment(select(StudentAppointment), **params),
+                sort=sort,
+                order=order,
+            ),
+            StudentAppointment,
+            appointment_fields,
+        ),
+    )
+    return query, params
+
+
 @router.get("/get", response_model=AppointmentResponseSchemaTotal)
-def list_appointment(
+async def list_appointment(
     offset: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     appointment_filter_params: AppointmentFilterSchema = Depends(),
-    db: Session = Depends(get_db),
+    appointment_status: List[AppointmentStatusEnum] = Query(
+        [AppointmentStatusEnum.PENDING], alias="status"
+    ),
+    db: AsyncSession = Depends(get_read_session),
 ):
     """API to list appointments
 
     Args:
         offset (int, optional): Defaults to 0.
         limit (int, optional): Defaults to 10.
+        cursor (str, optional): next_cursor of the previous page, replaces
+            offset. Defaults to None.
+        fields (str, optional): Comma separated fields of each appointment
+            to return, eg. id,appointment_date. Defaults to None, all fields.
         appointment_filter_params (AppointmentFilterSchema, optional):
                 student_id,
                 instructor_id,
-                appointment_date,
-                status,
+                appointment_date or appointment_date_from / appointment_date_to,
                 sort,
                 order.
             Defaults to Depends().
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        appointment_status (List[AppointmentStatusEnum], optional): status
+            query param, repeatable. Defaults to [PENDING].
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_read_session).
     """
-    query = db.query(StudentAppointment)
-
-    filter_params = {
-        "student_id": appointment_filter_params.student_id,
-        "instructor_id": appointment_filter_params.instructor_id,
-        "appointment_date": appointment_filter_params.appointment_date,
-        "status": appointment_filter_params.status,
-    }
-
-    query = Filter().filter_appointment(query, **filter_params)
-    query = Sort().sorting_appointment(
-        query=query,
-        sort=appointment_filter_params.sort,
-        order=appointment_filter_params.order,
+    appointment_fields = parse_fields(fields, AppointmentResponseSchema)
+    query, params = appointments_query(
+        appointment_filter_params, appointment_status, appointment_fields
     )
 
-    total_count = query.with_entities(StudentAppointment.id).count()
+    page = await paginate(db, query, offset, limit, params, cursor)
 
     response = {
-        "total_count": total_count,
-        "appointments": query.offset(offset).limit(limit).all(),
+        "total_count": page.total,
+        "total_exact": page.total_exact,
+        "appointments": page.items,
+        "next_cursor": page.next_cursor,
     }
 
+    if appointment_fields:
+        return sparse_response(
+            AppointmentResponseSchemaTotal,
+            appointment_fields,
+            response,
+            items_key="appointments",
+        )
     return response
 
 
+@router.get("/export")
+@check_role_permissions(["ADMIN", "CSR"])
+async def export_appointments(
+    fields: Optional[str] = None,
+    export_format: ExportFormatEnum = Query(ExportFormatEnum.CSV, alias="format"),
+    appointment_filter_params: AppointmentFilterSchema = Depends(),
+    appointment_status: List[AppointmentStatusEnum] = Query(
+        [AppointmentStatusEnum.PENDING], alias="status"
+    ),
+    current_user=Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """API to stream every appointment matching the filters of the list
+
+    Args:
+        fields (str, optional): Comma separated fields of each appointment
+            to export, eg. id,appointment_date. Defaults to None, all fields.
+        export_format (ExportFormatEnum, optional): format query param, csv
+            or ndjson. Defaults to csv.
+        appointment_filter_params (AppointmentFilterSchema, optional): Same
+            filters and sort as the list. Defaults to Depends().
+        appointment_status (List[AppointmentStatusEnum], optional): status
+            query param, repeatable. Defaults to [PENDING].
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_read_session).
+
+    Returns:
+        StreamingResponse: appointments.csv or appointments.ndjson attachment
+    """
+    appointment_fields = parse_fields(fields, AppointmentResponseSchema)
+    query, params = appointments_query(
+        appointment_filter_params, appointment_status, appointment_fields
+    )
+    return export_response(
+        db,
+        query,
+        params,
+        AppointmentResponseSchema,
+        appointment_fields,
+        export_format,
+        "appointments",
+    )
+
+
 @router.post("/post")
-def request_appointment(
+async def request_appointment(
     appointment_data: AppointmentRequestSchema = Depends(),
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to request appointment
 
@@ -85,7 +183,7 @@ def request_appointment(
                 end_time.
             Defaults to Depends().
         current_user (Any, optional): Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, User not found
@@ -95,17 +193,10 @@ def request_appointment(
     Returns:
         message: Appointment request sent successfully
     """
-    user = jwt_service.get_user(email=current_user.email, db=db)
+    user = current_user
 
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-
-    appointment_exists = (
-        db.query(StudentAppointment)
-        .filter(StudentAppointment.student_id == user.id)
-        .first()
+    appointment_exists = await fetch_one(
+        db, select(StudentAppointment).filter(StudentAppointment.student_id == user.id)
     )
 
     if appointment_exists is not None:
@@ -119,9 +210,9 @@ def request_appointment(
         db_item_data["student_id"] = user.id
         appointment_db = StudentAppointment(**db_item_data)
         db.add(appointment_db)
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error: {e} occurred while creating the appointment",
@@ -131,12 +222,12 @@ def request_appointment(
 
 
 @router.put("/update")
-def update_appointment(
+async def update_appointment(
     appointment_date: date = Form(None),
     start_time: time = Form(None),
     end_time: time = Form(None),
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API for updating appointment
 
@@ -146,7 +237,7 @@ def update_appointment(
         end_time (time, optional): Appointment end time. Defaults to Form(None).
         current_user (Any, optional):
             Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, User not found
@@ -156,17 +247,10 @@ def update_appointment(
     Returns:
         message: Appointment updated successfully
     """
-    user = jwt_service.get_user(email=current_user.email, db=db)
-
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
+    user = current_user
 
-    appointment_db = (
-        db.query(StudentAppointment)
-        .filter(StudentAppointment.student_id == user.id)
-        .first()
+    appointment_db = await fetch_one(
+        db, select(StudentAppointment).filter(StudentAppointment.student_id == user.id)
     )
 
     if appointment_db is None:
@@ -186,9 +270,10 @@ def update_appointment(
             setattr(appointment_db, "end_time", end_time)
 
         db.add(appointment_db)
-        db.commit()
+        await db.commit()
 
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error: {e} occurred while updating the appointment",
@@ -198,10 +283,10 @@ def update_appointment(
 
 
 @router.delete("/delete/{pk}")
-def delete_appointment(
+async def delete_appointment(
     pk: int,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to delete appointment
 
@@ -209,7 +294,7 @@ def delete_appointment(
         pk (int): appointment id
         current_user (Any, optional):
             Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, User not found
@@ -219,15 +304,10 @@ def delete_appointment(
     Returns:
         appointment_db: Deleted appointment
     """
-    user = jwt_service.get_user(email=current_user.email, db=db)
+    user = current_user
 
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-
-    appointment_db = (
-        db.query(StudentAppointment).filter(StudentAppointment.id == pk).first()
+    appointment_db = await fetch_one(
+        db, select(StudentAppointment).filter(StudentAppointment.id == pk)
     )
 
     if appointment_db is None:
@@ -242,9 +322,10 @@ def delete_appointment(
     #     )
 
     try:
-        db.delete(appointment_db)
-        db.commit()
+        await db.delete(appointment_db)
+        await db.commit()
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error: {e} occurred while deleting the appointment",
@@ -254,11 +335,11 @@ def delete_appointment(
 
 
 @router.put("/approve")
-def approve_appointment(
+async def approve_appointment(
     pk: int,
     instructor_id: int,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to aprrove appointment
 
@@ -267,7 +348,7 @@ def approve_appointment(
         instructor_id (int): instructor id
         current_user (Any, optional):
             Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX datbase. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX datbase. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, User not found
@@ -278,15 +359,10 @@ def approve_appointment(
     Returns:
         message: Appointment approved successfully
     """
-    user = jwt_service.get_user(email=current_user.email, db=db)
-
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
+    user = current_user
 
-    appointment_db = (
-        db.query(StudentAppointment).filter(StudentAppointment.id == pk).first()
+    appointment_db = await fetch_one(
+        db, select(StudentAppointment).filter(StudentAppointment.id == pk)
     )
 
     if appointment_db is None:
@@ -307,9 +383,9 @@ def approve_appointment(
         setattr(appointment_db, "status", AppointmentStatusEnum.CONFIRMED)
         setattr(appointment_db, "instructor_id", instructor_id)
         db.add(appointment_db)
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error: {e} occurred while approving the appointment",
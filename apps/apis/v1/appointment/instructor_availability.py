@@ -1,13 +1,13 @@
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 
-from sqlalchemy import or_, and_
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from apps.apis.v1.users.filter_sort import Filter, Sort
 from apps.common.enum import RoleEnum
 
-from apps.config.db.conn import get_db
+from apps.config.db.conn import get_async_session, get_read_session
 from apps.core.models.users import InstructorAvailability
 from apps.core.schemas.instructor_availability import (
     InstructorAvailabilityCreate,
@@ -18,18 +18,26 @@ from apps.core.schemas.instructor_availability import (
     InstructorAvailabilityUpdate,
 )
 from apps.security.auth import jwt_service
+from apps.utils.database_utils import (
+    fetch_all,
+    fetch_one,
+    load_fields,
+    paginate,
+    statement_cache,
+)
+from apps.utils.sparse_fields import parse_fields, sparse_response
 
 router = APIRouter(prefix="/instructor/availability", tags=["instructor_availability"])
 
 
 @router.get("/get", response_model=List[InstructorAvailabilityResponseSchema])
-def list_all_instructor_available(
-    db: Session = Depends(get_db),
+async def list_all_instructor_available(
+    db: AsyncSession = Depends(get_read_session),
 ):
     """List all available instructors.
 
     Args:
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_read_session).
 
     Raises:
         HTTPException: 404, No instructor available
@@ -37,14 +45,13 @@ def list_all_instructor_available(
     Returns:
         List[InstructorAvailability]: List of available instructors
     """
-    available_instructors = (
-        db.query(InstructorAvailability)
-        .filter(
+    available_instructors = await fetch_all(
+        db,
+        select(InstructorAvailability).filter(
             InstructorAvailability.availability_date != None,
             InstructorAvailability.start_time != None,
             InstructorAvailability.end_time != None,
-        )
-        .all()
+        ),
     )
 
     if not available_instructors:
@@ -56,10 +63,10 @@ def list_all_instructor_available(
 
 
 @router.post("/post", response_model=InstructorAvailabilityResponse)
-def add_instructor_slot(
+async def add_instructor_slot(
     instructor_slot: InstructorAvailabilityCreate = Depends(),
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """Create a new slot for an instructor.
         TODO: What to do for old slots?
@@ -69,7 +76,7 @@ def add_instructor_slot(
         instructor_slot (InstructorAvailabilityCreate): availability date, start time, end time
         current_user (Any, optional):
             Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 400, Only instructors can add slots
@@ -79,7 +86,7 @@ def add_instructor_slot(
     Returns:
         InstructorAvailability: New slot created
     """
-    user = jwt_service.get_user(email=current_user.email, db=db)
+    user = current_user
 
     if user.role is not RoleEnum.INSTRUCTOR:
         raise HTTPException(
@@ -87,9 +94,9 @@ def add_instructor_slot(
             detail="Only instructors can add slots",
         )
 
-    user_slot = (
-        db.query(InstructorAvailability)
-        .filter(
+    user_slot = await fetch_one(
+        db,
+        select(InstructorAvailability).filter(
             InstructorAvailability.instructor_id == current_user.id,
             InstructorAvailability.availability_date
             == instructor_slot.availability_date,
@@ -103,8 +110,7 @@ def add_instructor_slot(
                     InstructorAvailability.end_time > instructor_slot.end_time,
                 ),
             ),
-        )
-        .first()
+        ),
     )
 
     if user_slot:
@@ -118,9 +124,10 @@ def add_instructor_slot(
 
     try:
         db.add(db_data)
-        db.commit()
-        db.refresh(db_data)
+        await db.commit()
+        await db.refresh(db_data)
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{str(e)}"
         ) from e
@@ -129,11 +136,11 @@ def add_instructor_slot(
 
 
 @router.put("/update/{slot_id}")
-def update_instructor_time_slot(
+async def update_instructor_time_slot(
     slot_id: int,
     update_date: InstructorAvailabilityUpdate = Depends(),
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to update an instructor slot
 
@@ -146,7 +153,7 @@ def update_instructor_time_slot(
             Defaults to Depends().
         current_user (Any, optional):
             Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, Slot not found
@@ -156,12 +163,10 @@ def update_instructor_time_slot(
     Returns:
         message: Slot updated successfully
     """
-    user = jwt_service.get_user(email=current_user.email, db=db)
+    user = current_user
 
-    slot = (
-        db.query(InstructorAvailability)
-        .filter(InstructorAvailability.id == slot_id)
-        .first()
+    slot = await fetch_one(
+        db, select(InstructorAvailability).filter(InstructorAvailability.id == slot_id)
     )
 
     if not slot:
@@ -184,9 +189,9 @@ def update_instructor_time_slot(
             setattr(slot, "end_time", update_date.end_time)
 
         db.add(slot)
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -195,10 +200,10 @@ def update_instructor_time_slot(
 
 
 @router.delete("/delete/{slot_id}")
-def delete_instructor_time_slot(
+async def delete_instructor_time_slot(
     slot_id: int,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to delete an instructor slot
 
@@ -206,7 +211,7 @@ def delete_instructor_time_slot(
         slot_id (int): Slot id
         current_user (Any, optional):
                 Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, Slot not found
@@ -216,12 +221,10 @@ def delete_instructor_time_slot(
     Returns:
         _type_: _description_
     """
-    user = jwt_service.get_user(email=current_user.email, db=db)
+    user = current_user
 
-    slot = (
-        db.query(InstructorAvailability)
-        .filter(InstructorAvailability.id == slot_id)
-        .first()
+    slot = await fetch_one(
+        db, select(InstructorAvailability).filter(InstructorAvailability.id == slot_id)
     )
 
     if not slot:
@@ -236,10 +239,10 @@ def delete_instructor_time_slot(
         )
 
     try:
-        db.delete(slot)
-        db.commit()
+        await db.delete(slot)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -248,49 +251,70 @@ def delete_instructor_time_slot(
 
 
 @router.get("/filter/get", response_model=InstructorAvailabilityResponseTotal)
-def filter_instructor_slots(
+async def filter_instructor_slots(
     offset: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     filter_data: InstructorAvailabilityFilterSchema = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_session),
 ):
     """API to filter instructor slots
 
     Args:
         offset (int, optional): Defaults to 0.
         limit (int, optional): Defaults to 10.
+        cursor (str, optional): next_cursor of the previous page, replaces
+            offset. Defaults to None.
+        fields (str, optional): Comma separated fields of each slot to
+            return, eg. id,availability_date. Defaults to None, all fields.
         filter_data (InstructorAvailabilityFilterSchema, optional):
-                availability_date,
-                start_time,
-                end_time,
+                availability_date, start_time, end_time, each exact or
+                    with _from / _to bounds,
                 instructor_id,
                 sort,
                 order.
             Defaults to Depends().
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_read_session).
 
     Returns:
         response: total, instructor_slots
     """
-    query = db.query(InstructorAvailability)
-
-    filter_params = {
-        "availability_date": filter_data.availability_date,
-        "start_time": filter_data.start_time,
-        "end_time": filter_data.end_time,
-        "instructor_id": filter_data.instructor_id,
-    }
-
-    query = Filter().filter_instructor_availability(query, **filter_params)
-    query = Sort().sort_instructor_availability(
-        query=query, sort=filter_data.sort, order=filter_data.order
+    slot_fields = parse_fields(fields, InstructorAvailabilityResponseSchema)
+    filter_params = filter_data.model_dump(exclude={"sort", "order"})
+
+    params = Filter().instructor_availability_params(**filter_params)
+    sort, order = filter_data.sort, filter_data.order
+
+    query = statement_cache.get(
+        ("instructor_availability", tuple(sorted(params)), sort, order, slot_fields),
+        lambda: load_fields(
+            Sort().sort_instructor_availability(
+                query=Filter().filter_instructor_availability(
+                    select(InstructorAvailability), **params
+                ),
+                sort=sort,
+                order=order,
+            ),
+            InstructorAvailability,
+            slot_fields,
+        ),
     )
 
-    total_count = query.with_entities(InstructorAvailability.id).count()
+    page = await paginate(db, query, offset, limit, params, cursor)
 
     response = {
-        "total": total_count,
-        "instructor_slots": query.offset(offset).limit(limit).all(),
+        "total": page.total,
+        "total_exact": page.total_exact,
+        "instructor_slots": page.items,
+        "next_cursor": page.next_cursor,
     }
 
+    if slot_fields:
+        return sparse_response(
+            InstructorAvailabilityResponseTotal,
+            slot_fields,
+            response,
+            items_key="instructor_slots",
+        )
     return response
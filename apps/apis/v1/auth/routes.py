@@ -1,10 +1,9 @@
-import time
-from fastapi import Depends, Form, HTTPException, status, APIRouter
+from fastapi import Depends, Form, HTTPException, Request, status, APIRouter
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import EmailStr
-from sqlalchemy import and_
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from apps.common.exception import (
     LoginException,
@@ -13,16 +12,26 @@ from apps.common.exception import (
 )
 from apps.config import settings
 
-from apps.config.db.conn import get_db
+from apps.config.db.conn import get_async_session
 from apps.core.models import Users
-from apps.core.models.otp_storage import OTPStorage
 from apps.core.models.school_organization import School
 from apps.core.models.users import Profile
 from apps.core.schemas.auth import LoginResponseWithTokenType
 from apps.core.schemas.user import UserCreateSchema
 from apps.rbac.role_permission_decorator import check_role_permissions
 from apps.security.auth import jwt_service
-from apps.services.send_email import send_email
+from apps.security.email_filter import email_filter
+from apps.security.otp_store import otp_store
+from apps.security.principal import Principal, principal_cache
+from apps.security.rate_limit import login_limiter, otp_limiter
+from apps.security.revocation import revocation_store
+from apps.services.email_outbox import (
+    enqueue_email,
+    enqueue_email_once,
+    outbox_worker,
+    verification_email_key,
+)
+from apps.utils.database_utils import fetch_all, fetch_one
 from apps.utils.generate_otp import generate_numeric_otp
 
 
@@ -31,14 +40,18 @@ router = APIRouter(prefix="/auth")
 
 @router.post("/login", response_model=LoginResponseWithTokenType)
 async def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """Login route"""
+    login_limiter.check(request, account=form_data.username)
     try:
-        user = jwt_service.authenticate_user(
+        user = await jwt_service.authenticate_user(
             email=form_data.username, password=form_data.password, db=db
         )
     except (UserNotFoundException, InvalidCredentialsException) as e:
+        login_limiter.record_failure(request, account=form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e)
         ) from e
@@ -55,16 +68,25 @@ async def login(
                 "verification_link": verification_link,
             }
 
-            await send_email(
+            # Retried logins reuse the pending verification email
+            _, created = await enqueue_email_once(
+                db,
+                dedupe_key=verification_email_key(user.id),
+                window_seconds=settings.VERIFICATION_EMAIL_RESEND_SECONDS,
                 subject="Verification email",
                 receiver=[user.email],
                 body=email_body,
                 template_name="verification_login_template.html",
             )
+            if created:
+                await db.commit()
         except Exception as e:
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
             ) from e
+        if created:
+            outbox_worker.notify()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Please verify your email to login",
@@ -87,20 +109,24 @@ async def login(
 
 
 @router.post("/register")
-async def get_users(user: UserCreateSchema, db: Session = Depends(get_db)):
+async def get_users(
+    user: UserCreateSchema, db: AsyncSession = Depends(get_async_session)
+):
     """Register route"""
 
     db_item_data = user.model_dump(
         exclude_unset=True, exclude={"password", "role", "school"}
     )
     password = user.password
-    hash_password = jwt_service.get_password_hash(password)
+    hash_password = await jwt_service.get_password_hash(password)
     db_item_data["password"] = hash_password
     role = user.role
     obj = Users(**db_item_data)
 
     if user.school:
-        schools = db.query(School).filter(School.name.in_(user.school)).all()
+        schools = await fetch_all(
+            db, select(School).filter(School.name.in_(user.school))
+        )
         if len(schools) != len(user.school):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -111,35 +137,42 @@ async def get_users(user: UserCreateSchema, db: Session = Depends(get_db)):
 
     try:
         db.add(obj)
-        db.commit()
-        db.refresh(obj)
+        await db.flush()
 
         user_profile = Profile(user_id=obj.id)
         db.add(user_profile)
-        db.commit()
-        db.refresh(user_profile)
+
+        token = jwt_service.create_verification_token(data={"user_id": obj.id})
+
+        verification_link = (
+            f"https://sfds.usualsmart.com/api/auth/verify?token={token}"
+        )
+
+        email_body = {
+            "username": user.first_name.capitalize(),
+            "verification_link": verification_link,
+        }
+
+        enqueue_email(
+            db,
+            subject="Verification email",
+            receiver=[user.email],
+            body=email_body,
+            template_name="verification_template.html",
+            dedupe_key=verification_email_key(obj.id),
+        )
+        await db.commit()
     except IntegrityError as exc:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=f"E-mail already exists"
         ) from exc
     except Exception as e:
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"{str(e)}") from e
 
-    token = jwt_service.create_verification_token(data={"user_id": obj.id})
-
-    verification_link = f"https://sfds.usualsmart.com/api/auth/verify?token={token}"
-
-    email_body = {
-        "username": user.first_name.capitalize(),
-        "verification_link": verification_link,
-    }
-
-    await send_email(
-        subject="Verification email",
-        receiver=[user.email],
-        body=email_body,
-        template_name="verification_template.html",
-    )
+    email_filter.add(obj.email)
+    outbox_worker.notify()
 
     return {
         "message": "User created successfully, please check your email to verify your account"
@@ -147,7 +180,7 @@ async def get_users(user: UserCreateSchema, db: Session = Depends(get_db)):
 
 
 @router.get("/verify")
-async def verify(token: str, db: Session = Depends(get_db)):
+async def verify(token: str, db: AsyncSession = Depends(get_async_session)):
     """Verify route"""
 
     try:
@@ -156,7 +189,7 @@ async def verify(token: str, db: Session = Depends(get_db)):
         user_id = payload.get("user_id")
 
         # Get the user from the database
-        user = db.query(Users).filter(Users.id == user_id).first()
+        user = await fetch_one(db, select(Users).filter(Users.id == user_id))
 
         if not user:
             raise HTTPException(
@@ -165,13 +198,15 @@ async def verify(token: str, db: Session = Depends(get_db)):
 
         try:
             setattr(user, "is_verified", True)
-            db.commit()
+            await db.commit()
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{str(e)}"
             ) from e
 
+        principal_cache.invalidate(user_id=user.id)
+
         return {"message": "User verified successfully"}
 
     except Exception as e:
@@ -181,29 +216,59 @@ async def verify(token: str, db: Session = Depends(get_db)):
 
 
 @router.post("/token/refresh-token", response_model=dict)
-async def refresh_access_token(refresh_token: str, db: Session = Depends(get_db)):
+async def refresh_access_token(
+    refresh_token: str, db: AsyncSession = Depends(get_async_session)
+):
     """
     Get access token using refresh token
 
+    The refresh token is rotated: the one sent is revoked and a new one of the
+    same family is returned with the access token.
+
     :param refresh_token: secret refresh token
-    :param db: Optional, database connection default: Depends(get_db)
-    :return: access token and token type
+    :param db: Optional, database connection default: Depends(get_async_session)
+    :return: access token, new refresh token and token type
     """
 
-    user = jwt_service.validate_refresh_access_token(db=db, refresh_token=refresh_token)
+    claims = await jwt_service.validate_refresh_access_token(
+        db=db, refresh_token=refresh_token
+    )
+    new_refresh_token = await jwt_service.rotate_refresh_token(db=db, claims=claims)
     data = {
-        "id": user.id,
-        "email": user.email,
-        "role": user.role,
+        "id": claims["id"],
+        "email": claims["email"],
+        "role": claims["role"],
     }
     return {
         "access_token": jwt_service.create_access_token(data),
+        "refresh_token": new_refresh_token,
         "token_type": "Bearer",
     }
 
 
+@router.post("/token/revoke", response_model=dict)
+async def revoke_refresh_token(
+    refresh_token: str, db: AsyncSession = Depends(get_async_session)
+):
+    """
+    Log out a session by revoking its refresh token family
+
+    :param refresh_token: secret refresh token
+    :param db: Optional, database connection default: Depends(get_async_session)
+    :return: dict, success message
+    """
+
+    claims = await jwt_service.validate_refresh_access_token(
+        db=db, refresh_token=refresh_token
+    )
+    await revocation_store.revoke_family(db, claims["fam"], claims["exp"])
+    return {"message": "Refresh token revoked successfully"}
+
+
 @router.get("/password/forget", response_model=dict)
-async def forget_password(email: EmailStr, db: Session = Depends(get_db)):
+async def forget_password(
+    email: EmailStr, db: AsyncSession = Depends(get_async_session)
+):
     """
     Forget password rest api
 
@@ -212,50 +277,55 @@ async def forget_password(email: EmailStr, db: Session = Depends(get_db)):
     :return: dict, success message
     """
 
-    user = jwt_service.get_user(db=db, email=email)
+    user = await jwt_service.get_user(db=db, email=email)
     if not user:
         raise HTTPException(status_code=404, detail="Email not found")
 
     otp = await generate_numeric_otp(length=settings.OTP_LENGTH)
-    expiration_time = int(time.time()) + 600
 
-    email_exists = db.query(OTPStorage).filter(OTPStorage.email == email).first()
-    if email_exists:
-        await jwt_service.update_otp(
-            db=db, email=email, otp=otp, expiration_time=expiration_time
-        )
-    else:
-        await jwt_service.save_otp(
-            db=db, email=email, otp=otp, expiration_time=expiration_time
+    try:
+        enqueue_email(
+            db,
+            subject="OTP for password reset",
+            receiver=[email],
+            body={"otp": otp},
+            template_name="otp_template.html",
         )
+        # Commits the outbox email together with the OTP
+        await otp_store.issue(email=email, otp=otp, db=db)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        ) from e
 
-    await send_email(
-        subject="OTP for password reset",
-        receiver=[email],
-        body={"otp": otp},
-        template_name="otp_template.html",
-    )
+    outbox_worker.notify()
 
     return {"message": "Successfully send password reset link in your mail."}
 
 
 @router.post("/password/verify-otp")
 async def verify_otp(
+    request: Request,
     otp: str = Form(...),
-    db: Session = Depends(get_db),
+    email: EmailStr = Form(...),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """
     Verify OTP rest api
 
-    :param email: EmailStr
     :param otp: str
+    :param email: EmailStr, the OTP is looked up for this email only
     :param db: Database connection
     :return: dict, success message
     """
 
-    verified_otp = await jwt_service.verify_otp(db=db, otp=otp)
+    otp_limiter.check(request, account=email)
+    verified_otp = await otp_store.verify(email=email, otp=otp, db=db)
 
     if not verified_otp:
+        otp_limiter.record_failure(request, account=email)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="OTP doesn't match or expired. Please try again.",
@@ -265,21 +335,25 @@ async def verify_otp(
 
 @router.post("/password/verify-otps")
 async def verify_otp(
+    request: Request,
     otp: str = Form(...),
-    db: Session = Depends(get_db),
+    email: EmailStr = Form(...),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """
     Verify OTP rest api
 
-    :param email: EmailStr
     :param otp: str
+    :param email: EmailStr, the OTP is looked up for this email only
     :param db: Database connection
     :return: dict, success message
     """
 
-    verified_otp = await jwt_service.verify_otp(db=db, otp=otp)
+    otp_limiter.check(request, account=email)
+    verified_otp = await otp_store.verify(email=email, otp=otp, db=db)
 
     if not verified_otp:
+        otp_limiter.record_failure(request, account=email)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="OTP doesn't match or expired. Please try again.",
@@ -288,54 +362,59 @@ async def verify_otp(
     return {"message": "OTP verified successfully"}
 @router.post("/password/reset", response_model=dict)
 async def reset_password(
+    request: Request,
     otp: str = Form(...),
     new_password: str = Form(...),
     confirm_password: str = Form(...),
-    db: Session = Depends(get_db),
+    email: EmailStr = Form(...),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """
     Reset password rest api
 
-    :param email: EmailStr
+    :param otp: str
     :param new_password: str
+    :param confirm_password: str
+    :param email: EmailStr, the OTP is looked up for this email only
     :param db: Database connection
     :return: dict, success message
     """
 
-    user = (
-        db.query(Users)
-        .join(OTPStorage, Users.email == OTPStorage.email)
-        .filter(and_(OTPStorage.otp == otp, Users.email == OTPStorage.email))
-        .first()
-    )
-
-    verified_otp = await jwt_service.verify_otp(db=db, otp=otp)
+    otp_limiter.check(request, account=email)
+    otp_email = await otp_store.verify(email=email, otp=otp, db=db)
 
-    if not verified_otp:
+    if otp_email is None:
+        otp_limiter.record_failure(request, account=email)
         raise HTTPException(
             status_code=404, detail="OTP doesn't match or expired. Please try again."
         )
 
+    user = await jwt_service.get_user(email=otp_email, db=db)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
     if new_password != confirm_password:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Password doesn't match"
         )
 
-    new_hash_password = jwt_service.get_password_hash(new_password)
+    new_hash_password = await jwt_service.get_password_hash(new_password)
 
     try:
         setattr(user, "password", new_hash_password)
         db.add(user)
-        db.commit()
+        await db.commit()
 
-        db.query(OTPStorage).filter(OTPStorage.otp == otp).delete()
-        db.commit()
+        await otp_store.consume(email=user.email, otp=otp, db=db)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{str(e)}"
         ) from e
 
+    principal_cache.invalidate(user_id=user.id)
+    await revocation_store.revoke_user(db, user.id)
+
     return {"message": "Password reset successfully"}
 
 
@@ -343,23 +422,32 @@ async def reset_password(
 async def change_password(
     old_password: str = Form(...),
     new_password: str = Form(...),
-    user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_async_session),
 ):
-    if not jwt_service.verify_password(old_password, user.password):
+    user = await db.get(Users, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    if not await jwt_service.verify_password(old_password, user.password):
         raise HTTPException(status_code=404, detail="Incorrect Old Password")
 
-    new_hash_password = jwt_service.get_password_hash(new_password)
+    new_hash_password = await jwt_service.get_password_hash(new_password)
 
     user.password = new_hash_password
 
     try:
         db.add(user)
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{str(e)}"
         ) from e
 
+    principal_cache.invalidate(user_id=user.id)
+    await revocation_store.revoke_user(db, user.id)
+
     return {"message": "Password changed successfully"}
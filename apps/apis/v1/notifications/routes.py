@@ -0,0 +1,87 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.config.db.conn import get_async_session
+from apps.core.models.notification import Notification
+from apps.core.schemas.notification import (
+    NotificationCreateSchema,
+    NotificationProgressSchema,
+)
+from apps.rbac.role_permission_decorator import check_role_permissions
+from apps.security.auth import jwt_service
+from apps.services.email_outbox import outbox_worker
+from apps.services.notifications import create_notification, notification_progress
+
+
+router = APIRouter(prefix="/notifications", tags=["notifications"])
+
+
+@router.post(
+    "",
+    response_model=NotificationProgressSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+@check_role_permissions(["ADMIN", "SUPER_ADMIN", "CSR"])
+async def send_notification(
+    notification_data: NotificationCreateSchema,
+    current_user=Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """API to email an announcement to every user matching the recipient filters
+
+    Returns as soon as the notification is saved; recipients are added to the
+    email outbox in chunks and delivered in the background.
+
+    Args:
+        notification_data (NotificationCreateSchema): Subject, message and the
+            same filters as the user list
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+        db (AsyncSession, optional): Defaults to Depends(get_async_session).
+
+    Returns:
+        NotificationProgressSchema: notification with its recipient count
+    """
+    try:
+        notification = await create_notification(
+            db, notification_data, created_by=current_user.id
+        )
+        await db.commit()
+        await db.refresh(notification)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        ) from e
+
+    outbox_worker.notify()
+    return await notification_progress(db, notification)
+
+
+@router.get("/{pk}", response_model=NotificationProgressSchema)
+@check_role_permissions(["ADMIN", "SUPER_ADMIN", "CSR"])
+async def get_notification_progress(
+    pk: int,
+    current_user=Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """API to follow the delivery of a notification
+
+    Args:
+        pk (int): Notification ID
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+        db (AsyncSession, optional): Defaults to Depends(get_async_session).
+
+    Returns:
+        NotificationProgressSchema: recipients found, added to the outbox,
+            pending, sent and failed
+    """
+    notification = await db.get(Notification, pk)
+    if notification is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Notification not found"
+        )
+    return await notification_progress(db, notification)
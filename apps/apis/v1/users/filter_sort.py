@@ -1,5 +1,7 @@
-from datetime import timedelta
+from typing import Any, NamedTuple, Optional
+
 from apps.common.enum import RoleEnum, RoleFilterEnum
+from apps.core.models.school_organization import School
 from apps.core.models.transaction import Transaction
 from apps.core.models.users import (
     StudentAppointment,
@@ -7,49 +9,58 @@ from apps.core.models.users import (
     Profile,
     InstructorAvailability,
 )
+from apps.utils.database_utils import keyset_order
 
-from sqlalchemy import asc, desc
-from sqlalchemy.orm import Query
+from sqlalchemy import Select, bindparam, func
 
 
 class Sort:
     def generic_sorting(
-        self, query: Query, sort: str, order: str, sorting_options: dict
-    ) -> Query:
+        self,
+        query: Select,
+        sort: str,
+        order: str,
+        sorting_options: dict,
+        tie_breaker,
+    ) -> Select:
         """Generic method for sorting
 
+        Rows with the same sort value are ordered by ``tie_breaker``, so the
+        order is total and the statement can be paged with a cursor.
+
         Args:
-            query (Query): Sqlalchemy model query
+            query (Select): Sqlalchemy select statement
             sort (str): sorting key
             order (str): ordering key, desc or asc
             sorting_options (dict): dictionary of sorting options
+            tie_breaker: Unique column, usually the primary key
 
         Raises:
             ValueError: Invalid params
 
         Returns:
-            Query: Sqlalchemy query
+            Select: Sqlalchemy select statement
         """
         sorting_key = sorting_options.get(sort.lower(), None)
 
         if order.lower() == "asc":
-            query = query.order_by(asc(sorting_key))
+            descending = False
         elif order.lower() == "desc":
-            query = query.order_by(desc(sorting_key))
+            descending = True
         else:
             raise ValueError("Invalid order parameter. Use 'asc' or 'desc'.")
 
-        return query
+        return keyset_order(query, sorting_key, tie_breaker, descending)
 
-    def sorting_users(self, query: Query, sort: str, order: str) -> Query:
+    def sorting_users(self, query: Select, sort: str, order: str) -> Select:
         sorting_options = {
             "created_at": Users.created_at,
             "updated_at": Users.updated_at,
             "first_name": Users.first_name,
         }
-        return self.generic_sorting(query, sort, order, sorting_options)
+        return self.generic_sorting(query, sort, order, sorting_options, Users.id)
 
-    def sorting_appointment(self, query: Query, sort: str, order: str) -> Query:
+    def sorting_appointment(self, query: Select, sort: str, order: str) -> Select:
         sorting_options = {
             "appointment_date": StudentAppointment.appointment_date,
             "start_time": StudentAppointment.start_time,
@@ -60,11 +71,13 @@ class Sort:
         # if sorting_key is None:
         #     raise ValueError("Invalid sort parameter")
 
-        return self.generic_sorting(query, sort, order, sorting_options)
+        return self.generic_sorting(
+            query, sort, order, sorting_options, StudentAppointment.id
+        )
 
     def sort_instructor_availability(
-        self, query: Query, sort: str, order: str
-    ) -> Query:
+        self, query: Select, sort: str, order: str
+    ) -> Select:
         sorting_options = {
             "availability_date": InstructorAvailability.availability_date,
             "start_time": InstructorAvailability.start_time,
@@ -74,9 +87,11 @@ class Sort:
             "instructor_id": InstructorAvailability.instructor_id,
         }
 
-        return self.generic_sorting(query, sort, order, sorting_options)
+        return self.generic_sorting(
+            query, sort, order, sorting_options, InstructorAvailability.id
+        )
 
-    def sort_transaction(self, query: Query, sort: str, order: str) -> Query:
+    def sort_transaction(self, query: Select, sort: str, order: str) -> Select:
         sorting_options = {
             "date_charged": Transaction.date_charged,
             "amount": Transaction.amount,
@@ -89,162 +104,201 @@ class Sort:
             "transaction_id": Transaction.id,
         }
 
-        return self.generic_sorting(query, sort, order, sorting_options)
+        return self.generic_sorting(query, sort, order, sorting_options, Transaction.id)
 
 
-class Filter:
-    def filter_users(self, query: Query, **kwargs) -> Query:
-        """Filter users based on query params
+class FilterField(NamedTuple):
+    """A filterable column
 
-        Args:
-            query (Query): Query object
-            **kwargs: Query params
-
-        Returns:
-            Query: Filtered query
-        """
-        params = kwargs
+    ``operator`` is one of:
 
-        if first_name := params.get("first_name"):
-            query = query.filter(Users.first_name.ilike(f"%{first_name}%"))
+    - ``eq`` / ``ne``: equal / not equal to the value
+    - ``in``: one of a list of values
+    - ``range``: between ``<name>_from`` and ``<name>_to``, both inclusive
+      and both optional; ``<name>`` alone is an exact match
+    - ``prefix``: starts with the value, ignoring case
 
-        if email := params.get("email"):
-            query = query.filter(Users.email == email)
+    ``join`` is the entity or relationship to join for the column.
+    """
 
-        if city := params.get("city"):
-            query = query.join(Profile).filter(Profile.city.ilike(f"%{city}%"))
+    column: Any
+    operator: str = "eq"
+    join: Optional[Any] = None
 
-        if state := params.get("state"):
-            query = query.join(Profile).filter(Profile.state.ilike(f"%{state}%"))
 
-        if zip_code := params.get("zip_code"):
-            query = query.join(Profile).filter(Profile.zip_code == zip_code)
+class FilterSpec:
+    """Declarative filters of one resource
 
-        if role := params.get("role"):
-            if role == RoleFilterEnum.ALL:
-                pass
-            elif role is RoleFilterEnum.NOT_STUDENT:
-                query = query.filter(Users.role != RoleEnum.STUDENT)
-            else:
-                query = query.filter(Users.role == role)
+    ``params`` turns query params into bind values and ``apply`` adds a
+    ``bindparam`` predicate for every bind value present, joining each entity
+    at most once. The filtered statement only depends on which filters are
+    set, not on their values, so it can be built once and reused from
+    ``statement_cache``.
+    """
 
-        if school := params.get("school"):
-            query = query.join(Users.school).filter(Users.school.any(name=school))
+    OPERATORS = ("eq", "ne", "in", "range", "prefix")
 
-        return query
+    def __init__(self, **fields: FilterField):
+        for name, field in fields.items():
+            if field.operator not in self.OPERATORS:
+                raise ValueError(f"Unknown operator {field.operator} for {name}")
+        self.fields = fields
 
-    def filter_appointment(self, query: Query, **kwargs) -> Query:
-        """Filter Appointment Function
+    def params(self, **kwargs) -> dict:
+        """Bind values of the filters that are set
 
         Args:
-            query (Query): Query object
+            **kwargs: Query params, None or empty meaning not set
 
         Returns:
-            Query: Filtered query
+            dict: Bind values
         """
+        params = {}
+        for name, field in self.fields.items():
+            if field.operator == "range":
+                exact = kwargs.get(name)
+                low = exact if exact is not None else kwargs.get(f"{name}_from")
+                high = exact if exact is not None else kwargs.get(f"{name}_to")
+                if low is not None:
+                    params[f"{name}_min"] = low
+                if high is not None:
+                    params[f"{name}_max"] = high
+                continue
+
+            value = kwargs.get(name)
+            if value is None or value == "" or value == []:
+                continue
+            if field.operator == "in":
+                params[name] = tuple(value)
+            elif field.operator == "prefix":
+                escaped = (
+                    value.lower()
+                    .replace("\\", "\\\\")
+                    .replace("%", "\\%")
+                    .replace("_", "\\_")
+                )
+                params[name] = f"{escaped}%"
+            else:
+                params[name] = value
+        return params
 
-        params = kwargs
-
-        if student_id := params.get("student_id"):
-            query = query.filter(StudentAppointment.student_id == student_id)
-
-        if instructor_id := params.get("instructor_id"):
-            query = query.filter(StudentAppointment.instructor_id == instructor_id)
-
-        if appointment_date := params.get("appointment_date"):
-            start_date = appointment_date - timedelta(days=2)
-            end_date = appointment_date + timedelta(days=2)
-
-            query = query.filter(
-                StudentAppointment.appointment_date.between(start_date, end_date)
-            )
-
-        if status := params.get("status"):
-            query = query.filter(StudentAppointment.status == status)
-
-        return query
-
-    def filter_instructor_availability(self, query: Query, **kwargs) -> Query:
-        """Filter Instructor Availability
+    def apply(self, query: Select, **params) -> Select:
+        """Filter a statement
 
         Args:
-            query (Query): Query object
+            query (Select): Select statement
+            **params: Bind values from params
 
         Returns:
-            Query: Filtered query
+            Select: Filtered statement
         """
+        joins = []
+        predicates = []
+        for name, field in self.fields.items():
+            column = field.column
+            if field.operator == "range":
+                conditions = []
+                if f"{name}_min" in params:
+                    conditions.append(column >= bindparam(f"{name}_min"))
+                if f"{name}_max" in params:
+                    conditions.append(column <= bindparam(f"{name}_max"))
+            elif name not in params:
+                conditions = []
+            elif field.operator == "eq":
+                conditions = [column == bindparam(name)]
+            elif field.operator == "ne":
+                conditions = [column != bindparam(name)]
+            elif field.operator == "in":
+                conditions = [column.in_(bindparam(name, expanding=True))]
+            else:
+                conditions = [func.lower(column).like(bindparam(name), escape="\\")]
+
+            if not conditions:
+                continue
+            predicates.extend(conditions)
+            if field.join is not None and not any(j is field.join for j in joins):
+                joins.append(field.join)
+
+        for target in joins:
+            query = query.join(target)
+        if predicates:
+            query = query.filter(*predicates)
+        return query
 
-        params = kwargs
-
-        if availability_date := params.get("availability_date"):
-            min_date = availability_date - timedelta(days=2)
-            max_date = availability_date + timedelta(days=2)
-
-            query = query.filter(
-                InstructorAvailability.availability_date.between(min_date, max_date)
-            )
 
-        if start_time := params.get("start_time"):
-            min_time = start_time - timedelta(minutes=30)
-            max_time = start_time + timedelta(minutes=30)
+USER_FILTERS = FilterSpec(
+    first_name=FilterField(Users.first_name, "prefix"),
+    email=FilterField(Users.email),
+    city=FilterField(Profile.city, "prefix", join=Profile),
+    state=FilterField(Profile.state, "prefix", join=Profile),
+    zip_code=FilterField(Profile.zip_code, join=Profile),
+    role=FilterField(Users.role),
+    excluded_role=FilterField(Users.role, "ne"),
+    school=FilterField(School.name, join=Users.school),
+)
 
-            query = query.filter(
-                InstructorAvailability.start_time.between(min_time, max_time)
-            )
+APPOINTMENT_FILTERS = FilterSpec(
+    student_id=FilterField(StudentAppointment.student_id),
+    instructor_id=FilterField(StudentAppointment.instructor_id),
+    appointment_date=FilterField(StudentAppointment.appointment_date, "range"),
+    status=FilterField(StudentAppointment.status, "in"),
+)
 
-        if end_time := params.get("end_time"):
-            min_time = end_time - timedelta(minutes=30)
-            max_time = end_time + timedelta(minutes=30)
+INSTRUCTOR_AVAILABILITY_FILTERS = FilterSpec(
+    availability_date=FilterField(InstructorAvailability.availability_date, "range"),
+    start_time=FilterField(InstructorAvailability.start_time, "range"),
+    end_time=FilterField(InstructorAvailability.end_time, "range"),
+    instructor_id=FilterField(InstructorAvailability.instructor_id),
+)
 
-            query = query.filter(
-                InstructorAvailability.end_time.between(min_time, max_time)
-            )
+TRANSACTION_FILTERS = FilterSpec(
+    user_id=FilterField(Transaction.user_id),
+    transaction_id=FilterField(Transaction.id),
+    amount=FilterField(Transaction.amount),
+    discount=FilterField(Transaction.discount),
+    method=FilterField(Transaction.method, "in"),
+    location=FilterField(Transaction.location),
+    is_deleted=FilterField(Transaction.is_deleted),
+    date_charged=FilterField(Transaction.date_charged, "range"),
+)
 
-        if instructor_id := params.get("instructor_id"):
-            query = query.filter(InstructorAvailability.instructor_id == instructor_id)
 
-        return query
+class Filter:
+    """Filters for the list endpoints, see FilterSpec"""
 
-    def filter_transaction(self, query: Query, **kwargs) -> Query:
-        """Filter Transaction
+    def user_params(self, **kwargs) -> dict:
+        """Bind values for filter_users
 
         Args:
-            query (Query): Query object
+            **kwargs: Query params
 
         Returns:
-            Query: Filtered query
+            dict: Bind values of the filters that are set
         """
+        role = kwargs.pop("role", None)
+        if role is RoleFilterEnum.NOT_STUDENT:
+            kwargs["excluded_role"] = RoleEnum.STUDENT
+        elif role is not None and role != RoleFilterEnum.ALL:
+            kwargs["role"] = role
+        return USER_FILTERS.params(**kwargs)
 
-        params = kwargs
-
-        if user_id := params.get("user_id"):
-            query = query.filter(Transaction.user_id == user_id)
+    def filter_users(self, query: Select, **params) -> Select:
+        return USER_FILTERS.apply(query, **params)
 
-        if transaction_id := params.get("transaction_id"):
-            query = query.filter(Transaction.id == transaction_id)
+    def appointment_params(self, **kwargs) -> dict:
+        return APPOINTMENT_FILTERS.params(**kwargs)
 
-        if amount := params.get("amount"):
-            query = query.filter(Transaction.amount == amount)
+    def filter_appointment(self, query: Select, **params) -> Select:
+        return APPOINTMENT_FILTERS.apply(query, **params)
 
-        if discount := params.get("discount"):
-            query = query.filter(Transaction.discount == discount)
+    def instructor_availability_params(self, **kwargs) -> dict:
+        return INSTRUCTOR_AVAILABILITY_FILTERS.params(**kwargs)
 
-        if method := params.get("method"):
-            query = query.filter(Transaction.method == method)
+    def filter_instructor_availability(self, query: Select, **params) -> Select:
+        return INSTRUCTOR_AVAILABILITY_FILTERS.apply(query, **params)
 
-        if location := params.get("location"):
-            query = query.filter(Transaction.location == location)
+    def transaction_params(self, **kwargs) -> dict:
+        return TRANSACTION_FILTERS.params(**kwargs)
 
-        is_deleted = params.get("is_deleted")
-        if is_deleted is not None:
-            # is_deleted can be False walrus operator doesn't work
-            # as expected for falsy value like False or None
-            query = query.filter(Transaction.is_deleted == is_deleted)
-
-        if date_charged := params.get("date_charged"):
-            max_date = date_charged + timedelta(days=1)
-            min_date = date_charged - timedelta(days=1)
-
-            query = query.filter(Transaction.date_charged.between(min_date, max_date))
-
-        return query
+    def filter_transaction(self, query: Select, **params) -> Select:
+        return TRANSACTION_FILTERS.apply(query, **params)
@@ -1,15 +1,18 @@
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from apps.apis.v1.users.filter_sort import Filter, Sort
 from apps.common.enum import OrderEnum, RoleEnum, UserSortEnum
-from apps.config.db.conn import get_db
+from apps.config.db.conn import get_async_session, get_read_session
 from apps.core.models.users import Users
-from apps.core.schemas.user import UserResponseSchemaTotal
+from apps.core.schemas.user import UserResponseSchema, UserResponseSchemaTotal
 from apps.rbac.role_permission_decorator import check_role_permissions
 from apps.security.auth import jwt_service
+from apps.utils.database_utils import fetch_one, load_fields, paginate, statement_cache
+from apps.utils.sparse_fields import parse_fields, sparse_response
 
 
 router = APIRouter(prefix="/instructor", tags=["instructor(Might be removed)"])
@@ -17,27 +20,27 @@ router = APIRouter(prefix="/instructor", tags=["instructor(Might be removed)"])
 
 @router.post("/{instructor_id}/create-student/{user_id}")
 # @check_role_permissions(["CSR", "ADMIN"])
-def create_student(
+async def create_student(
     instructor_id: int,
     user_id: int,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """
     Router to create student profile(for CSR, ADMIN)
 
     Args:
-        db (Session, optional): CTX. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX. Defaults to Depends(get_async_session).
     """
 
-    instructor = db.query(Users).filter(Users.id == instructor_id).first()
+    instructor = await fetch_one(db, select(Users).filter(Users.id == instructor_id))
 
     if instructor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Instructor not found"
         )
 
-    student = db.query(Users).filter(Users.id == user_id).first()
+    student = await fetch_one(db, select(Users).filter(Users.id == user_id))
 
     if student is None:
         raise HTTPException(
@@ -46,9 +49,9 @@ def create_student(
 
     try:
         student.instructor_id = instructor.id
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{str(e)}"
         ) from e
@@ -58,9 +61,11 @@ def create_student(
 
 @router.get("/get", response_model=UserResponseSchemaTotal)
 # @check_role_permissions(["INSTRUCTOR"]) # Disabled for now
-def list_students(
+async def list_students(
     offset: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     first_name: Optional[str] = None,
     email: Optional[str] = None,
     city: Optional[str] = None,
@@ -69,29 +74,25 @@ def list_students(
     order: OrderEnum = OrderEnum.DESC,
     sort: UserSortEnum = UserSortEnum.UPDATED_AT,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_session),
 ):
     """
     Router to list students for logged in instructor
 
     Args:
-        db (Session, optional): CTX. Defaults to Depends(get_db).
+        fields (str, optional): Comma separated fields of each student to
+            return, eg. id,first_name. Defaults to None, all fields.
+        db (AsyncSession, optional): CTX. Defaults to Depends(get_read_session).
     """
+    user_fields = parse_fields(fields, UserResponseSchema)
 
-    user = jwt_service.get_user(email=current_user.email, db=db)
-
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
+    user = current_user
 
     if user.role == RoleEnum.STUDENT:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="You are not an instructor"
         )
 
-    query = db.query(Users).filter(Users.instructor_id == user.id)
-
     filter_params = {
         "first_name": first_name,
         "email": email,
@@ -101,42 +102,67 @@ def list_students(
         "role": RoleEnum.STUDENT,
     }
 
-    query = Filter().filter_users(query, **filter_params)
-    query = Sort().sorting_users(query=query, sort=sort, order=order)
-
-    total_count = query.with_entities(Users.id).count()
+    params = Filter().user_params(**filter_params)
+
+    query = statement_cache.get(
+        ("instructor_students", tuple(sorted(params)), sort, order, user_fields),
+        lambda: load_fields(
+            Sort().sorting_users(
+                query=Filter().filter_users(
+                    select(Users).filter(
+                        Users.instructor_id == bindparam("instructor_id")
+                    ),
+                    **params,
+                ),
+                sort=sort,
+                order=order,
+            ),
+            Users,
+            user_fields,
+        ),
+    )
+
+    page = await paginate(
+        db, query, offset, limit, {**params, "instructor_id": user.id}, cursor
+    )
 
     response = {
-        "total_count": total_count,
-        "users": query.offset(offset).limit(limit).all(),
+        "total_count": page.total,
+        "total_exact": page.total_exact,
+        "users": page.items,
+        "next_cursor": page.next_cursor,
     }
 
+    if user_fields:
+        return sparse_response(
+            UserResponseSchemaTotal, user_fields, response, items_key="users"
+        )
     return response
 
 
 @router.delete("/{instructor_id}/remove/student/{user_id}")
 # @check_role_permissions(["CSR", "ADMIN", "INSTRUCTOR"])
-def remove_student_from_instructor(
+async def remove_student_from_instructor(
     instructor_id: int,
     user_id: int,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """
     Router to remove student from instructor
 
     Args:
-        db (Session, optional): CTX. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX. Defaults to Depends(get_async_session).
     """
 
-    instructor = db.query(Users).filter(Users.id == instructor_id).first()
+    instructor = await fetch_one(db, select(Users).filter(Users.id == instructor_id))
 
     if instructor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Instructor not found"
         )
 
-    student = db.query(Users).filter(Users.id == user_id).first()
+    student = await fetch_one(db, select(Users).filter(Users.id == user_id))
 
     if student is None:
         raise HTTPException(
@@ -145,9 +171,9 @@ def remove_student_from_instructor(
 
     try:
         setattr(student, "instructor_id", None)
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{str(e)}"
         ) from e
@@ -2,12 +2,13 @@ from datetime import date
 from typing import List
 
 from fastapi import APIRouter, Depends, Form, status, HTTPException
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from apps.common.enum import GenderEnum
 from apps.common.helpers import get_user_and_profile
-from apps.config.db.conn import get_db
+from apps.config.db.conn import get_async_session, get_read_session
 from apps.core.models.users import ContactInformation, PickupLocation, Users
 from apps.core.schemas.profile import (
     ContactInformationCreate,
@@ -25,30 +26,46 @@ from apps.core.models import (
     Profile,
 )
 from apps.security.auth import jwt_service
+from apps.security.principal import principal_cache
+from apps.utils.database_utils import fetch_all, fetch_one
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
 
 @router.get("/get", response_model=UserProfileGetResponse)
 async def profile(
-    current_user=Depends(jwt_service.get_current_user), db: Session = Depends(get_db)
+    current_user=Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_read_session),
 ):
     """Router to get user profile
 
     Args:
         current_user (Any, optional): Get current logged in user.
             Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX. Defaults to Depends(get_read_session).
     """
 
-    user = jwt_service.get_user(email=current_user.email, db=db)
+    user = await fetch_one(
+        db,
+        select(Users)
+        .options(selectinload(Users.school), selectinload(Users.transaction))
+        .filter(Users.id == current_user.id),
+    )
 
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    user_profile = db.query(Profile).filter(Profile.user_id == user.id).first()
+    user_profile = await fetch_one(
+        db,
+        select(Profile)
+        .options(
+            selectinload(Profile.contact_information),
+            selectinload(Profile.pickup_location),
+        )
+        .filter(Profile.user_id == user.id),
+    )
 
     if user_profile is None:
         raise HTTPException(
@@ -59,7 +76,7 @@ async def profile(
 
 
 @router.put("/update", response_model=UserProfileResponse)
-def update_profile(
+async def update_profile(
     first_name: str = Form(None),
     middle_name: str = Form(None),
     last_name: str = Form(None),
@@ -74,23 +91,30 @@ def update_profile(
     state: str = Form(None),
     zip_code: int = Form(None),
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """Router to update user profile
 
     Args:
         current_user (Any, optional): Get current logged in user.
             Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX. Defaults to Depends(get_async_session).
     """
 
-    user = jwt_service.get_user(email=current_user.email, db=db)
+    user = await fetch_one(
+        db,
+        select(Users)
+        .options(selectinload(Users.school), selectinload(Users.transaction))
+        .filter(Users.id == current_user.id),
+    )
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    user_profile = db.query(Profile).filter(Profile.user_id == user.id).first()
+    user_profile = await fetch_one(
+        db, select(Profile).filter(Profile.user_id == user.id)
+    )
     if user_profile is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
@@ -126,20 +150,24 @@ def update_profile(
 
         db.add(user)
         db.add(user_profile)
-        db.commit()
+        await db.commit()
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
         ) from e
 
+    if first_name is not None:
+        principal_cache.invalidate(user_id=user.id)
+
     return {"user": user, "profile": user_profile}
 
 
 @router.post("/pickup/post", response_model=PickupLocationResponse)
-def create_pickup_location(
+async def create_pickup_location(
     user_pickup_location: PickupLocationCreate,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to create pickup location
 
@@ -147,19 +175,15 @@ def create_pickup_location(
         location (str): Pickup location
         current_user (Object, optional):
             Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): Database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): Database. Defaults to Depends(get_async_session).
 
     Returns:
         success message: Pickup location created successfully
     """
 
-    user = jwt_service.get_user(email=current_user.email, db=db)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-
-    user_profile = db.query(Profile).filter(Profile.user_id == user.id).first()
+    user_profile = await fetch_one(
+        db, select(Profile).filter(Profile.user_id == current_user.id)
+    )
     if user_profile is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
@@ -182,9 +206,9 @@ def create_pickup_location(
         db_item_data["user_id"] = user_profile.id
         pickup_location = PickupLocation(**db_item_data)
         db.add(pickup_location)
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -193,31 +217,31 @@ def create_pickup_location(
 
 
 @router.get("/pickup/get", response_model=PickupLocationResponseSchemaTotal)
-def get_pickup_location(
-    current_user=Depends(jwt_service.get_current_user), db: Session = Depends(get_db)
+async def get_pickup_location(
+    current_user=Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_read_session),
 ):
     """API to get pickup location
 
     Args:
         current_user (Any, optional):
             Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): Database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): Database. Defaults to Depends(get_read_session).
 
     Returns:
         PickupLocation: Pickup location
     """
-    _, user_profile = get_user_and_profile(current_user, db)
+    _, user_profile = await get_user_and_profile(current_user, db)
 
-    pickup_location = (
-        db.query(PickupLocation).filter(PickupLocation.user_id == user_profile.id).all()
+    pickup_location = await fetch_all(
+        db, select(PickupLocation).filter(PickupLocation.user_id == user_profile.id)
     )
 
     if not pickup_location:
         return {"message": "No pickup location found"}
 
-    total = (
-        db.query(PickupLocation).with_entities(func.count(PickupLocation.id)).scalar()
-    )  # pylint: disable=not-callable
+    # Every row of the user is already loaded
+    total = len(pickup_location)
 
     response = {"total": total, "pickup_location": pickup_location}
 
@@ -225,10 +249,10 @@ def get_pickup_location(
 
 
 @router.put("/pickup/update")
-def update_pickup_location(
+async def update_pickup_location(
     pickup_location_update_data: PickupLocationUpdateSchema = Depends(),
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to update pickup location
 
@@ -242,7 +266,7 @@ def update_pickup_location(
         current_user (Any, optional):
                 Currently logged in user.
             Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, User not found
@@ -253,17 +277,13 @@ def update_pickup_location(
     Returns:
         message: Pickup location updated successfully
     """
-    user = jwt_service.get_user(email=current_user.email, db=db)
+    user = current_user
 
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-
-    pickup_location = (
-        db.query(PickupLocation)
-        .filter(PickupLocation.id == pickup_location_update_data.id)
-        .first()
+    pickup_location = await fetch_one(
+        db,
+        select(PickupLocation).filter(
+            PickupLocation.id == pickup_location_update_data.id
+        ),
     )
 
     if pickup_location is None:
@@ -288,9 +308,9 @@ def update_pickup_location(
             setattr(pickup_location, "city", pickup_location_update_data.city)
 
         db.add(pickup_location)
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -299,10 +319,10 @@ def update_pickup_location(
 
 
 @router.delete("/pickup/delete/{pk}")
-def delete_pickup_location(
+async def delete_pickup_location(
     pk: int,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to delete pickup location
 
@@ -311,7 +331,7 @@ def delete_pickup_location(
         current_user (Any, optional):
                 Currently logged in.
             Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, Pickup location not found
@@ -321,9 +341,11 @@ def delete_pickup_location(
     Returns:
         message: Pickup location deleted successfully
     """
-    _, user_profile = get_user_and_profile(current_user, db)
+    _, user_profile = await get_user_and_profile(current_user, db)
 
-    pickup_location = db.query(PickupLocation).filter(PickupLocation.id == pk).first()
+    pickup_location = await fetch_one(
+        db, select(PickupLocation).filter(PickupLocation.id == pk)
+    )
     if pickup_location is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Pickup location not found"
@@ -336,10 +358,10 @@ def delete_pickup_location(
         )
 
     try:
-        db.delete(pickup_location)
-        db.commit()
+        await db.delete(pickup_location)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -348,32 +370,31 @@ def delete_pickup_location(
 
 
 @router.post("/contact/post", response_model=ContactInformationResponse)
-def create_additional_contact(
+async def create_additional_contact(
     user_contact: ContactInformationCreate,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """Create Additional Contact Information
 
     Args:
         current_user (Object, optional):
             Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): Database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): Database. Defaults to Depends(get_async_session).
 
     Returns:
         success message: Pickup location created successfully
     """
 
-    _, user_profile = get_user_and_profile(current_user, db)
+    _, user_profile = await get_user_and_profile(current_user, db)
 
     contact_email = user_contact.contact_email
     contact_phone = user_contact.contact_phone
     if contact_email is not None:
-        contact_email_exists = (
-            db.query(ContactInformation)
-            .with_entities(ContactInformation.id)
-            .filter(ContactInformation.contact_email.ilike(contact_email))
-            .first()
+        contact_email_exists = await db.scalar(
+            select(ContactInformation.id).filter(
+                ContactInformation.contact_email.ilike(contact_email)
+            )
         )
         if contact_email_exists:
             raise HTTPException(
@@ -381,11 +402,10 @@ def create_additional_contact(
                 detail="Contact email already exists",
             )
     if contact_phone is not None:
-        contact_phone_exists = (
-            db.query(ContactInformation)
-            .with_entities(ContactInformation.id)
-            .filter(ContactInformation.contact_phone == contact_phone)
-            .first()
+        contact_phone_exists = await db.scalar(
+            select(ContactInformation.id).filter(
+                ContactInformation.contact_phone == contact_phone
+            )
         )
         if contact_phone_exists:
             raise HTTPException(
@@ -397,9 +417,9 @@ def create_additional_contact(
         db_item_data["user_id"] = user_profile.id
         contact = ContactInformation(**db_item_data)
         db.add(contact)
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -408,35 +428,34 @@ def create_additional_contact(
 
 
 @router.get("/contact/get", response_model=ContactInformationResponseSchemaTotal)
-def get_contact_information(
-    current_user=Depends(jwt_service.get_current_user), db: Session = Depends(get_db)
+async def get_contact_information(
+    current_user=Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_read_session),
 ):
     """API to get contact information
 
     Args:
         current_user (Any, optional):
             Currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): Database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): Database. Defaults to Depends(get_read_session).
 
     Returns:
         PickupLocation: Pickup location
     """
-    _, user_profile = get_user_and_profile(current_user, db)
+    _, user_profile = await get_user_and_profile(current_user, db)
 
-    contact_information = (
-        db.query(ContactInformation)
-        .filter(ContactInformation.user_id == user_profile.id)
-        .all()
+    contact_information = await fetch_all(
+        db,
+        select(ContactInformation).filter(
+            ContactInformation.user_id == user_profile.id
+        ),
     )
 
     if not contact_information:
         return {"message": "No contact information found"}
 
-    total = (
-        db.query(ContactInformation)
-        .with_entities(func.count(ContactInformation.id))
-        .scalar()
-    )  # pylint: disable=not-callable
+    # Every row of the user is already loaded
+    total = len(contact_information)
 
     response = {"total": total, "contact_information": contact_information}
 
@@ -444,10 +463,10 @@ def get_contact_information(
 
 
 @router.put("/contact/update")
-def update_additional_contact(
+async def update_additional_contact(
     contact_information_data: ContactInformationUpdateSchema = Depends(),
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to update contact information
 
@@ -462,7 +481,7 @@ def update_additional_contact(
         current_user (Any, optional):
                 Currently logged in user.
             Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): _description_. Defaults to Depends(get_db).
+        db (AsyncSession, optional): _description_. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, User not found
@@ -473,17 +492,13 @@ def update_additional_contact(
     Returns:
         message: Contact information updated successfully
     """
-    user = jwt_service.get_user(email=current_user.email, db=db)
+    user = current_user
 
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-
-    contact_information = (
-        db.query(ContactInformation)
-        .filter(ContactInformation.id == contact_information_data.id)
-        .first()
+    contact_information = await fetch_one(
+        db,
+        select(ContactInformation).filter(
+            ContactInformation.id == contact_information_data.id
+        ),
     )
 
     if contact_information is None:
@@ -530,9 +545,9 @@ def update_additional_contact(
                 contact_information_data.contact_type,
             )
         db.add(contact_information)
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -541,10 +556,10 @@ def update_additional_contact(
 
 
 @router.delete("/contact/delete/{pk}")
-def delete_additional_contact(
+async def delete_additional_contact(
     pk: int,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to delete contact information
 
@@ -553,7 +568,7 @@ def delete_additional_contact(
         current_user (Any, optional):
                 Currently logged in user.
             Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: 404, Contact information not found
@@ -563,9 +578,11 @@ def delete_additional_contact(
     Returns:
         message: Contact information deleted successfully
     """
-    _, user_profile = get_user_and_profile(current_user, db)
+    _, user_profile = await get_user_and_profile(current_user, db)
 
-    contact = db.query(ContactInformation).filter(ContactInformation.id == pk).first()
+    contact = await fetch_one(
+        db, select(ContactInformation).filter(ContactInformation.id == pk)
+    )
     if contact is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -579,10 +596,10 @@ def delete_additional_contact(
         )
 
     try:
-        db.delete(contact)
-        db.commit()
+        await db.delete(contact)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
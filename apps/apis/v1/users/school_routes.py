@@ -1,3 +1,5 @@
+from typing import Optional
+
 from tabnanny import check
 from fastapi import (
     APIRouter,
@@ -7,9 +9,10 @@ from fastapi import (
     status,
 )
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from apps.config.db.conn import get_db
+from apps.config.db.conn import get_async_session, get_read_session
 from apps.core.models.school_organization import School
 from apps.core.schemas.school_organization import (
     SchoolOrganizationCreate,
@@ -18,14 +21,25 @@ from apps.core.schemas.school_organization import (
     SchoolUpdateSchema,
 )
 from apps.rbac.role_permission_decorator import check_role_permissions
+from apps.utils.database_utils import (
+    fetch_one,
+    keyset_order,
+    paginate,
+    statement_cache,
+)
 
 
 router = APIRouter(prefix="/school", tags=["school"])
 
 
 @router.post("/create")
-def create_school(school_data: SchoolOrganizationCreate, db: Session = Depends(get_db)):
-    school_exist = db.query(School).filter(School.name == school_data.name).first()
+async def create_school(
+    school_data: SchoolOrganizationCreate,
+    db: AsyncSession = Depends(get_async_session),
+):
+    school_exist = await fetch_one(
+        db, select(School).filter(School.name == school_data.name)
+    )
 
     if school_exist:
         raise HTTPException(
@@ -36,10 +50,10 @@ def create_school(school_data: SchoolOrganizationCreate, db: Session = Depends(g
 
     try:
         db.add(school)
-        db.commit()
-        db.refresh(school)
+        await db.commit()
+        await db.refresh(school)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -49,27 +63,37 @@ def create_school(school_data: SchoolOrganizationCreate, db: Session = Depends(g
 
 # @router.get("/get", response_model=SchoolResponseSchemaTotal)
 @router.get("/get")
-def get_school(
+async def get_school(
     offset: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
 ):
-    school = db.query(School).filter(School.is_deleted == False)
+    school = statement_cache.get(
+        ("schools",),
+        lambda: keyset_order(
+            select(School).filter(School.is_deleted == False), School.id, School.id
+        ),
+    )
+
+    page = await paginate(db, school, offset, limit, cursor=cursor)
 
     response = {
-        "total_count": school.count(),
-        "school": school.limit(limit).offset(offset).all(),
+        "total_count": page.total,
+        "total_exact": page.total_exact,
+        "school": page.items,
+        "next_cursor": page.next_cursor,
     }
 
     return response
 
 
 @router.get("/get/{school_id}", response_model=SchoolResponseSchema)
-def get_school_by_id(
+async def get_school_by_id(
     school_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_session),
 ):
-    school = db.query(School).filter(School.id == school_id).first()
+    school = await fetch_one(db, select(School).filter(School.id == school_id))
 
     if getattr(school, "is_deleted"):
         raise HTTPException(
@@ -85,12 +109,12 @@ def get_school_by_id(
 
 
 @router.put("/update/{school_id}")
-def update_school(
+async def update_school(
     school_id: int,
     school_data: SchoolUpdateSchema,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
-    school = db.query(School).filter(School.id == school_id).first()
+    school = await fetch_one(db, select(School).filter(School.id == school_id))
 
     if not school:
         raise HTTPException(
@@ -101,9 +125,9 @@ def update_school(
         for key, value in school_data.model_dump().items():
             setattr(school, key, value)
 
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
@@ -113,11 +137,11 @@ def update_school(
 
 @router.delete("/delete/{school_id}")
 @check_role_permissions(["ADMIN"])
-def delete_school(
+async def delete_school(
     school_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
-    school = db.query(School).filter(School.id == school_id).first()
+    school = await fetch_one(db, select(School).filter(School.id == school_id))
 
     if not school:
         raise HTTPException(
@@ -126,10 +150,10 @@ def delete_school(
 
     try:
         setattr(school, "is_deleted", True)
-        db.commit()
+        await db.commit()
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         ) from e
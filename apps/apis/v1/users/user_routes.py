@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, Form, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, status
+from sqlalchemy import Select, select, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from apps.apis.v1.users.filter_sort import Filter, Sort
 from apps.common.enum import (
+    ExportFormatEnum,
     RoleEnum,
     RoleFilterEnum,
     RoleUpdateEnum,
 )
-from apps.config.db.conn import get_db
+from apps.config import settings
+from apps.config.db.conn import get_async_session, get_read_session
 from apps.core.models.school_organization import School
 from apps.core.models.users import Role, Users, Profile
 from apps.core.schemas.user import (
@@ -16,10 +21,29 @@ from apps.core.schemas.user import (
     AdminUserCreateSchema,
     UserResponseSchema,
     UserFilterSchema,
+    UserSearchResponseSchema,
 )
 from apps.rbac.role_permission_decorator import check_role_permissions
 from apps.security.auth import jwt_service
-from apps.services.send_email import send_email
+from apps.security.email_filter import email_filter
+from apps.security.principal import Principal, principal_cache
+from apps.security.revocation import revocation_store
+from apps.services.email_outbox import (
+    enqueue_email,
+    enqueue_email_once,
+    outbox_worker,
+    verification_email_key,
+)
+from apps.services.user_search import search_users
+from apps.utils.database_utils import (
+    fetch_all,
+    fetch_one,
+    load_fields,
+    paginate,
+    statement_cache,
+)
+from apps.utils.export import export_response
+from apps.utils.sparse_fields import parse_fields, sparse_response
 
 
 router = APIRouter(prefix="/user", tags=["user"])
@@ -27,15 +51,10 @@ router = APIRouter(prefix="/user", tags=["user"])
 
 @router.post("/verifies")
 async def verify_user(
-    current_user: Users = Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_async_session),
 ):
-    user = jwt_service.get_user(db=db, email=current_user.email)
-
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
+    user = current_user
 
     if user.is_verified:
         raise HTTPException(
@@ -51,96 +70,191 @@ async def verify_user(
         "verification_link": verification_link,
     }
 
-    await send_email(
+    _, created = await enqueue_email_once(
+        db,
+        dedupe_key=verification_email_key(user.id),
+        window_seconds=settings.VERIFICATION_EMAIL_RESEND_SECONDS,
         subject="Verification email",
         receiver=[user.email],
         body=email_body,
         template_name="verification_user_template.html",
     )
+    if created:
+        await db.commit()
+        outbox_worker.notify()
 
     return {"message": "Verification email sent successfully"}
 
 
+def users_query(
+    user_filter_params: UserFilterSchema, user_fields: Optional[tuple[str, ...]]
+) -> tuple[Select, dict]:
+    """Filtered and sorted users statement of the list and the export
+
+    Returns:
+        tuple[Select, dict]: statement without a limit, its parameters
+    """
+    filter_params = {
+        "first_name": user_filter_params.first_name,
+        "email": user_filter_params.email,
+        "city": user_filter_params.city,
+        "state": user_filter_params.state,
+        "zip_code": user_filter_params.zip_code,
+        "role": user_filter_params.role,
+        "school": user_filter_params.school,
+    }
+
+    params = Filter().user_params(**filter_params)
+    sort, order = user_filter_params.sort, user_filter_params.order
+
+    query = statement_cache.get(
+        ("users", tuple(sorted(params)), sort, order, user_fields),
+        lambda: load_fields(
+            Sort().sorting_users(
+                query=Filter().filter_users(select(Users), **params),
+                sort=sort,
+                order=order,
+            ),
+            Users,
+            user_fields,
+        ),
+    )
+    return query, params
+
+
 @router.get("/get", response_model=UserResponseSchemaTotal)
 # @check_role_permissions(["ADMIN", "CSR", "INSTRUCTOR"]) # Disabled for now
-def get_user_sort_filter(
+async def get_user_sort_filter(
     offset: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     user_filter_params: UserFilterSchema = Depends(),
     # current_user = Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_session),
 ):
     """
     Router to get user profile(for CSR, ADMIN, INSTRUCTOR)
 
     Args:
-        db (Session, optional): CTX. Defaults to Depends(get_db).
+        fields (str, optional): Comma separated fields of each user to
+            return, eg. id,first_name. Defaults to None, all fields.
+        db (AsyncSession, optional): CTX. Defaults to Depends(get_read_session).
     """
+    user_fields = parse_fields(fields, UserResponseSchema)
+    query, params = users_query(user_filter_params, user_fields)
 
-    query = db.query(Users)
+    page = await paginate(db, query, offset, limit, params, cursor)
 
-    filter_params = {
-        "first_name": user_filter_params.first_name,
-        "email": user_filter_params.email,
-        "city": user_filter_params.city,
-        "state": user_filter_params.state,
-        "zip_code": user_filter_params.zip_code,
-        "role": user_filter_params.role,
-        "school": user_filter_params.school,
+    response = {
+        "total_count": page.total,
+        "total_exact": page.total_exact,
+        "users": page.items,
+        "next_cursor": page.next_cursor,
     }
 
-    query = Filter().filter_users(query, **filter_params)
-    query = Sort().sorting_users(
-        query=query, sort=user_filter_params.sort, order=user_filter_params.order
+    if user_fields:
+        return sparse_response(
+            UserResponseSchemaTotal, user_fields, response, items_key="users"
+        )
+    return response
+
+
+@router.get("/export")
+@check_role_permissions(["ADMIN", "CSR"])
+async def export_users(
+    fields: Optional[str] = None,
+    export_format: ExportFormatEnum = Query(ExportFormatEnum.CSV, alias="format"),
+    user_filter_params: UserFilterSchema = Depends(),
+    current_user=Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """Stream every user matching the filters of GET /user/get
+
+    Args:
+        fields (str, optional): Comma separated fields of each user to
+            export, eg. id,first_name. Defaults to None, all fields.
+        export_format (ExportFormatEnum, optional): format query param, csv
+            or ndjson. Defaults to csv.
+        user_filter_params (UserFilterSchema, optional): Same filters and sort
+            as the list. Defaults to Depends().
+        current_user (Any, optional):
+                Used for check_role_permissions decorator DO NOT REMOVE.
+            Defaults to Depends(jwt_service.get_current_user).
+        db (AsyncSession, optional): CTX. Defaults to Depends(get_read_session).
+
+    Returns:
+        StreamingResponse: users.csv or users.ndjson attachment
+    """
+    user_fields = parse_fields(fields, UserResponseSchema)
+    query, params = users_query(user_filter_params, user_fields)
+    return export_response(
+        db, query, params, UserResponseSchema, user_fields, export_format, "users"
     )
 
-    total_count = query.with_entities(Users.id, Users.role)
 
-    if user_filter_params.role in [RoleFilterEnum.ALL, RoleFilterEnum.NOT_STUDENT]:
-        total_count = query.count()
-    else:
-        total_count = query.filter(Users.role == user_filter_params.role).count()
+@router.get("/search", response_model=UserSearchResponseSchema)
+@check_role_permissions(["ADMIN", "CSR", "INSTRUCTOR"])
+async def search_user(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(10, ge=1, le=settings.USER_SEARCH_MAX_RESULTS),
+    current_user=Depends(jwt_service.get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """API to search users by first or last name, email, city or cell phone
 
-    response = {
-        "total_count": total_count,
-        "users": query.offset(offset).limit(limit).all(),
-    }
+    Args:
+        q (str): Search text, typos and partial words are matched
+        limit (int, optional): Defaults to 10.
+        current_user (Object, optional): currently logged in user. Defaults to Depends(jwt_service.get_current_user).
+        db (AsyncSession, optional): Database. Defaults to Depends(get_read_session).
 
-    return response
+    Returns:
+        response: results, best match first with a rank from 0 to 1
+    """
+    return {"results": await search_users(db, q.strip(), limit)}
 
 
 @router.get("/get/{pk}", response_model=UserResponseSchema)
 @check_role_permissions(["ADMIN", "CSR", "INSTRUCTOR"])  # Disabled for now
-def get_user_by_id(
+async def get_user_by_id(
     pk: int,
+    fields: Optional[str] = None,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_session),
 ):
     """API to get user by ID
 
     Args:
         pk (int): User ID
+        fields (str, optional): Comma separated fields to return. Defaults to
+            None, all fields.
         current_user (Object, optional): currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): Database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): Database. Defaults to Depends(get_read_session).
 
     Returns:
         User object: User object
     """
 
-    user = db.query(Users).filter(Users.id == pk).first()
+    user_fields = parse_fields(fields, UserResponseSchema)
+    user = await fetch_one(
+        db, load_fields(select(Users).filter(Users.id == pk), Users, user_fields)
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    if user_fields:
+        return sparse_response(UserResponseSchema, user_fields, user)
     return user
 
 
 @router.patch("/update/role/{pk}")
 # @check_role_permissions(["ADMIN", "CSR"]) # Disabled for now
-def update_user_role(
+async def update_user_role(
     pk: int,
     role: RoleUpdateEnum = RoleUpdateEnum.STUDENT,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """API to change user role
 
@@ -148,7 +262,7 @@ def update_user_role(
         pk (int): User ID
         role (RoleEnum, optional): Roles are STUDENT, INSTRUCTOR, CSR, ADMIN. Defaults to RoleEnum.STUDENT.
         current_user (Object, optional): currently logged in user. Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): Database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): Database. Defaults to Depends(get_async_session).
 
     Returns:
         success message: Role updated successfully
@@ -160,8 +274,10 @@ def update_user_role(
     ]:
         return {"message": "Invalid role"}
 
-    db.query(Users).filter(Users.id == pk).update({"role": role})
-    db.commit()
+    await db.execute(update(Users).filter(Users.id == pk).values(role=role))
+    await db.commit()
+    principal_cache.invalidate(user_id=pk)
+    await revocation_store.revoke_user(db, pk)
 
     return {"message": "Role updated successfully"}
 
@@ -171,7 +287,7 @@ def update_user_role(
 async def create_user_admin(
     user_data: AdminUserCreateSchema,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """
     Router to create user profile(for ADMIN, CSR)
@@ -182,7 +298,7 @@ async def create_user_admin(
 
     db_item_data = user_data.model_dump(exclude_unset=True, exclude={"school"})
     password = db_item_data.pop("password")
-    hash_password = jwt_service.get_password_hash(password)
+    hash_password = await jwt_service.get_password_hash(password)
     db_item_data["password"] = hash_password
 
     profile_data = {
@@ -201,7 +317,9 @@ async def create_user_admin(
     obj = Users(**db_item_data)
 
     if user_data.school:
-        schools = db.query(School).filter(School.name.in_(user_data.school)).all()
+        schools = await fetch_all(
+            db, select(School).filter(School.name.in_(user_data.school))
+        )
         if len(schools) != len(user_data.school):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -212,26 +330,12 @@ async def create_user_admin(
 
     try:
         db.add(obj)
-        db.commit()
-        db.refresh(obj)
+        await db.flush()
 
         profile_data["user_id"] = obj.id
         user_profile = Profile(**profile_data)
         db.add(user_profile)
-        db.commit()
-        db.refresh(user_profile)
-    except IntegrityError as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="User already exists"
-        ) from e
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{str(e)}"
-        ) from e
 
-    try:
         if obj.role is RoleEnum.STUDENT:
             token = jwt_service.create_verification_token(data={"user_id": obj.id})
 
@@ -244,7 +348,8 @@ async def create_user_admin(
                 "redirect_link": redirect_link,
             }
 
-            await send_email(
+            enqueue_email(
+                db,
                 subject="Verification email",
                 receiver=[obj.email],
                 body=email_body,
@@ -258,33 +363,43 @@ async def create_user_admin(
                 "password": password,
             }
 
-            await send_email(
+            enqueue_email(
+                db,
                 subject="Verification email",
                 receiver=[obj.email],
                 body=email_body,
                 template_name="verification_admin_template.html",
             )
+
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="User already exists"
+        ) from e
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Unable to send email",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{str(e)}"
         ) from e
 
+    email_filter.add(obj.email)
+    outbox_worker.notify()
+
     return {"message": "User created successfully"}
 
 
 @router.post("/verify/password")
-def verify_user_and_change_password(
+async def verify_user_and_change_password(
     token: str,
     new_password: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     try:
         payload = jwt_service.decode_verification_token(token)
         user_id = payload.get("user_id")
 
-        user = db.query(Users).filter(Users.id == user_id).first()
+        user = await fetch_one(db, select(Users).filter(Users.id == user_id))
 
         if not user:
             raise HTTPException(
@@ -297,31 +412,35 @@ def verify_user_and_change_password(
 
     try:
         setattr(user, "is_verified", True)
-        db.commit()
+        await db.commit()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=f"{str(e)}"
         ) from e
 
     try:
-        hash_password = jwt_service.get_password_hash(new_password)
+        hash_password = await jwt_service.get_password_hash(new_password)
         setattr(user, "password", hash_password)
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{str(e)}"
         ) from e
+    finally:
+        principal_cache.invalidate(user_id=user.id)
+
+    await revocation_store.revoke_user(db, user.id)
 
     return {"message": "Password updated successfully"}
 
 
 @router.delete("/delete/{pk}")
 @check_role_permissions(["ADMIN"])
-def delete_user(
+async def delete_user(
     pk: int,
     current_user=Depends(jwt_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
 ):
     """Route to delete user
 
@@ -329,21 +448,23 @@ def delete_user(
         pk (int): user id
         current_user (_type_, optional): Used for role permission decorator DO NOT remove.
                                         Defaults to Depends(jwt_service.get_current_user).
-        db (Session, optional): CTX database. Defaults to Depends(get_db).
+        db (AsyncSession, optional): CTX database. Defaults to Depends(get_async_session).
     """
 
-    user = db.query(Users).filter(Users.id == pk).first()
+    user = await fetch_one(db, select(Users).filter(Users.id == pk))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user_profile = db.query(Profile).filter(Profile.user_id == pk).first()
+    user_profile = await fetch_one(db, select(Profile).filter(Profile.user_id == pk))
     if not user_profile:
         raise HTTPException(status_code=404, detail="User profile not found")
 
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
 
-    db.delete(user_profile)
-    db.commit()
+    await db.delete(user_profile)
+    await db.commit()
+    principal_cache.invalidate(user_id=pk)
+    await revocation_store.revoke_user(db, pk)
 
     return {"message": "User deleted successfully"}
@@ -83,3 +83,19 @@ class TransactionSortEnum(str, Enum):
     CREATED_AT = "CREATED_AT"
     UPDATED_AT = "UPDATED_AT"
     TRANSACTION_ID = "TRANSACTION_ID"
+
+
+class EmailStatusEnum(str, Enum):
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+
+class NotificationStatusEnum(str, Enum):
+    EXPANDING = "EXPANDING"
+    ENQUEUED = "ENQUEUED"
+
+
+class ExportFormatEnum(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
@@ -37,6 +37,18 @@ class CredentialsException(Exception):
         super().__init__(self.message)
 
 
+class InvalidTokenException(Exception):
+    """Exception class to handle invalid, tampered or expired tokens
+
+    Args:
+        Exception (class): Base class for exceptions in this module
+    """
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
 class RequestValidationError(HTTPException):
     """Exception class to handle request validation error
 
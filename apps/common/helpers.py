@@ -1,25 +1,23 @@
 from fastapi import status, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from apps.core.models import (
     Profile,
 )
 from apps.core.schemas import user
 
-from apps.security.auth import jwt_service
+from apps.security.principal import Principal
+from apps.utils.database_utils import fetch_one
 
 
-def get_user_and_profile(current_user, db: Session):
-    user = jwt_service.get_user(email=current_user.email, db=db)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-
-    user_profile = db.query(Profile).filter(Profile.user_id == user.id).first()
+async def get_user_and_profile(current_user: Principal, db: AsyncSession):
+    user_profile = await fetch_one(
+        db, select(Profile).filter(Profile.user_id == current_user.id)
+    )
     if user_profile is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
         )
 
-    return user, user_profile
+    return current_user, user_profile
@@ -3,15 +3,72 @@ from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy import create_engine
 
+from apps.config.db.pool import (
+    MeteredAsyncAdaptedQueuePool,
+    MeteredQueuePool,
+    pool_options,
+)
+from apps.config.db.telemetry import instrument_engine
+
+
+def statement_cache_options(url: str) -> dict:
+    """Compiled statement and prepared statement cache sizes for an engine
+
+    Args:
+        url (str): Database url the engine connects to
+
+    Returns:
+        dict: create_engine keyword arguments
+    """
+    options = {"query_cache_size": settings.QUERY_CACHE_SIZE}
+    if url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {
+            "prepared_statement_cache_size": (
+                settings.ASYNCPG_PREPARED_STATEMENT_CACHE_SIZE
+            )
+        }
+    return options
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URL, echo=True)
+
+engine = create_engine(
+    settings.SQLALCHEMY_DATABASE_URL,
+    echo=settings.DATABASE_ECHO,
+    poolclass=MeteredQueuePool,
+    **pool_options("primary-sync"),
+    **statement_cache_options(settings.SQLALCHEMY_DATABASE_URL),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine)
 
 
-async_engine = create_async_engine(settings.ASYNC_SQLALCHEMY_DATABASE_URL, echo=True)
+async_engine = create_async_engine(
+    settings.ASYNC_SQLALCHEMY_DATABASE_URL,
+    echo=settings.DATABASE_ECHO,
+    poolclass=MeteredAsyncAdaptedQueuePool,
+    **pool_options("primary"),
+    **statement_cache_options(settings.ASYNC_SQLALCHEMY_DATABASE_URL),
+)
 async_session_maker = async_sessionmaker(
     async_engine, expire_on_commit=False, class_=AsyncSession
 )
+instrument_engine(async_engine.sync_engine)
+
+if settings.ASYNC_SQLALCHEMY_REPLICA_DATABASE_URL:
+    async_replica_engine = create_async_engine(
+        settings.ASYNC_SQLALCHEMY_REPLICA_DATABASE_URL,
+        echo=settings.DATABASE_ECHO,
+        poolclass=MeteredAsyncAdaptedQueuePool,
+        **pool_options("replica"),
+        **statement_cache_options(settings.ASYNC_SQLALCHEMY_REPLICA_DATABASE_URL),
+    )
+    async_replica_session_maker = async_sessionmaker(
+        async_replica_engine, expire_on_commit=False, class_=AsyncSession
+    )
+    instrument_engine(async_replica_engine.sync_engine)
+else:
+    # No replica configured, reads go to the primary
+    async_replica_engine = async_engine
+    async_replica_session_maker = async_session_maker
 
 
 class Base(DeclarativeBase):
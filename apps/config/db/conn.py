@@ -1,12 +1,17 @@
 from typing import AsyncGenerator
 from contextlib import contextmanager
+from fastapi import Request
 from sqlalchemy.orm import scoped_session
-from apps.config.db.base import async_session_maker, SessionLocal
+from apps.config.db.base import (
+    async_replica_session_maker,
+    async_session_maker,
+    SessionLocal,
+)
+from apps.config.db.routing import use_primary_for_reads
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 def get_db() -> SessionLocal:  # type: ignore
-    print("Connecting to database...")
     db = SessionLocal()
     try:
         yield db
@@ -28,3 +33,18 @@ def db_session():
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         yield session
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only routes
+
+    Uses the read replica unless the client wrote recently, in which case the
+    primary is used so the client reads its own writes.
+    """
+    if use_primary_for_reads(request):
+        session_maker = async_session_maker
+    else:
+        session_maker = async_replica_session_maker
+
+    async with session_maker() as session:
+        yield session
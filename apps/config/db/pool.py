@@ -0,0 +1,127 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from apps.config import settings
+
+
+class PoolMetrics:
+    """Counters collected while connections are checked out of a pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_checkout(self, wait_time: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def record_timeout(self, wait_time: float):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def snapshot(self, pool: Pool) -> dict:
+        """Current pool occupancy together with the collected counters
+
+        Args:
+            pool (Pool): Pool the counters belong to
+
+        Returns:
+            dict: pool metrics
+        """
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": getattr(pool, "_max_overflow", 0),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_time_avg_ms": round(
+                    self.wait_time_total / attempts * 1000 if attempts else 0.0, 3
+                ),
+                "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+            }
+
+
+_pool_metrics: dict[str, PoolMetrics] = {}
+
+
+def get_pool_metrics(name: str) -> PoolMetrics:
+    """Return the metrics registered for a pool, creating them on first use"""
+    if name not in _pool_metrics:
+        _pool_metrics[name] = PoolMetrics()
+    return _pool_metrics[name]
+
+
+class MeteredPoolMixin:
+    """Times every checkout and counts checkout timeouts
+
+    Metrics are keyed by the pool's logging name so that they survive
+    ``Pool.recreate()`` on engine dispose.
+    """
+
+    def _do_get(self):
+        metrics = get_pool_metrics(self._orig_logging_name)
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            metrics.record_timeout(time.perf_counter() - started)
+            raise
+        metrics.record_checkout(time.perf_counter() - started)
+        return connection
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncAdaptedQueuePool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(name: str) -> dict:
+    """Pool tuning keyword arguments shared by the sync and async engines
+
+    Args:
+        name (str): Pool name used for logging and for metrics lookup
+
+    Returns:
+        dict: create_engine keyword arguments
+    """
+    return {
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+        "pool_logging_name": name,
+    }
+
+
+def collect_pool_metrics(*pools: Pool) -> dict:
+    """Snapshot every given pool keyed by its name
+
+    Args:
+        *pools (Pool): Pools to report on
+
+    Returns:
+        dict: pool name -> pool metrics
+    """
+    report = {}
+    for pool in pools:
+        name = pool._orig_logging_name
+        report[name] = get_pool_metrics(name).snapshot(pool)
+    return report
@@ -0,0 +1,80 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request
+
+from apps.config import settings
+
+
+PRIMARY_PIN_COOKIE = "primary_pin"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadYourWritesTracker:
+    """Remembers which clients wrote recently so their reads hit the primary
+
+    Clients are identified by their bearer token, or by their address when
+    unauthenticated. The map is bounded; the oldest pins are dropped first.
+    """
+
+    def __init__(self, window_seconds: int, max_entries: int = 10000):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._pins: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pin(self, key: str):
+        with self._lock:
+            self._pins[key] = time.monotonic() + self.window_seconds
+            self._pins.move_to_end(key)
+            while len(self._pins) > self.max_entries:
+                self._pins.popitem(last=False)
+
+    def is_pinned(self, key: str) -> bool:
+        with self._lock:
+            pinned_until = self._pins.get(key)
+            if pinned_until is None:
+                return False
+            if pinned_until < time.monotonic():
+                del self._pins[key]
+                return False
+            return True
+
+
+read_your_writes = ReadYourWritesTracker(settings.READ_YOUR_WRITES_SECONDS)
+
+
+def client_key(request: Request) -> str:
+    """Identify the client behind a request for read-your-writes pinning"""
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return hashlib.sha1(authorization.encode()).hexdigest()
+    return request.client.host if request.client else ""
+
+
+def use_primary_for_reads(request: Request) -> bool:
+    """Whether reads of this request must see the client's latest writes"""
+    pinned_until = request.cookies.get(PRIMARY_PIN_COOKIE)
+    if pinned_until and pinned_until.isdigit() and int(pinned_until) > time.time():
+        return True
+    return read_your_writes.is_pinned(client_key(request))
+
+
+async def pin_primary_after_write(request: Request, call_next):
+    """Middleware pinning a client's reads to the primary after a write
+
+    The pin is kept in process and mirrored into a cookie so that it also
+    holds when the next request lands on another worker.
+    """
+    response = await call_next(request)
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        read_your_writes.pin(client_key(request))
+        response.set_cookie(
+            PRIMARY_PIN_COOKIE,
+            str(int(time.time()) + settings.READ_YOUR_WRITES_SECONDS),
+            max_age=settings.READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+        )
+    return response
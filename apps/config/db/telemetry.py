@@ -0,0 +1,253 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+from apps.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+MAX_FINGERPRINTS = 1000
+OVERFLOW_FINGERPRINT = "<other>"
+DURATION_SAMPLES = 512
+
+_comment = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_string = re.compile(r"'(?:[^']|'')*'")
+_number = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+_bind = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+|\?")
+_in_list = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_whitespace = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Normalize a SQL statement so that executions differing only in
+    literals, bind parameters or IN list length share one fingerprint
+
+    Args:
+        statement (str): SQL as sent to the driver
+
+    Returns:
+        str: normalized statement
+    """
+    normalized = _comment.sub(" ", statement)
+    normalized = _string.sub("?", normalized)
+    normalized = _number.sub("?", normalized)
+    normalized = _bind.sub("?", normalized)
+    normalized = _in_list.sub("(?)", normalized)
+    return _whitespace.sub(" ", normalized).strip()
+
+
+class FingerprintStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.durations: deque[float] = deque(maxlen=DURATION_SAMPLES)
+
+    def record(self, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.durations.append(duration)
+
+    def p95(self) -> float:
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class QueryTelemetry:
+    """In-memory per-fingerprint query statistics
+
+    Durations are aggregated for every statement; the types of the
+    parameters are only kept for a sampled fraction of executions. Statement
+    literals and parameter values are never kept, they hold OTPs, password
+    hashes and token ids.
+    """
+
+    def __init__(self, sample_rate: float, n_plus_one_threshold: int):
+        self.sample_rate = sample_rate
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self._stats: dict[str, FingerprintStats] = {}
+        self.samples: deque[dict] = deque(maxlen=100)
+        self.n_plus_one: deque[dict] = deque(maxlen=100)
+        self.compiled_cache: Counter = Counter()
+        self.prepared_cache: Counter = Counter()
+
+    def record_cache(self, compiled: Optional[str], prepared: Optional[str]):
+        """Count compiled statement and prepared statement cache outcomes
+
+        Args:
+            compiled (str, optional): "hit", "miss" or "uncached"
+            prepared (str, optional): "hit" or "miss", None when the driver
+                has no prepared statement cache
+        """
+        with self._lock:
+            if compiled:
+                self.compiled_cache[compiled] += 1
+            if prepared:
+                self.prepared_cache[prepared] += 1
+
+    def record(self, statement: str, parameters, duration: float):
+        key = fingerprint(statement)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= MAX_FINGERPRINTS:
+                    key = OVERFLOW_FINGERPRINT
+                stats = self._stats.setdefault(key, FingerprintStats())
+            stats.record(duration)
+
+            if self.sample_rate and random.random() < self.sample_rate:
+                self.samples.append(
+                    {
+                        "fingerprint": key,
+                        "parameters": _parameter_types(parameters),
+                        "duration_ms": round(duration * 1000, 3),
+                    }
+                )
+
+        return key
+
+    def record_request(self, method: str, path: str, fingerprints: Counter):
+        """Flag fingerprints executed suspiciously often in one request"""
+        for key, executions in fingerprints.items():
+            if executions < self.n_plus_one_threshold:
+                continue
+            report = {
+                "method": method,
+                "path": path,
+                "fingerprint": key,
+                "executions": executions,
+            }
+            with self._lock:
+                self.n_plus_one.append(report)
+            logger.warning("Possible N+1 query: %s", report)
+
+    def report(self, limit: int = 50) -> dict:
+        with self._lock:
+            queries = [
+                {
+                    "fingerprint": key,
+                    "count": stats.count,
+                    "total_ms": round(stats.total_time * 1000, 3),
+                    "mean_ms": round(stats.total_time / stats.count * 1000, 3),
+                    "p95_ms": round(stats.p95() * 1000, 3),
+                    "max_ms": round(stats.max_time * 1000, 3),
+                }
+                for key, stats in self._stats.items()
+            ]
+            samples = list(self.samples)
+            n_plus_one = list(self.n_plus_one)
+            caches = {
+                "compiled": _hit_rate(self.compiled_cache),
+                "prepared": _hit_rate(self.prepared_cache),
+            }
+
+        queries.sort(key=lambda query: query["total_ms"], reverse=True)
+        return {
+            "queries": queries[:limit],
+            "samples": samples,
+            "n_plus_one": n_plus_one,
+            "caches": caches,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.samples.clear()
+            self.n_plus_one.clear()
+            self.compiled_cache.clear()
+            self.prepared_cache.clear()
+
+
+def _parameter_types(parameters):
+    """Parameters with every value replaced by its type name"""
+    if isinstance(parameters, dict):
+        return {name: _parameter_types(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_parameter_types(value) for value in parameters]
+    return type(parameters).__name__
+
+
+def _hit_rate(outcomes: Counter) -> dict:
+    lookups = outcomes["hit"] + outcomes["miss"]
+    return {
+        **outcomes,
+        "hit_rate": round(outcomes["hit"] / lookups, 4) if lookups else 0.0,
+    }
+
+
+query_telemetry = QueryTelemetry(
+    sample_rate=settings.QUERY_SAMPLE_RATE,
+    n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+)
+
+_request_fingerprints: ContextVar[Optional[Counter]] = ContextVar(
+    "request_fingerprints", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # asyncpg keeps its prepared statements per connection, keyed by the SQL
+    prepared = getattr(
+        getattr(cursor, "_adapt_connection", None), "_prepared_statement_cache", None
+    )
+    context._query_prepared = (
+        None if prepared is None else ("hit" if statement in prepared else "miss")
+    )
+    context._query_started = time.perf_counter()
+
+
+def _compiled_cache_outcome(context) -> Optional[str]:
+    cache_hit = getattr(context, "cache_hit", None)
+    if cache_hit is CACHE_HIT:
+        return "hit"
+    if cache_hit is CACHE_MISS:
+        return "miss"
+    return "uncached" if getattr(context, "compiled", None) is not None else None
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._query_started
+    key = query_telemetry.record(statement, parameters, duration)
+    query_telemetry.record_cache(
+        _compiled_cache_outcome(context), context._query_prepared
+    )
+
+    fingerprints = _request_fingerprints.get()
+    if fingerprints is not None:
+        fingerprints[key] += 1
+
+
+def instrument_engine(engine: Engine):
+    """Attach query telemetry to a sync engine (use ``sync_engine`` for async)"""
+    if not settings.QUERY_TELEMETRY_ENABLED:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+async def track_request_queries(request: Request, call_next):
+    """Middleware counting fingerprints per request to detect N+1 patterns"""
+    fingerprints: Counter = Counter()
+    token = _request_fingerprints.set(fingerprints)
+    try:
+        return await call_next(request)
+    finally:
+        _request_fingerprints.reset(token)
+        query_telemetry.record_request(request.method, request.url.path, fingerprints)
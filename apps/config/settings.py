@@ -44,23 +44,165 @@ SQLALCHEMY_DATABASE_URL: str = config(
 ASYNC_SQLALCHEMY_DATABASE_URL: str = config(
     "ASYNC_SQLALCHEMY_DATABASE_URL", default="sqlite:///./test.db"
 )
+ASYNC_SQLALCHEMY_REPLICA_DATABASE_URL: str = config(
+    "ASYNC_SQLALCHEMY_REPLICA_DATABASE_URL", default=""
+)
+READ_YOUR_WRITES_SECONDS: int = config(
+    "READ_YOUR_WRITES_SECONDS", cast=int, default=10
+)
+DATABASE_ECHO: bool = config("DATABASE_ECHO", cast=bool, default=False)
+QUERY_TELEMETRY_ENABLED: bool = config(
+    "QUERY_TELEMETRY_ENABLED", cast=bool, default=True
+)
+QUERY_SAMPLE_RATE: float = config("QUERY_SAMPLE_RATE", cast=float, default=0.01)
+N_PLUS_ONE_THRESHOLD: int = config("N_PLUS_ONE_THRESHOLD", cast=int, default=10)
+QUERY_CACHE_SIZE: int = config("QUERY_CACHE_SIZE", cast=int, default=1200)
+STATEMENT_CACHE_SIZE: int = config("STATEMENT_CACHE_SIZE", cast=int, default=512)
+ASYNCPG_PREPARED_STATEMENT_CACHE_SIZE: int = config(
+    "ASYNCPG_PREPARED_STATEMENT_CACHE_SIZE", cast=int, default=500
+)
+# List totals above this planner estimate are not counted exactly
+COUNT_EXACT_THRESHOLD: int = config("COUNT_EXACT_THRESHOLD", cast=int, default=10000)
+COUNT_CACHE_TTL_SECONDS: float = config(
+    "COUNT_CACHE_TTL_SECONDS", cast=float, default=10
+)
+COUNT_CACHE_SIZE: int = config("COUNT_CACHE_SIZE", cast=int, default=1024)
+USER_SEARCH_MIN_SIMILARITY: float = config(
+    "USER_SEARCH_MIN_SIMILARITY", cast=float, default=0.3
+)
+USER_SEARCH_MAX_RESULTS: int = config("USER_SEARCH_MAX_RESULTS", cast=int, default=50)
+# Rows fetched per round trip of the server-side cursor of the exports
+EXPORT_BATCH_SIZE: int = config("EXPORT_BATCH_SIZE", cast=int, default=1000)
+DATABASE_POOL_SIZE: int = config("DATABASE_POOL_SIZE", cast=int, default=5)
+DATABASE_MAX_OVERFLOW: int = config("DATABASE_MAX_OVERFLOW", cast=int, default=10)
+DATABASE_POOL_TIMEOUT: float = config(
+    "DATABASE_POOL_TIMEOUT", cast=float, default=30.0
+)
+DATABASE_POOL_RECYCLE: int = config("DATABASE_POOL_RECYCLE", cast=int, default=1800)
+DATABASE_POOL_PRE_PING: bool = config(
+    "DATABASE_POOL_PRE_PING", cast=bool, default=True
+)
 
 SECRET_KEY: Secret = config("SECRET_KEY", default="secret")
 ALGORITHM: str = config("ALGORITHM", default="HS256")
+# jose or pyjwt (faster, needs PyJWT)
+JWT_BACKEND: str = config("JWT_BACKEND", default="jose")
+# Required for RS*/PS*/ES* algorithms; the public key is published as JWKS
+JWT_PRIVATE_KEY_PATH: str = config("JWT_PRIVATE_KEY_PATH", default="")
+JWT_PUBLIC_KEY_PATH: str = config("JWT_PUBLIC_KEY_PATH", default="")
+JWT_KEY_ID: str = config("JWT_KEY_ID", default="")
 ACCESS_TOKEN_EXPIRE_MINUTES: int = config("ACCESS_TOKEN_EXPIRE_MINUTES", default=300)
 ACCESS_TOKEN_IN_MINUTES: int = config("ACCESS_TOKEN_IN_MINUTES", default=60)
 REFRESH_TOKEN_TIME_IN_MINUTES: int = config(
     "REFRESH_TOKEN_TIME_IN_MINUTES", cast=int, default=3600
 )
 TOKEN_URL: str = config("TOKEN_URL", default="token")
+# Revoked refresh tokens are mirrored in memory and synced from the
+# token_revocations table every REVOCATION_SYNC_INTERVAL_SECONDS
+REVOCATION_SYNC_INTERVAL_SECONDS: int = config(
+    "REVOCATION_SYNC_INTERVAL_SECONDS", cast=int, default=5
+)
+REVOCATION_FILTER_CAPACITY: int = config(
+    "REVOCATION_FILTER_CAPACITY", cast=int, default=100000
+)
+REVOCATION_FILTER_ERROR_RATE: float = config(
+    "REVOCATION_FILTER_ERROR_RATE", cast=float, default=0.001
+)
+# Bloom filter of registered emails, lets lookups of unknown emails skip the
+# database; users registered on other workers are synced every interval
+EMAIL_FILTER_ENABLED: bool = config("EMAIL_FILTER_ENABLED", cast=bool, default=True)
+EMAIL_FILTER_SYNC_INTERVAL_SECONDS: int = config(
+    "EMAIL_FILTER_SYNC_INTERVAL_SECONDS", cast=int, default=5
+)
+EMAIL_FILTER_CAPACITY: int = config("EMAIL_FILTER_CAPACITY", cast=int, default=100000)
+EMAIL_FILTER_ERROR_RATE: float = config(
+    "EMAIL_FILTER_ERROR_RATE", cast=float, default=0.01
+)
+# bcrypt or argon2 (needs argon2-cffi); hashes of the other scheme still verify
+# and are upgraded on the next successful login
+PASSWORD_HASH_SCHEME: str = config("PASSWORD_HASH_SCHEME", default="bcrypt")
+BCRYPT_ROUNDS: int = config("BCRYPT_ROUNDS", cast=int, default=12)
+ARGON2_TIME_COST: int = config("ARGON2_TIME_COST", cast=int, default=3)
+ARGON2_MEMORY_COST: int = config("ARGON2_MEMORY_COST", cast=int, default=65536)
+ARGON2_PARALLELISM: int = config("ARGON2_PARALLELISM", cast=int, default=4)
+PASSWORD_HASH_EXECUTOR: str = config("PASSWORD_HASH_EXECUTOR", default="thread")
+# 0 means min(4, cpu count)
+PASSWORD_HASH_WORKERS: int = config("PASSWORD_HASH_WORKERS", cast=int, default=0)
+PASSWORD_HASH_MAX_QUEUE: int = config("PASSWORD_HASH_MAX_QUEUE", cast=int, default=64)
+PRINCIPAL_CACHE_SIZE: int = config("PRINCIPAL_CACHE_SIZE", cast=int, default=10000)
+PRINCIPAL_CACHE_TTL_SECONDS: int = config(
+    "PRINCIPAL_CACHE_TTL_SECONDS", cast=int, default=30
+)
+# Failed login/OTP attempts allowed per client IP and per account in a sliding
+# window; memory counts per worker, shared counts across the workers of a host
+RATE_LIMIT_ENABLED: bool = config("RATE_LIMIT_ENABLED", cast=bool, default=True)
+RATE_LIMIT_BACKEND: str = config("RATE_LIMIT_BACKEND", default="memory")
+RATE_LIMIT_SHARED_NAME: str = config("RATE_LIMIT_SHARED_NAME", default="rate_limit")
+RATE_LIMIT_SHARED_SLOTS: int = config(
+    "RATE_LIMIT_SHARED_SLOTS", cast=int, default=65536
+)
+LOGIN_IP_FAILURE_LIMIT: int = config("LOGIN_IP_FAILURE_LIMIT", cast=int, default=20)
+LOGIN_ACCOUNT_FAILURE_LIMIT: int = config(
+    "LOGIN_ACCOUNT_FAILURE_LIMIT", cast=int, default=5
+)
+LOGIN_FAILURE_WINDOW_SECONDS: int = config(
+    "LOGIN_FAILURE_WINDOW_SECONDS", cast=int, default=300
+)
 
 EMAIL_USE_TLS: str = config("EMAIL_USE_TLS", default="")
 EMAIL_HOST: str = config("EMAIL_HOST", default="")
 EMAIL_PORT: int = int(config("EMAIL_PORT", default=587))
 EMAIL_HOST_USER: str = config("EMAIL_HOST_USER", default="")
 EMAIL_HOST_PASSWORD: str = config("EMAIL_HOST_PASSWORD", default="")
+# Pooled SMTP connections shared by every send of a worker
+MAIL_POOL_SIZE: int = config("MAIL_POOL_SIZE", cast=int, default=5)
+MAIL_MAX_MESSAGES_PER_CONNECTION: int = config(
+    "MAIL_MAX_MESSAGES_PER_CONNECTION", cast=int, default=100
+)
+MAIL_IDLE_TIMEOUT_SECONDS: float = config(
+    "MAIL_IDLE_TIMEOUT_SECONDS", cast=float, default=60.0
+)
+# Emails are written to the email_outbox table and delivered in the background
+EMAIL_OUTBOX_BATCH_SIZE: int = config("EMAIL_OUTBOX_BATCH_SIZE", cast=int, default=50)
+EMAIL_OUTBOX_POLL_INTERVAL_SECONDS: float = config(
+    "EMAIL_OUTBOX_POLL_INTERVAL_SECONDS", cast=float, default=1.0
+)
+EMAIL_OUTBOX_CONCURRENCY: int = config("EMAIL_OUTBOX_CONCURRENCY", cast=int, default=5)
+EMAIL_OUTBOX_MAX_ATTEMPTS: int = config(
+    "EMAIL_OUTBOX_MAX_ATTEMPTS", cast=int, default=8
+)
+EMAIL_OUTBOX_BACKOFF_SECONDS: float = config(
+    "EMAIL_OUTBOX_BACKOFF_SECONDS", cast=float, default=30.0
+)
+EMAIL_OUTBOX_MAX_BACKOFF_SECONDS: float = config(
+    "EMAIL_OUTBOX_MAX_BACKOFF_SECONDS", cast=float, default=3600.0
+)
+# Per app worker, 0 for no limit
+EMAIL_OUTBOX_RATE_PER_SECOND: float = config(
+    "EMAIL_OUTBOX_RATE_PER_SECOND", cast=float, default=50.0
+)
+# Recipients of a bulk notification added to the outbox per round
+NOTIFICATION_CHUNK_SIZE: int = config("NOTIFICATION_CHUNK_SIZE", cast=int, default=500)
+# A verification email is not sent again while the previous one is pending or
+# was sent less than this long ago
+VERIFICATION_EMAIL_RESEND_SECONDS: int = config(
+    "VERIFICATION_EMAIL_RESEND_SECONDS", cast=int, default=300
+)
 
 MEDIA_PATH: str = config("MEDIA", default="media")
 SERVER_URL: str = config("SERVER_URL", default="http://localhost:8000")
 
 OTP_LENGTH: int = config("OTP_LENGTH", cast=int, default=4)
+OTP_TTL_SECONDS: int = config("OTP_TTL_SECONDS", cast=int, default=600)
+# Keep OTPs in the otp_storage table; in-memory only is for a single worker
+OTP_STORE_PERSIST: bool = config("OTP_STORE_PERSIST", cast=bool, default=True)
+OTP_PURGE_INTERVAL_SECONDS: int = config(
+    "OTP_PURGE_INTERVAL_SECONDS", cast=int, default=300
+)
+OTP_IP_FAILURE_LIMIT: int = config("OTP_IP_FAILURE_LIMIT", cast=int, default=10)
+OTP_ACCOUNT_FAILURE_LIMIT: int = config(
+    "OTP_ACCOUNT_FAILURE_LIMIT", cast=int, default=5
+)
+OTP_FAILURE_WINDOW_SECONDS: int = config(
+    "OTP_FAILURE_WINDOW_SECONDS", cast=int, default=900
+)
@@ -3,4 +3,7 @@ from apps.core.models.school_organization import *
 
 # from apps.core.models.location import *
 from apps.core.models.otp_storage import *
+from apps.core.models.token_revocation import *
+from apps.core.models.notification import *
+from apps.core.models.email_outbox import *
 from apps.core.models.transaction import *
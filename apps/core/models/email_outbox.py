@@ -0,0 +1,49 @@
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    Text,
+    func,
+)
+from sqlalchemy import Enum as SQLAlchemyEnum
+
+from apps.config.db.base import Base
+from apps.common.enum import EmailStatusEnum
+from apps.common.model import TimeStampMixin
+
+
+class EmailOutbox(Base, TimeStampMixin):
+    __tablename__ = "email_outbox"
+
+    subject = Column(String(255), nullable=False)
+    recipients = Column(JSON, nullable=False)
+    template_name = Column(String(255), nullable=False)
+    # Cleared once delivered, it can hold OTPs and initial passwords
+    body = Column(JSON(none_as_null=True), nullable=True)
+
+    status = Column(
+        SQLAlchemyEnum(EmailStatusEnum),
+        default=EmailStatusEnum.PENDING,
+        nullable=False,
+        index=True,
+    )
+    # Lower is sent first, so bulk notifications never delay OTPs
+    priority = Column(Integer, default=0, nullable=False)
+    notification_id = Column(
+        BigInteger, ForeignKey("notifications.id"), nullable=True, index=True
+    )
+    # Emails with the same key are coalesced, see enqueue_email_once
+    dedupe_key = Column(String(255), nullable=True, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(
+        DateTime(timezone=True), default=func.now(), nullable=False, index=True
+    )
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<EmailOutbox: {self.id}-{self.template_name}-{self.status}>"
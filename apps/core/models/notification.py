@@ -0,0 +1,31 @@
+from sqlalchemy import JSON, BigInteger, Column, ForeignKey, Integer, String
+from sqlalchemy import Enum as SQLAlchemyEnum
+
+from apps.config.db.base import Base
+from apps.common.enum import NotificationStatusEnum
+from apps.common.model import TimeStampMixin
+
+
+class Notification(Base, TimeStampMixin):
+    __tablename__ = "notifications"
+
+    subject = Column(String(255), nullable=False)
+    template_name = Column(String(255), nullable=False)
+    body = Column(JSON, nullable=False)
+    # UserFilterSchema values selecting the recipients
+    filters = Column(JSON, nullable=False)
+    created_by = Column(BigInteger, ForeignKey("users.id"), nullable=True)
+
+    status = Column(
+        SQLAlchemyEnum(NotificationStatusEnum),
+        default=NotificationStatusEnum.EXPANDING,
+        nullable=False,
+        index=True,
+    )
+    total = Column(Integer, default=0, nullable=False)
+    enqueued = Column(Integer, default=0, nullable=False)
+    # Keyset cursor, recipients are added to the outbox in id order
+    last_user_id = Column(BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<Notification: {self.id}-{self.subject}-{self.status}>"
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Integer
+
+from apps.config.db.base import Base
+
+
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+
+    # Refresh token jti, token family id, or user id for kind "user"
+    key = Column(String, primary_key=True)
+    kind = Column(String(16), nullable=False)
+    revoked_at = Column(Integer, index=True, nullable=False)
+    expiration_time = Column(Integer, index=True, nullable=False)
+
+    def __repr__(self):
+        return f"<TokenRevocation: {self.kind}-{self.key}>"
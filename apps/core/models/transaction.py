@@ -4,6 +4,7 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     func,
@@ -21,7 +22,7 @@ class Transaction(Base, TimeStampMixin):
     __tablename__ = "transactions"
 
     user_id = Column(Integer, ForeignKey("users.id"))
-    user = relationship("Users", backref="transactions", lazy="joined")
+    user = relationship("Users", backref="transactions", lazy="raise_on_sql")
 
     amount = Column(Float, nullable=False)
     discount = Column(Float, nullable=True)
@@ -38,6 +39,18 @@ class Transaction(Base, TimeStampMixin):
 
     refund = Column(Boolean, nullable=True, default=False)
 
+    __table_args__ = (
+        # method and is_deleted are always filtered on; including them lets
+        # the total be counted from the index alone
+        Index(
+            "ix_transactions_date_charged_id",
+            "date_charged",
+            "id",
+            postgresql_include=["method", "is_deleted"],
+        ),
+        Index("ix_transactions_user_date_charged_id", "user_id", "date_charged", "id"),
+    )
+
 
 class Refund(Base, TimeStampMixin):
     __tablename__ = "refunds"
@@ -1,12 +1,60 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy import Boolean, String, ForeignKey, Date, Time
 from sqlalchemy import Column, Integer, DateTime, BigInteger
+from sqlalchemy import DDL, Index, Text, cast, event, func, literal_column
 from sqlalchemy import Enum as SQLAlchemyEnum
 
 from apps.config.db.base import Base
 from apps.common.model import TimeStampMixin
 from apps.common.enum import AppointmentStatusEnum, GenderEnum, RoleEnum
 
+_SEPARATOR = literal_column("' '")
+_EMPTY = literal_column("''")
+
+
+def user_search_document(first_name, last_name, email):
+    """Text matched by the user search, as indexed by ix_users_search_trgm
+
+    Queries must use the same expression for the index to be used.
+    """
+    return (
+        first_name.concat(_SEPARATOR)
+        .concat(func.coalesce(last_name, _EMPTY))
+        .concat(_SEPARATOR)
+        .concat(func.coalesce(email, _EMPTY))
+        .self_group()
+    )
+
+
+def profile_search_document(city, cell_phone):
+    """Text matched by the user search, as indexed by
+    ix_user_profiles_search_trgm"""
+    return (
+        func.coalesce(city, _EMPTY)
+        .concat(_SEPARATOR)
+        .concat(func.coalesce(cast(cell_phone, Text), _EMPTY))
+        .self_group()
+    )
+
+
+def _trigram_index(name: str, document) -> Index:
+    # GiST rather than GIN: it can return rows ordered by trigram distance
+    return Index(
+        name,
+        document.label("document"),
+        postgresql_using="gist",
+        postgresql_ops={"document": "gist_trgm_ops"},
+    )
+
+
+def _prefix_index(name: str, column) -> Index:
+    # text_pattern_ops lets LIKE 'value%' use the index whatever the collation
+    return Index(
+        name,
+        func.lower(column).label("lower"),
+        postgresql_ops={"lower": "text_pattern_ops"},
+    )
+
 
 class Role(Base, TimeStampMixin):
     __tablename__ = "roles"
@@ -17,8 +65,10 @@ class Role(Base, TimeStampMixin):
 class UserSchool(Base, TimeStampMixin):
     __tablename__ = "user_schools"
 
-    user_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True)
-    school_id = Column(BigInteger, ForeignKey("schools.id"), primary_key=True)
+    user_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True, index=True)
+    school_id = Column(
+        BigInteger, ForeignKey("schools.id"), primary_key=True, index=True
+    )
 
 
 class Users(Base, TimeStampMixin):
@@ -35,15 +85,19 @@ class Users(Base, TimeStampMixin):
     # role_id = Column(Integer, ForeignKey('roles.id'))
     # role = relationship("Role", backref="users")
 
-    instructor_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    instructor_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     # instructor = relationship("Users", backref="students")
 
     role = Column(SQLAlchemyEnum(RoleEnum), nullable=False, default=RoleEnum.STUDENT)
 
-    transaction = relationship("Transaction", back_populates="user", lazy="joined")
+    transaction = relationship(
+        "Transaction", back_populates="user", lazy="raise_on_sql"
+    )
 
     # school_id = Column(Integer, ForeignKey("schools.id"))  # for student
-    school = relationship("School", back_populates="users", secondary="user_schools")
+    school = relationship(
+        "School", back_populates="users", secondary="user_schools", lazy="raise_on_sql"
+    )
 
     # organization_id = Column(Integer, ForeignKey("organizations.id"))  # for Instructor
     # organization = relationship("Organization", back_populates="users", secondary="instructor_organizations")
@@ -51,6 +105,19 @@ class Users(Base, TimeStampMixin):
     # permit_information = relationship("PermitInformation", backref='permit_user', join_depth=2, lazy="joined")
     # contact_information = relationship("ContactInformation", backref='contact_user', join_depth=2, lazy="joined")
 
+    __table_args__ = (
+        _trigram_index(
+            "ix_users_search_trgm",
+            user_search_document(first_name, last_name, email),
+        ),
+        # Sort options of the user list, each followed by the id tie-breaker
+        Index("ix_users_updated_at_id", "updated_at", "id"),
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_first_name_id", "first_name", "id"),
+        Index("ix_users_role_updated_at_id", "role", "updated_at", "id"),
+        _prefix_index("ix_users_first_name_prefix", first_name),
+    )
+
 
 class Profile(Base, TimeStampMixin):
     __tablename__ = "user_profiles"
@@ -61,24 +128,33 @@ class Profile(Base, TimeStampMixin):
 
     city = Column(String, nullable=True)
     state = Column(String, nullable=True)
-    zip_code = Column(Integer, nullable=True)
+    zip_code = Column(Integer, nullable=True, index=True)
     dob = Column(Date, nullable=True)
     gender = Column(SQLAlchemyEnum(GenderEnum), nullable=True)
     cell_phone = Column(BigInteger, nullable=True)
 
     contact_information = relationship(
-        "ContactInformation", backref="user_profiles", join_depth=2, lazy="joined"
+        "ContactInformation", backref="user_profiles", lazy="raise_on_sql"
     )
 
     certificate_received = Column(Boolean, default=False)
 
-    user_id = Column(Integer, ForeignKey("users.id"))
-    user = relationship("Users", backref="user_profile", lazy="joined")
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    user = relationship("Users", backref="user_profile", lazy="raise_on_sql")
 
     pickup_location = relationship(
         "PickupLocation",
         backref="user_profile",
-        lazy="joined",
+        lazy="raise_on_sql",
+    )
+
+    __table_args__ = (
+        _trigram_index(
+            "ix_user_profiles_search_trgm",
+            profile_search_document(city, cell_phone),
+        ),
+        _prefix_index("ix_user_profiles_city_prefix", city),
+        _prefix_index("ix_user_profiles_state_prefix", state),
     )
 
 
@@ -91,7 +167,7 @@ class ContactInformation(Base, TimeStampMixin):
     contact_email = Column(String, nullable=True)
     contact_type = Column(String(255), nullable=True)
 
-    user_id = Column(Integer, ForeignKey("user_profiles.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("user_profiles.id"), nullable=True, index=True)
     # users = relationship("Users", backref="user_contacts", foreign_keys=[user_id])
 
     created_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -110,8 +186,7 @@ class PermitInformation(Base, TimeStampMixin):
     permit_endorse_by = relationship(
         "Users",
         backref="permit_informations",
-        join_depth=2,
-        lazy="joined",
+        lazy="raise_on_sql",
         foreign_keys=[permit_endorse_by_id],
     )
 
@@ -131,7 +206,7 @@ class PickupLocation(Base, TimeStampMixin):
     city = Column(String(255), nullable=True)
     # pickup_location_type = Column(String, nullable=True)
 
-    user_id = Column(Integer, ForeignKey("user_profiles.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("user_profiles.id"), nullable=True, index=True)
 
     created_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     created_by = relationship("Users", foreign_keys=[created_by_id])
@@ -163,6 +238,26 @@ class StudentAppointment(Base, TimeStampMixin):
         default=AppointmentStatusEnum.PENDING,
     )
 
+    __table_args__ = (
+        # The list is filtered by status (PENDING by default), student or
+        # instructor and sorted by date
+        Index(
+            "ix_student_appointment_status_date_id", "status", "appointment_date", "id"
+        ),
+        Index(
+            "ix_student_appointment_student_date_id",
+            "student_id",
+            "appointment_date",
+            "id",
+        ),
+        Index(
+            "ix_student_appointment_instructor_date_id",
+            "instructor_id",
+            "appointment_date",
+            "id",
+        ),
+    )
+
 
 class InstructorAvailability(Base, TimeStampMixin):
     __tablename__ = "instructor_availability"
@@ -172,3 +267,21 @@ class InstructorAvailability(Base, TimeStampMixin):
     availability_date = Column(Date, nullable=True)
     start_time = Column(Time, nullable=True)
     end_time = Column(Time, nullable=True)
+
+    __table_args__ = (
+        Index("ix_instructor_availability_updated_at_id", "updated_at", "id"),
+        Index("ix_instructor_availability_date_id", "availability_date", "id"),
+        Index(
+            "ix_instructor_availability_instructor_date_id",
+            "instructor_id",
+            "availability_date",
+            "id",
+        ),
+    )
+
+
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -32,7 +32,13 @@ class AppointmentRequestSchema(BaseModel):
         return v
 
 
-class AppointmentFilterSchema(AppointmentBase):
+class AppointmentFilterSchema(BaseModel):
+    # status is a list query param of the route
+    student_id: Optional[int] = None
+    instructor_id: Optional[int] = None
+    appointment_date: Optional[date] = None
+    appointment_date_from: Optional[date] = None
+    appointment_date_to: Optional[date] = None
     order: OrderEnum = OrderEnum.DESC
     sort: AppointmentSortEnum = AppointmentSortEnum.APPOINTMENT_DATE
 
@@ -49,4 +55,6 @@ class AppointmentResponseSchema(BaseModel):
 
 class AppointmentResponseSchemaTotal(BaseModel):
     total_count: int
+    total_exact: bool = True
     appointments: List[AppointmentResponseSchema]
+    next_cursor: Optional[str] = None
@@ -61,8 +61,14 @@ class InstructorAvailabilityResponseSchema(InstructorAvailabilityBase):
 
 class InstructorAvailabilityFilterSchema(BaseModel):
     availability_date: Optional[date] = None
+    availability_date_from: Optional[date] = None
+    availability_date_to: Optional[date] = None
     start_time: Optional[time] = None
+    start_time_from: Optional[time] = None
+    start_time_to: Optional[time] = None
     end_time: Optional[time] = None
+    end_time_from: Optional[time] = None
+    end_time_to: Optional[time] = None
     instructor_id: Optional[int] = None
     sort: InstructorAvailabilitySortEnum = InstructorAvailabilitySortEnum.UPDATED_AT
     order: OrderEnum = OrderEnum.DESC
@@ -73,4 +79,6 @@ class InstructorAvailabilityFilterSchema(BaseModel):
 
 class InstructorAvailabilityResponseTotal(BaseModel):
     total: int
+    total_exact: bool = True
     instructor_slots: List[InstructorAvailabilityResponseSchema]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from apps.common.enum import NotificationStatusEnum, RoleFilterEnum
+
+
+class NotificationRecipientFilterSchema(BaseModel):
+    first_name: Optional[str] = None
+    email: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    zip_code: Optional[str] = None
+    school: Optional[str] = None
+    role: RoleFilterEnum = RoleFilterEnum.ALL
+
+
+class NotificationCreateSchema(BaseModel):
+    subject: str
+    message: str
+    recipients: NotificationRecipientFilterSchema = NotificationRecipientFilterSchema()
+
+
+class NotificationProgressSchema(BaseModel):
+    id: int
+    subject: str
+    status: NotificationStatusEnum
+    total: int
+    enqueued: int
+    pending: int
+    sent: int
+    failed: int
+    created_at: datetime
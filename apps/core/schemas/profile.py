@@ -30,6 +30,7 @@ class ContactInformationUpdateSchema(ContactInformationResponse):
 
 class ContactInformationResponseSchemaTotal(BaseModel):
     total: int
+    total_exact: bool = True
     contact_information: List[ContactInformationResponse]
 
 
@@ -70,6 +71,7 @@ class PickupLocationResponse(PickupLocationBase):
 
 class PickupLocationResponseSchemaTotal(BaseModel):
     total: int
+    total_exact: bool = True
     pickup_location: List[PickupLocationResponse]
 
 
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from fastapi import Form
 from pydantic import BaseModel
 
@@ -28,7 +30,9 @@ class SchoolResponseSchema(SchoolOrganizationBase):
 
 class SchoolResponseSchemaTotal(BaseModel):
     total_count: int
+    total_exact: bool = True
     school: list[SchoolResponseSchema]
+    next_cursor: Optional[str] = None
 
     class Config:
         form_attributes = True
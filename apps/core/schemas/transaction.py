@@ -12,13 +12,19 @@ class TransactionBase(BaseModel):
     location: Optional[str] = None
 
 
-class TransactionFilterSchema(TransactionBase):
+class TransactionFilterSchema(BaseModel):
+    # method is a list query param of the route
+    amount: Optional[float] = None
+    discount: Optional[float] = None
+    location: Optional[str] = None
     transaction_id: Optional[int] = None
     user_id: Optional[int] = None
     order: OrderEnum = OrderEnum.DESC
     sort: TransactionSortEnum = TransactionSortEnum.DATE_CHARGED
     is_deleted: bool = False
     date_charged: Optional[datetime] = None
+    date_charged_from: Optional[datetime] = None
+    date_charged_to: Optional[datetime] = None
 
 
 class TransactionCreate(TransactionBase):
@@ -57,7 +63,9 @@ class TransactionResponseSchema(TransactionBase):
 
 class TransactionResponseSchemaTotal(BaseModel):
     total: int
+    total_exact: bool = True
     transactions: list[TransactionResponseSchema]
+    next_cursor: Optional[str] = None
 
 
 class TransactionUserResponseSchema(TransactionBase):
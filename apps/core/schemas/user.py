@@ -47,7 +47,23 @@ class UserResponseSchema(BaseModel):
 
 class UserResponseSchemaTotal(BaseModel):
     total_count: int
+    total_exact: bool = True
     users: list[UserResponseSchema]
+    next_cursor: Optional[str] = None
+
+
+class UserSearchResultSchema(BaseModel):
+    id: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    email: Optional[str]
+    city: Optional[str] = None
+    cell_phone: Optional[int] = None
+    rank: float
+
+
+class UserSearchResponseSchema(BaseModel):
+    results: list[UserSearchResultSchema]
 
 
 class UserFilterSchema(BaseModel):
@@ -1,3 +1,4 @@
+import inspect
 from typing import List
 from functools import wraps
 
@@ -11,22 +12,33 @@ def check_role_permissions(allowed_roles: List[str]):
         allowed_roles (List[str]): List of allowed roles to perform action
     """
 
+    def check(current_user):
+        if current_user is None or current_user.role is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        if current_user.role not in allowed_roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You do not have permission to perform this action",
+            )
+
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                check(kwargs.get("current_user"))
+                return await func(*args, **kwargs)
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            current_user = kwargs.get("current_user")
-            if current_user is None or current_user.role is None:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Could not validate credentials",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-
-            if current_user.role not in allowed_roles:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="You do not have permission to perform this action",
-                )
+            check(kwargs.get("current_user"))
             return func(*args, **kwargs)
 
         return wrapper
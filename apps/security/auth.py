@@ -1,56 +1,84 @@
 from datetime import timedelta, datetime, timezone
-import time
+from hashlib import sha256
+import logging
 from typing import Optional
+from uuid import uuid4
 
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 
-from jose import JWTError, jwt
-from pydantic import EmailStr
 from starlette import status
 
-from apps.common.exception import UserNotFoundException, InvalidCredentialsException
+from apps.common.exception import (
+    InvalidCredentialsException,
+    InvalidTokenException,
+    UserNotFoundException,
+)
 
 from apps.config import settings
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from apps.config.db.conn import get_db
+from apps.config.db.conn import get_async_session
 from apps.core.models import Users
-from apps.core.models.otp_storage import OTPStorage
+from apps.security.email_filter import email_filter
+from apps.security.hashing import password_hasher, pwd_context
+from apps.security.principal import Principal, principal_cache
+from apps.security.revocation import revocation_store
+from apps.security.tokens import TokenCodec, token_codec
+from apps.utils.database_utils import fetch_one
 
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
 class JWTSecurity(object):
-    def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        self.SECRET_KEY = settings.SECRET_KEY
-        self.ALGORITHM = settings.ALGORITHM
+    def __init__(self, codec: TokenCodec = token_codec):
+        self.codec = codec
+        self.pwd_context = pwd_context
         self.ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
         self.REFRESH_TOKEN_TIME_IN_MINUTES = settings.REFRESH_TOKEN_TIME_IN_MINUTES
 
-        # self.db: Session = get_db()
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return self.pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await password_hasher.verify(plain_password, hashed_password)
 
-    def get_password_hash(self, password):
-        return self.pwd_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        return await password_hasher.hash(password)
 
-    def get_user(self, email: str, db: Session):
-        return db.query(Users).filter(Users.email == email).first()
+    async def get_user(self, email: str, db: AsyncSession):
+        if not email_filter.might_exist(email):
+            return None
+        user = await fetch_one(db, select(Users).filter(Users.email == email))
+        if user is None:
+            email_filter.record_false_positive()
+        return user
 
-    def authenticate_user(self, email: str, password: str, db: Session):
-        user = self.get_user(email=email, db=db)
+    async def authenticate_user(self, email: str, password: str, db: AsyncSession):
+        user = await self.get_user(email=email, db=db)
 
         if not user:
             raise UserNotFoundException(message="User not found")
 
-        if not self.verify_password(password, str(user.password)):
+        verified, new_hash = await password_hasher.verify_and_update(
+            password, str(user.password)
+        )
+        if not verified:
             raise InvalidCredentialsException(message="Invalid credentials")
 
+        if new_hash is not None:
+            # Stored hash predates the current hashing policy, upgrade it
+            try:
+                user.password = new_hash
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                await db.refresh(user)
+                logger.exception("Could not rehash password of user %s", user.id)
+
         return user
 
     def create_access_token(self, data: dict, expires_delta: timedelta = None):
@@ -60,19 +88,32 @@ class JWTSecurity(object):
         else:
             expire = datetime.now(timezone.utc) + timedelta(minutes=60)
         to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
-        return encoded_jwt
+        return self.codec.encode(to_encode)
+
+    def create_refresh_token(
+        self, data: dict, expires_delta: timedelta = None, family: str = None
+    ):
+        """Create a refresh token
 
-    def create_refresh_token(self, data: dict, expires_delta: timedelta = None):
+        Every refresh token has its own ``jti`` and belongs to the ``fam`` of
+        the login it was first issued for; rotation keeps the family.
+        """
         to_encode = data.copy()
-        to_encode.update({"token": "refresh"})
+        now = datetime.now(timezone.utc)
+        to_encode.update(
+            {
+                "token": "refresh",
+                "jti": uuid4().hex,
+                "fam": family or uuid4().hex,
+                "iat": int(now.timestamp()),
+            }
+        )
         if expires_delta:
-            expire = datetime.now(timezone.utc) + expires_delta
+            expire = now + expires_delta
         else:
-            expire = datetime.now(timezone.utc) + timedelta(days=40)
+            expire = now + timedelta(days=40)
         to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
-        return encoded_jwt
+        return self.codec.encode(to_encode)
 
     def create_verification_token(self, data: dict) -> str:
         to_encode = data.copy()
@@ -80,12 +121,19 @@ class JWTSecurity(object):
         #     minutes=60
         # )  # Token does not expire (Why? Because i was told)
         # to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
-        return encoded_jwt
-
-    def get_current_user(
-        self, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-    ):
+        return self.codec.encode(to_encode)
+
+    async def get_current_user(
+        self,
+        db: AsyncSession = Depends(get_async_session),
+        token: str = Depends(oauth2_scheme),
+    ) -> Principal:
+        """Resolve the principal behind a bearer token
+
+        FastAPI resolves this dependency once per request; across requests the
+        principal is served from ``principal_cache`` until it expires or the
+        user changes.
+        """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -95,93 +143,98 @@ class JWTSecurity(object):
             email: Optional[str] = self.decode_access_token_and_return_email(token)
             if email is None:
                 raise credentials_exception
-        except JWTError as e:
+        except InvalidTokenException as e:
             raise credentials_exception from e
-        user = self.get_user(email=email, db=db)
+
+        principal = principal_cache.get(email)
+        if principal is not None:
+            return principal
+
+        user = await self.get_user(email=email, db=db)
         if user is None:
             raise credentials_exception
-        return user
+        principal = Principal.model_validate(user)
+        principal_cache.set(principal)
+        return principal
 
     def decode_access_token_and_return_email(self, token: str):
-        payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        payload = self.codec.decode(token)
         email: Optional[str] = payload.get("email")
         return email
 
     def decode_verification_token(self, token: str) -> dict[str, int]:
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            return payload
-        except JWTError as e:
-            raise jwt.ExpiredSignatureError("Token is expired") from e
+            return self.codec.decode(token)
+        except InvalidTokenException as e:
+            raise InvalidTokenException(message="Token is expired") from e
+
+    async def validate_refresh_access_token(
+        self, db: AsyncSession, refresh_token: str
+    ) -> dict:
+        """Verify a refresh token against the in-memory revocations
+
+        The database is only written to when an already rotated token is
+        presented again: it was stolen, so its whole family is revoked.
 
-    def validate_refresh_access_token(self, db: Session, refresh_token: str):
+        Raises:
+            HTTPException: 401, invalid, expired or revoked refresh token
+
+        Returns:
+            dict: refresh token claims
+        """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate refresh token",
             headers={"WWW-Authenticate": "Bearer"},
         )
         try:
-            payload = jwt.decode(
-                refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
-            )
-            email: str = payload.get("email")
-            if email is None:
-                raise credentials_exception
-        except JWTError:
+            payload = self.codec.decode(refresh_token)
+        except InvalidTokenException:
             raise credentials_exception
 
-        try:
-            refresh_token = payload.get("token")
-            if not refresh_token:
-                raise credentials_exception
-        except JWTError:
+        if payload.get("token") != "refresh":
             raise credentials_exception
 
-        user = self.get_user(email=email, db=db)
+        if payload.get("jti") is None and payload.get("fam") is None:
+            # Issued before rotation: accepted for one rotation, under ids
+            # derived from the token so that replaying it revokes its successor
+            digest = sha256(refresh_token.encode()).hexdigest()
+            payload["jti"] = f"legacy:{digest}"
+            payload["fam"] = f"legacy-family:{digest}"
 
-        if user is None:
+        if any(payload.get(claim) is None for claim in ("email", "id", "jti", "fam")):
             raise credentials_exception
 
-        return user
+        if revocation_store.is_revoked(payload):
+            if revocation_store.is_token_revoked(payload["jti"]):
+                await revocation_store.revoke_family(
+                    db, payload["fam"], payload["exp"]
+                )
+            raise credentials_exception
 
-    async def verify_otp(self, otp: str, db: Session) -> bool:
-        if not otp:
-            return False
-        stored_otp_data = db.query(OTPStorage).filter(OTPStorage.otp == otp).first()
+        return payload
 
-        if stored_otp_data:
-            expiration_time = stored_otp_data.expiration_time
-            current_time = int(time.time())
-            if current_time < expiration_time:
-                return True
-        return False
+    async def rotate_refresh_token(self, db: AsyncSession, claims: dict) -> str:
+        """Revoke a refresh token and issue its successor in the same family
 
-    async def save_otp(
-        self, email: EmailStr, otp: str, expiration_time: int, db: Session
-    ):
-        try:
-            db_item = OTPStorage(email=email, otp=otp, expiration_time=expiration_time)
-            db.add(db_item)
-            db.commit()
-            db.refresh(db_item)
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
-            )
+        A refresh token can be rotated once; when two requests race to rotate
+        the same token, the loser revokes the whole family.
 
-    async def update_otp(
-        self, email: EmailStr, otp: str, expiration_time: int, db: Session
-    ):
+        Raises:
+            HTTPException: 401, the refresh token was already used
+        """
         try:
-            db_item = db.query(OTPStorage).filter(OTPStorage.email == email).first()
-            setattr(db_item, "otp", otp)
-            setattr(db_item, "expiration_time", expiration_time)
-            db.commit()
-            db.refresh(db_item)
-        except Exception as e:
+            await revocation_store.revoke_token(db, claims["jti"], claims["exp"])
+        except IntegrityError:
+            await revocation_store.revoke_family(db, claims["fam"], claims["exp"])
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token was already used",
+                headers={"WWW-Authenticate": "Bearer"},
             )
 
+        data = {"id": claims["id"], "email": claims["email"], "role": claims["role"]}
+        return self.create_refresh_token(data, family=claims["fam"])
+
 
 jwt_service = JWTSecurity()
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import threading
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from apps.config import settings
+from apps.core.models import Users
+from apps.utils.bloom_filter import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+
+class EmailFilter:
+    """Bloom filter of registered emails
+
+    ``might_exist`` answering False means the email was never registered, so
+    the caller can skip the ``Users`` lookup; True still needs the lookup.
+    Until ``load`` has run everything might exist. Users created by other
+    workers are picked up by ``sync``; until then this worker may answer
+    False for them, so the sync interval bounds how long a brand new account
+    can be reported as unknown here.
+    """
+
+    # Rows read again on every sync, to catch transactions that committed
+    # out of id order
+    REORDER_SLACK = 100
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = None
+        self._max_id = 0
+        self._lock = threading.Lock()
+
+        self.checks = 0
+        self.negatives = 0
+        self.false_positives = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    def might_exist(self, email: str) -> bool:
+        if self._filter is None:
+            return True
+        self.checks += 1
+        if email in self._filter:
+            return True
+        self.negatives += 1
+        return False
+
+    def record_false_positive(self):
+        """Report that an email passed the filter but no user was found"""
+        if self._filter is not None:
+            self.false_positives += 1
+
+    def add(self, email: str):
+        if self._filter is not None:
+            with self._lock:
+                self._filter.add(email)
+
+    async def load(self, db: AsyncSession):
+        """Build the filter from every registered email"""
+        total = await db.scalar(select(func.count(Users.id)))
+        bloom = BloomFilter(max(total * 2, self.capacity), self.error_rate)
+        max_id = 0
+        result = await db.stream(
+            select(Users.id, Users.email).execution_options(yield_per=5000)
+        )
+        async for user_id, email in result:
+            if email is not None:
+                bloom.add(email)
+            max_id = max(max_id, user_id)
+        with self._lock:
+            self._filter = bloom
+            self._max_id = max_id
+
+    async def sync(self, db: AsyncSession):
+        """Add users registered by other workers since the last sync, and
+        rebuild the filter once it holds more emails than it was sized for"""
+        if self._filter is None or self._filter.count > self._filter.capacity:
+            await self.load(db)
+            return
+
+        rows = (
+            await db.execute(
+                select(Users.id, Users.email).filter(
+                    Users.id > self._max_id - self.REORDER_SLACK
+                )
+            )
+        ).all()
+        with self._lock:
+            for user_id, email in rows:
+                if email is not None and email not in self._filter:
+                    self._filter.add(email)
+                self._max_id = max(self._max_id, user_id)
+
+    def metrics(self) -> dict:
+        if self._filter is None:
+            return {"ready": False}
+        lookups = self.false_positives + self.negatives
+        return {
+            "ready": True,
+            "emails": self._filter.count,
+            "capacity": self._filter.capacity,
+            "filter_bytes": self._filter.nbytes,
+            "checks": self.checks,
+            "short_circuited": self.negatives,
+            "false_positives": self.false_positives,
+            # Share of unknown emails that still reached the database
+            "false_positive_rate": round(
+                self.false_positives / lookups if lookups else 0.0, 6
+            ),
+            "estimated_false_positive_rate": round(
+                self._filter.estimated_error_rate, 6
+            ),
+        }
+
+
+email_filter = EmailFilter(
+    capacity=settings.EMAIL_FILTER_CAPACITY,
+    error_rate=settings.EMAIL_FILTER_ERROR_RATE,
+)
+
+
+async def sync_email_filter(session_maker: async_sessionmaker, interval: int):
+    """Background task syncing the email filter every ``interval`` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_maker() as db:
+                await email_filter.sync(db)
+        except Exception:
+            logger.exception("Could not sync the email filter")
@@ -0,0 +1,208 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from passlib.hash import argon2
+
+from apps.config import settings
+
+
+def build_context(
+    scheme: str = settings.PASSWORD_HASH_SCHEME,
+    bcrypt_rounds: int = settings.BCRYPT_ROUNDS,
+    argon2_time_cost: int = settings.ARGON2_TIME_COST,
+    argon2_memory_cost: int = settings.ARGON2_MEMORY_COST,
+    argon2_parallelism: int = settings.ARGON2_PARALLELISM,
+) -> CryptContext:
+    """Build the password hashing policy
+
+    New hashes use ``scheme`` with the given cost. Hashes of the other scheme,
+    or of the same scheme with a different cost, still verify but are reported
+    as needing an update so they are rehashed on the next successful login.
+
+    Args:
+        scheme (str): bcrypt or argon2
+        bcrypt_rounds (int): bcrypt cost factor (log2 of iterations)
+        argon2_time_cost (int): argon2 iterations
+        argon2_memory_cost (int): argon2 memory in KiB
+        argon2_parallelism (int): argon2 lanes
+
+    Raises:
+        ValueError: Unknown scheme, or argon2 without argon2-cffi installed
+
+    Returns:
+        CryptContext: passlib context
+    """
+    if scheme not in ("bcrypt", "argon2"):
+        raise ValueError("PASSWORD_HASH_SCHEME must be 'bcrypt' or 'argon2'")
+
+    argon2_available = argon2.has_backend()
+    if scheme == "argon2" and not argon2_available:
+        raise ValueError("PASSWORD_HASH_SCHEME=argon2 requires argon2-cffi")
+
+    schemes = [scheme]
+    if scheme == "argon2":
+        schemes.append("bcrypt")
+    elif argon2_available:
+        schemes.append("argon2")
+
+    options = {
+        "bcrypt__rounds": bcrypt_rounds,
+        "bcrypt__min_rounds": bcrypt_rounds,
+        "bcrypt__max_rounds": bcrypt_rounds,
+    }
+    if argon2_available:
+        options.update(
+            argon2__time_cost=argon2_time_cost,
+            argon2__memory_cost=argon2_memory_cost,
+            argon2__parallelism=argon2_parallelism,
+        )
+
+    return CryptContext(schemes=schemes, default=scheme, deprecated="auto", **options)
+
+
+pwd_context = build_context()
+
+
+def _hash(password: str) -> tuple[str, float]:
+    started = time.perf_counter()
+    hashed = pwd_context.hash(password)
+    return hashed, time.perf_counter() - started
+
+
+def _verify(password: str, hashed_password: str) -> tuple[bool, float]:
+    started = time.perf_counter()
+    verified = pwd_context.verify(password, hashed_password)
+    return verified, time.perf_counter() - started
+
+
+def _verify_and_update(
+    password: str, hashed_password: str
+) -> tuple[tuple[bool, Optional[str]], float]:
+    started = time.perf_counter()
+    result = pwd_context.verify_and_update(password, hashed_password)
+    return result, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """Runs password hashing and verification off the event loop
+
+    At most ``workers`` operations run at once in a dedicated thread or
+    process pool and at most ``max_queue`` more wait for a worker; beyond that
+    requests are rejected with 503 instead of piling up behind a login storm.
+    bcrypt releases the GIL, so threads are enough unless the policy uses a
+    scheme that does not.
+    """
+
+    def __init__(self, executor: str, workers: int, max_queue: int):
+        if executor not in ("thread", "process"):
+            raise ValueError("PASSWORD_HASH_EXECUTOR must be 'thread' or 'process'")
+        self.executor_kind = executor
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.wait_time_total = 0.0
+        self.run_time_total = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self.in_flight - self.workers, 0)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
+        """Verify a password and rehash it if the stored hash is outdated
+
+        Returns:
+            tuple[bool, Optional[str]]: verified, new hash or None
+        """
+        verified, new_hash = await self._run(
+            _verify_and_update, password, hashed_password
+        )
+        if new_hash is not None:
+            self.rehashed += 1
+        return verified, new_hash
+
+    async def _run(self, operation: Callable, *args):
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password operations in progress, try again",
+                headers={"Retry-After": "1"},
+            )
+
+        self.in_flight += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        submitted = time.perf_counter()
+        try:
+            result, run_time = await asyncio.get_running_loop().run_in_executor(
+                self.executor, operation, *args
+            )
+        finally:
+            self.in_flight -= 1
+
+        self.completed += 1
+        self.run_time_total += run_time
+        self.wait_time_total += max(time.perf_counter() - submitted - run_time, 0.0)
+        return result
+
+    def metrics(self) -> dict:
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "wait_time_avg_ms": round(
+                self.wait_time_total / self.completed * 1000 if self.completed else 0.0,
+                3,
+            ),
+            "run_time_avg_ms": round(
+                self.run_time_total / self.completed * 1000 if self.completed else 0.0,
+                3,
+            ),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS or min(4, os.cpu_count() or 1),
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
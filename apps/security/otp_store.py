@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from apps.config import settings
+from apps.core.models.otp_storage import OTPStorage
+
+logger = logging.getLogger(__name__)
+
+# Dialects with INSERT .. ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class OTPStore:
+    """One-time passwords with TTL expiry
+
+    Every email has at most one live OTP; issuing a new one replaces it. With
+    ``persist`` the OTPs live in the ``otp_storage`` table, so every worker
+    sees them and they survive restarts; without it they live in an
+    in-memory TTL map, which is only correct with a single worker. Lookups
+    always use (email, otp): OTPs are short, so the same otp is routinely live
+    for several emails.
+    """
+
+    def __init__(self, ttl_seconds: int, persist: bool, max_entries: int = 100000):
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self.max_entries = max_entries
+        self._otps: dict[str, tuple[str, int]] = {}
+        self._lock = threading.Lock()
+
+    async def issue(self, email: str, otp: str, db: AsyncSession) -> int:
+        """Store a new OTP for an email, replacing the previous one
+
+        Args:
+            email (str): Email the OTP was sent to
+            otp (str): Generated OTP
+            db (AsyncSession): Async database session
+
+        Returns:
+            int: expiration time as a unix timestamp
+        """
+        expiration_time = int(time.time()) + self.ttl_seconds
+
+        if self.persist:
+            await self._save(db, email, otp, expiration_time)
+            return expiration_time
+
+        with self._lock:
+            self._forget(email)
+            if len(self._otps) >= self.max_entries:
+                self._purge_memory(int(time.time()))
+            while len(self._otps) >= self.max_entries:
+                # Oldest OTPs expire first, drop them when still full
+                self._forget(next(iter(self._otps)))
+            self._otps[email] = (otp, expiration_time)
+
+        return expiration_time
+
+    async def verify(self, email: str, otp: str, db: AsyncSession) -> Optional[str]:
+        """Check a live OTP against the email it was sent to
+
+        Args:
+            email (str): Email sent by the client
+            otp (str): OTP sent by the client
+            db (AsyncSession): Async database session
+
+        Returns:
+            Optional[str]: email of the OTP, None when missing or expired
+        """
+        if not email or not otp:
+            return None
+        now = int(time.time())
+
+        if not self.persist:
+            with self._lock:
+                entry = self._otps.get(email)
+            if entry is None or entry[0] != otp or entry[1] <= now:
+                return None
+            return email
+
+        return await db.scalar(
+            select(OTPStorage.email).filter(
+                OTPStorage.email == email,
+                OTPStorage.otp == otp,
+                OTPStorage.expiration_time > now,
+            )
+        )
+
+    async def consume(self, email: str, otp: str, db: AsyncSession):
+        """Delete an OTP once it has been used"""
+        if self.persist:
+            await db.execute(
+                delete(OTPStorage).filter(
+                    OTPStorage.email == email, OTPStorage.otp == otp
+                )
+            )
+            await db.commit()
+            return
+
+        with self._lock:
+            entry = self._otps.get(email)
+            if entry is not None and entry[0] == otp:
+                self._forget(email)
+
+    async def purge(self, db: AsyncSession) -> int:
+        """Drop expired OTPs
+
+        Returns:
+            int: number of expired OTPs dropped
+        """
+        now = int(time.time())
+        if not self.persist:
+            with self._lock:
+                expired = self._purge_memory(now)
+            return expired
+
+        result = await db.execute(
+            delete(OTPStorage).filter(OTPStorage.expiration_time <= now)
+        )
+        await db.commit()
+        return result.rowcount
+
+    async def _save(self, db: AsyncSession, email: str, otp: str, expiration_time: int):
+        """Insert the OTP row of an email, or replace it
+
+        PostgreSQL and SQLite upsert in one statement; other databases lock
+        the row, then update it or insert it in a savepoint when there is
+        none. Changes the caller added to the session are committed with it.
+        """
+        values = {"email": email, "otp": otp, "expiration_time": expiration_time}
+        insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+        if insert is not None:
+            statement = insert(OTPStorage).values(**values)
+            await db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[OTPStorage.email],
+                    set_={
+                        "otp": statement.excluded.otp,
+                        "expiration_time": statement.excluded.expiration_time,
+                    },
+                )
+            )
+            await db.commit()
+            return
+
+        row = await db.scalar(
+            select(OTPStorage).filter(OTPStorage.email == email).with_for_update()
+        )
+        if row is not None:
+            row.otp = otp
+            row.expiration_time = expiration_time
+        else:
+            try:
+                # A savepoint, the caller's pending changes stay in the session
+                async with db.begin_nested():
+                    db.add(OTPStorage(**values))
+            except IntegrityError:
+                # Another request inserted the row first, this OTP replaces it
+                await db.execute(
+                    update(OTPStorage)
+                    .filter(OTPStorage.email == email)
+                    .values(otp=otp, expiration_time=expiration_time)
+                )
+        await db.commit()
+
+    def _forget(self, email: str):
+        self._otps.pop(email, None)
+
+    def _purge_memory(self, now: int) -> int:
+        expired = [e for e, (_, expires) in self._otps.items() if expires <= now]
+        for email in expired:
+            self._forget(email)
+        return len(expired)
+
+
+otp_store = OTPStore(
+    ttl_seconds=settings.OTP_TTL_SECONDS, persist=settings.OTP_STORE_PERSIST
+)
+
+
+async def purge_expired_otps(session_maker: async_sessionmaker, interval: int):
+    """Background task deleting expired OTPs every ``interval`` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_maker() as db:
+                purged = await otp_store.purge(db)
+            if purged:
+                logger.info("Purged %s expired OTPs", purged)
+        except Exception:
+            logger.exception("Could not purge expired OTPs")
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from apps.common.enum import RoleEnum
+from apps.config import settings
+
+
+class Principal(BaseModel):
+    """Authenticated user as seen by route handlers
+
+    Only carries what authorization and routes read from the current user;
+    load the ``Users`` row by ``id`` when it has to be modified.
+    """
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    id: int
+    email: str
+    role: RoleEnum
+    first_name: Optional[str] = None
+    is_verified: Optional[bool] = None
+
+
+class PrincipalCache:
+    """Bounded TTL cache of principals keyed by the email in the access token
+
+    Entries are dropped on expiry, when the cache is full (oldest first) and
+    when the user changes. Invalidation is per process, so the TTL bounds how
+    long other workers may keep serving a stale principal.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._principals: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self._emails_by_id: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, email: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._principals.get(email)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                self._remove(email)
+                return None
+            return principal
+
+    def set(self, principal: Principal):
+        with self._lock:
+            self._principals[principal.email] = (
+                time.monotonic() + self.ttl_seconds,
+                principal,
+            )
+            self._principals.move_to_end(principal.email)
+            self._emails_by_id[principal.id] = principal.email
+            while len(self._principals) > self.max_entries:
+                email, _ = next(iter(self._principals.items()))
+                self._remove(email)
+
+    def invalidate(self, user_id: Optional[int] = None, email: Optional[str] = None):
+        """Forget a user so the next request reloads it from the database
+
+        Args:
+            user_id (int, optional): Id of the changed user
+            email (str, optional): Email of the changed user
+        """
+        with self._lock:
+            if user_id is not None:
+                email = self._emails_by_id.get(user_id, email)
+            if email is not None:
+                self._remove(email)
+
+    def _remove(self, email: str):
+        entry = self._principals.pop(email, None)
+        if entry is not None:
+            self._emails_by_id.pop(entry[1].id, None)
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_SIZE,
+)
@@ -0,0 +1,234 @@
+import fcntl
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+
+from apps.config import settings
+
+
+def _estimate(window_index: int, previous: int, current: int, now: float, window: int):
+    """Sliding window estimate from the counts of the current and previous
+    fixed windows, weighting the previous one by how much of it still overlaps
+
+    Returns:
+        tuple[int, int, float]: previous and current counts rolled forward to
+            now, estimated count over the last ``window`` seconds
+    """
+    now_index = int(now // window)
+    if window_index == now_index - 1:
+        previous, current = current, 0
+    elif window_index != now_index:
+        previous, current = 0, 0
+    overlap = 1 - (now % window) / window
+    return previous, current, previous * overlap + current
+
+
+class MemoryCounterStore:
+    """Per-process sliding window counters, bounded with LRU eviction"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._counters: OrderedDict[str, tuple[int, int, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, key: str, window: int, now: float) -> float:
+        with self._lock:
+            entry = self._counters.get(key)
+        if entry is None:
+            return 0.0
+        return _estimate(*entry, now, window)[2]
+
+    def hit(self, key: str, window: int, now: float):
+        with self._lock:
+            window_index, previous, current = self._counters.get(key, (0, 0, 0))
+            previous, current, _ = _estimate(
+                window_index, previous, current, now, window
+            )
+            self._counters[key] = (int(now // window), previous, current + 1)
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_entries:
+                self._counters.popitem(last=False)
+
+
+class SharedCounterStore:
+    """Sliding window counters in a shared memory hash table
+
+    Every uvicorn worker attaches to the same named segment, so limits hold
+    across workers of one host. Slots are found by open addressing on a
+    64-bit key digest; when every probed slot is taken the one hit least
+    recently is reused. Window indexes are not comparable across limiters
+    with different windows, so each slot also keeps the epoch second of its
+    last hit. Updates are serialized with ``flock`` on a lock
+    file next to the segment.
+    """
+
+    # digest, window index, last hit epoch second, previous, current
+    SLOT = struct.Struct("<QIIII")
+    PROBES = 8
+
+    def __init__(self, name: str, slots: int):
+        self.slots = slots
+        size = slots * self.SLOT.size
+        try:
+            self._memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._memory = shared_memory.SharedMemory(name=name)
+        # The segment outlives this worker; keep the resource tracker from
+        # unlinking it when the worker exits, which Python registers for
+        # attaching workers as well as for the one that created it
+        resource_tracker.unregister(self._memory._name, "shared_memory")
+        if self._memory.size < size:
+            raise ValueError(f"Shared memory segment {name} is smaller than expected")
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{name}.lock"), "a")
+        self._thread_lock = threading.Lock()
+
+    def _digest(self, key: str) -> int:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # 0 marks an empty slot
+        return int.from_bytes(digest, "little") or 1
+
+    def _find(self, digest: int) -> tuple[int, tuple[int, int, int, int, int]]:
+        buffer = self._memory.buf
+        oldest = None
+        for probe in range(self.PROBES):
+            offset = ((digest + probe) % self.slots) * self.SLOT.size
+            slot = self.SLOT.unpack_from(buffer, offset)
+            if slot[0] in (digest, 0):
+                return offset, slot
+            if oldest is None or slot[2] < oldest[1][2]:
+                oldest = (offset, slot)
+        return oldest[0], (0, 0, 0, 0, 0)
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def count(self, key: str, window: int, now: float) -> float:
+        digest = self._digest(key)
+        with self._locked():
+            _, slot = self._find(digest)
+        if slot[0] != digest:
+            return 0.0
+        return _estimate(slot[1], slot[3], slot[4], now, window)[2]
+
+    def hit(self, key: str, window: int, now: float):
+        digest = self._digest(key)
+        with self._locked():
+            offset, slot = self._find(digest)
+            if slot[0] != digest:
+                slot = (digest, 0, 0, 0, 0)
+            previous, current, _ = _estimate(slot[1], slot[3], slot[4], now, window)
+            self.SLOT.pack_into(
+                self._memory.buf,
+                offset,
+                digest,
+                int(now // window),
+                int(now),
+                previous,
+                current + 1,
+            )
+
+
+def build_counter_store():
+    if settings.RATE_LIMIT_BACKEND == "shared":
+        return SharedCounterStore(
+            settings.RATE_LIMIT_SHARED_NAME, settings.RATE_LIMIT_SHARED_SLOTS
+        )
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MemoryCounterStore(settings.RATE_LIMIT_SHARED_SLOTS)
+    raise ValueError("RATE_LIMIT_BACKEND must be 'memory' or 'shared'")
+
+
+counter_store = build_counter_store()
+
+
+def client_ip(request: Request) -> str:
+    """Address of the client; run uvicorn with ``--proxy-headers`` behind a
+    proxy so that this is the forwarded address"""
+    return request.client.host if request.client else ""
+
+
+class FailureLimiter:
+    """Rejects requests from an IP or for an account with too many recent
+    failures, before any password hash or OTP lookup is spent on them
+
+    Only failures are counted, so legitimate users are never limited by
+    their own successful attempts.
+    """
+
+    def __init__(self, name: str, ip_limit: int, account_limit: int, window: int):
+        self.name = name
+        self.ip_limit = ip_limit
+        self.account_limit = account_limit
+        self.window = window
+        self.failures = 0
+        self.rejected = 0
+
+    def _keys(self, request: Request, account: Optional[str]) -> list[tuple[str, int]]:
+        keys = [(f"{self.name}:ip:{client_ip(request)}", self.ip_limit)]
+        if account:
+            keys.append((f"{self.name}:account:{account.lower()}", self.account_limit))
+        return keys
+
+    def check(self, request: Request, account: Optional[str] = None):
+        """Raise 429 when the IP or the account is over its failure limit
+
+        Raises:
+            HTTPException: 429, Too many failed attempts
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        now = time.time()
+        for key, limit in self._keys(request, account):
+            if counter_store.count(key, self.window, now) >= limit:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many failed attempts, try again later",
+                    headers={"Retry-After": str(self.window)},
+                )
+
+    def record_failure(self, request: Request, account: Optional[str] = None):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        now = time.time()
+        self.failures += 1
+        for key, _ in self._keys(request, account):
+            counter_store.hit(key, self.window, now)
+
+    def metrics(self) -> dict:
+        return {
+            "ip_limit": self.ip_limit,
+            "account_limit": self.account_limit,
+            "window_seconds": self.window,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+login_limiter = FailureLimiter(
+    "login",
+    ip_limit=settings.LOGIN_IP_FAILURE_LIMIT,
+    account_limit=settings.LOGIN_ACCOUNT_FAILURE_LIMIT,
+    window=settings.LOGIN_FAILURE_WINDOW_SECONDS,
+)
+otp_limiter = FailureLimiter(
+    "otp",
+    ip_limit=settings.OTP_IP_FAILURE_LIMIT,
+    account_limit=settings.OTP_ACCOUNT_FAILURE_LIMIT,
+    window=settings.OTP_FAILURE_WINDOW_SECONDS,
+)
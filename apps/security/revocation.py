@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import threading
+import time
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from apps.config import settings
+from apps.core.models.token_revocation import TokenRevocation
+from apps.utils.bloom_filter import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+TOKEN = "token"
+FAMILY = "family"
+USER = "user"
+
+
+class RevocationStore:
+    """Revoked refresh tokens, token families and users
+
+    Revocations are written to the ``token_revocations`` table and mirrored in
+    memory, where ``is_revoked`` answers without touching the database: a Bloom
+    filter rules out almost every live token and its rare positives are
+    confirmed against the exact set. The memory copy is loaded at startup,
+    kept in step with revocations made by other workers by ``sync`` and rid
+    of expired revocations by ``purge``.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        # key -> expiration_time
+        self._revoked: dict[str, int] = {}
+        # user id -> (revoked_at, expiration_time)
+        self._users_not_before: dict[str, tuple[int, int]] = {}
+        self._synced_at = 0
+        self._lock = threading.Lock()
+
+        self.checks = 0
+        self.filter_positives = 0
+        self.false_positives = 0
+
+    def is_revoked(self, claims: dict) -> bool:
+        """Check refresh token claims against the in-memory revocations
+
+        Args:
+            claims (dict): decoded refresh token with jti, fam, id and iat
+
+        Returns:
+            bool: True if the token, its family or its user was revoked
+        """
+        self.checks += 1
+        user_revocation = self._users_not_before.get(str(claims.get("id")))
+        if user_revocation is not None and claims.get("iat", 0) < user_revocation[0]:
+            return True
+
+        for key in (claims.get("jti"), claims.get("fam")):
+            if key is None or key not in self._filter:
+                continue
+            self.filter_positives += 1
+            if key in self._revoked:
+                return True
+            self.false_positives += 1
+        return False
+
+    def is_token_revoked(self, jti: str) -> bool:
+        """Whether this exact refresh token was revoked, i.e. already rotated"""
+        return jti in self._filter and jti in self._revoked
+
+    async def revoke_token(self, db: AsyncSession, jti: str, expiration_time: int):
+        """Revoke one refresh token
+
+        Raises:
+            IntegrityError: The token was already revoked, i.e. it is being
+                reused after rotation
+        """
+        await self._save(db, TokenRevocation(key=jti, kind=TOKEN), expiration_time)
+
+    async def revoke_family(self, db: AsyncSession, family: str, expiration_time: int):
+        """Revoke every refresh token rotated from the same login"""
+        try:
+            await self._save(
+                db, TokenRevocation(key=family, kind=FAMILY), expiration_time
+            )
+        except IntegrityError:
+            # Already revoked
+            pass
+
+    async def revoke_user(self, db: AsyncSession, user_id: int):
+        """Revoke every refresh token issued to a user until now
+
+        Used when the password, role or existence of the user changes.
+        """
+        now = int(time.time())
+        revocation = await db.merge(
+            TokenRevocation(
+                key=str(user_id),
+                kind=USER,
+                revoked_at=now,
+                expiration_time=now + settings.REFRESH_TOKEN_TIME_IN_MINUTES * 60,
+            )
+        )
+        await db.commit()
+        self._remember(revocation)
+
+    async def load(self, db: AsyncSession):
+        """Rebuild the in-memory revocations from the table"""
+        now = int(time.time())
+        revocations = (
+            await db.scalars(
+                select(TokenRevocation).filter(TokenRevocation.expiration_time > now)
+            )
+        ).all()
+        with self._lock:
+            self._filter = BloomFilter(
+                max(len(revocations) * 2, self.capacity), self.error_rate
+            )
+            self._revoked = {}
+            self._users_not_before = {}
+        for revocation in revocations:
+            self._remember(revocation)
+        self._synced_at = now
+
+    async def sync(self, db: AsyncSession, overlap: int = 5):
+        """Pick up revocations written by other workers since the last sync
+
+        ``overlap`` seconds are read again to cover transactions that
+        committed late; remembering a revocation twice is harmless.
+        """
+        now = int(time.time())
+        revocations = (
+            await db.scalars(
+                select(TokenRevocation).filter(
+                    TokenRevocation.revoked_at >= self._synced_at - overlap
+                )
+            )
+        ).all()
+        for revocation in revocations:
+            self._remember(revocation)
+        self._synced_at = now
+
+    async def purge(self, db: AsyncSession) -> int:
+        """Drop revocations of tokens that have expired anyway, from the table
+        and from memory, where the filter is rebuilt from what is left
+
+        Returns:
+            int: number of rows deleted
+        """
+        now = int(time.time())
+        result = await db.execute(
+            delete(TokenRevocation).filter(TokenRevocation.expiration_time <= now)
+        )
+        await db.commit()
+        self._forget_expired(now)
+        return result.rowcount
+
+    def metrics(self) -> dict:
+        return {
+            "revoked": len(self._revoked),
+            "users_revoked": len(self._users_not_before),
+            "filter_capacity": self._filter.capacity,
+            "filter_bytes": self._filter.nbytes,
+            "checks": self.checks,
+            "filter_positives": self.filter_positives,
+            "false_positives": self.false_positives,
+        }
+
+    async def _save(
+        self, db: AsyncSession, revocation: TokenRevocation, expiration_time: int
+    ):
+        revocation.revoked_at = int(time.time())
+        revocation.expiration_time = expiration_time
+        db.add(revocation)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            self._remember(revocation)
+            raise
+        self._remember(revocation)
+
+    def _remember(self, revocation: TokenRevocation):
+        with self._lock:
+            if revocation.kind == USER:
+                not_before, expiration_time = self._users_not_before.get(
+                    revocation.key, (0, 0)
+                )
+                self._users_not_before[revocation.key] = (
+                    max(not_before, revocation.revoked_at),
+                    max(expiration_time, revocation.expiration_time),
+                )
+                return
+            if revocation.key in self._revoked:
+                self._revoked[revocation.key] = max(
+                    self._revoked[revocation.key], revocation.expiration_time
+                )
+                return
+            self._revoked[revocation.key] = revocation.expiration_time
+            if len(self._revoked) > self._filter.capacity:
+                # Keep the false positive rate bounded as revocations pile up
+                self._filter = BloomFilter(self._filter.capacity * 2, self.error_rate)
+                for key in self._revoked:
+                    self._filter.add(key)
+            else:
+                self._filter.add(revocation.key)
+
+    def _forget_expired(self, now: int):
+        with self._lock:
+            self._revoked = {
+                key: expiration_time
+                for key, expiration_time in self._revoked.items()
+                if expiration_time > now
+            }
+            self._users_not_before = {
+                key: revocation
+                for key, revocation in self._users_not_before.items()
+                if revocation[1] > now
+            }
+            # A Bloom filter cannot forget keys, build a new one
+            self._filter = BloomFilter(
+                max(len(self._revoked) * 2, self.capacity), self.error_rate
+            )
+            for key in self._revoked:
+                self._filter.add(key)
+
+
+revocation_store = RevocationStore(
+    capacity=settings.REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.REVOCATION_FILTER_ERROR_RATE,
+)
+
+
+async def sync_revocations(
+    session_maker: async_sessionmaker, interval: int, purge_every: int = 720
+):
+    """Background task syncing the revocations every ``interval`` seconds and
+    purging expired ones every ``purge_every`` rounds"""
+    rounds = 0
+    while True:
+        await asyncio.sleep(interval)
+        rounds += 1
+        try:
+            async with session_maker() as db:
+                await revocation_store.sync(db)
+                if rounds % purge_every == 0:
+                    await revocation_store.purge(db)
+        except Exception:
+            logger.exception("Could not sync token revocations")
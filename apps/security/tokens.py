@@ -0,0 +1,230 @@
+import base64
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+from apps.common.exception import InvalidTokenException
+from apps.config import settings
+
+ASYMMETRIC_PREFIXES = ("RS", "PS", "ES")
+
+
+class TokenCodec(ABC):
+    """Signs and verifies JWTs with one algorithm and key pair
+
+    Only ``algorithm`` is accepted on decode, so a token can never pick its
+    own verification algorithm. For HMAC algorithms the signing and
+    verification keys are the same shared secret.
+    """
+
+    name: str
+
+    def __init__(
+        self,
+        algorithm: str,
+        signing_key: str,
+        verification_key: str,
+        key_id: Optional[str] = None,
+    ):
+        self.algorithm = algorithm
+        self.signing_key = signing_key
+        self.verification_key = verification_key
+        self.key_id = key_id
+        self.headers = {"kid": key_id} if key_id else None
+
+    @property
+    def is_asymmetric(self) -> bool:
+        return self.algorithm.startswith(ASYMMETRIC_PREFIXES)
+
+    @abstractmethod
+    def encode(self, claims: dict) -> str:
+        """Sign claims into a compact JWT"""
+
+    @abstractmethod
+    def decode(self, token: str) -> dict:
+        """Verify a JWT and return its claims
+
+        Raises:
+            InvalidTokenException: Bad signature, malformed or expired token
+        """
+
+
+class JoseTokenCodec(TokenCodec):
+    name = "jose"
+
+    def __init__(self, *args, **kwargs):
+        from jose import JWTError, jwt
+
+        super().__init__(*args, **kwargs)
+        self._jwt = jwt
+        self._error = JWTError
+
+    def encode(self, claims: dict) -> str:
+        return self._jwt.encode(
+            claims, self.signing_key, algorithm=self.algorithm, headers=self.headers
+        )
+
+    def decode(self, token: str) -> dict:
+        try:
+            return self._jwt.decode(
+                token, self.verification_key, algorithms=[self.algorithm]
+            )
+        except self._error as e:
+            raise InvalidTokenException(message=str(e)) from e
+
+
+class PyJWTTokenCodec(TokenCodec):
+    """PyJWT backend; needs ``PyJWT``
+
+    Keys are parsed once, which makes RS*/ES* signing and verification much
+    faster than python-jose. See ``benchmarks.jwt_codec``.
+    """
+
+    name = "pyjwt"
+
+    def __init__(self, *args, **kwargs):
+        try:
+            import jwt
+        except ImportError as e:
+            raise ValueError("JWT_BACKEND=pyjwt requires PyJWT") from e
+
+        super().__init__(*args, **kwargs)
+        self._jwt = jwt
+        self._signing_key = self.signing_key
+        self._verification_key = self.verification_key
+        if self.is_asymmetric:
+            # Parse the PEM keys once instead of on every call
+            self._signing_key = serialization.load_pem_private_key(
+                self.signing_key.encode(), password=None
+            )
+            self._verification_key = serialization.load_pem_public_key(
+                self.verification_key.encode()
+            )
+
+    def encode(self, claims: dict) -> str:
+        return self._jwt.encode(
+            claims, self._signing_key, algorithm=self.algorithm, headers=self.headers
+        )
+
+    def decode(self, token: str) -> dict:
+        try:
+            return self._jwt.decode(
+                token, self._verification_key, algorithms=[self.algorithm]
+            )
+        except self._jwt.PyJWTError as e:
+            raise InvalidTokenException(message=str(e)) from e
+
+
+CODECS: dict[str, type[TokenCodec]] = {
+    JoseTokenCodec.name: JoseTokenCodec,
+    PyJWTTokenCodec.name: PyJWTTokenCodec,
+}
+
+
+def load_key_pair(private_key_path: str, public_key_path: str = "") -> tuple[str, str]:
+    """Read a PEM private key and its public key
+
+    Args:
+        private_key_path (str): Path of the PEM encoded private key
+        public_key_path (str, optional): Path of the PEM encoded public key,
+            derived from the private key when empty
+
+    Returns:
+        tuple[str, str]: private key PEM, public key PEM
+    """
+    private_pem = Path(private_key_path).read_text()
+    if public_key_path:
+        return private_pem, Path(public_key_path).read_text()
+
+    private_key = serialization.load_pem_private_key(
+        private_pem.encode(), password=None
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem, public_pem.decode()
+
+
+def build_codec(
+    backend: str = settings.JWT_BACKEND,
+    algorithm: str = settings.ALGORITHM,
+) -> TokenCodec:
+    """Build the token codec configured in settings
+
+    Raises:
+        ValueError: Unknown backend or missing key configuration
+
+    Returns:
+        TokenCodec: codec used for every token the API issues
+    """
+    if backend not in CODECS:
+        raise ValueError(f"JWT_BACKEND must be one of {', '.join(CODECS)}")
+
+    if algorithm.startswith(ASYMMETRIC_PREFIXES):
+        if not settings.JWT_PRIVATE_KEY_PATH:
+            raise ValueError(f"ALGORITHM={algorithm} requires JWT_PRIVATE_KEY_PATH")
+        signing_key, verification_key = load_key_pair(
+            settings.JWT_PRIVATE_KEY_PATH, settings.JWT_PUBLIC_KEY_PATH
+        )
+    else:
+        signing_key = verification_key = str(settings.SECRET_KEY)
+
+    return CODECS[backend](
+        algorithm, signing_key, verification_key, key_id=settings.JWT_KEY_ID or None
+    )
+
+
+def _b64_uint(value: int, length: Optional[int] = None) -> str:
+    length = length or (value.bit_length() + 7) // 8
+    return base64.urlsafe_b64encode(value.to_bytes(length, "big")).rstrip(b"=").decode()
+
+
+def public_jwk(public_key_pem: str, algorithm: str, key_id: Optional[str]) -> dict:
+    """Describe a PEM public key as a JWK
+
+    Args:
+        public_key_pem (str): PEM encoded RSA or EC public key
+        algorithm (str): JWS algorithm the key is used with
+        key_id (str, optional): Key id put in the token header
+
+    Returns:
+        dict: JWK
+    """
+    public_key = serialization.load_pem_public_key(public_key_pem.encode())
+    jwk = {"alg": algorithm, "use": "sig"}
+    if key_id:
+        jwk["kid"] = key_id
+
+    if isinstance(public_key, rsa.RSAPublicKey):
+        numbers = public_key.public_numbers()
+        jwk.update(kty="RSA", n=_b64_uint(numbers.n), e=_b64_uint(numbers.e))
+    elif isinstance(public_key, ec.EllipticCurvePublicKey):
+        numbers = public_key.public_numbers()
+        size = (public_key.curve.key_size + 7) // 8
+        curve = {"secp256r1": "P-256", "secp384r1": "P-384", "secp521r1": "P-521"}
+        jwk.update(
+            kty="EC",
+            crv=curve[public_key.curve.name],
+            x=_b64_uint(numbers.x, size),
+            y=_b64_uint(numbers.y, size),
+        )
+    else:
+        raise ValueError("Only RSA and EC public keys can be published")
+    return jwk
+
+
+def jwks(codec: TokenCodec) -> dict:
+    """JWKS document with the codec's verification key
+
+    Shared HMAC secrets are never published, so the document is empty unless
+    an asymmetric algorithm is configured.
+    """
+    if not codec.is_asymmetric:
+        return {"keys": []}
+    return {"keys": [public_jwk(codec.verification_key, codec.algorithm, codec.key_id)]}
+
+
+token_codec = build_codec()
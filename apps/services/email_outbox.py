@@ -0,0 +1,318 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from apps.common.enum import EmailStatusEnum
+from apps.config import settings
+from apps.core.models.email_outbox import EmailOutbox
+from apps.core.models.notification import Notification
+from apps.services.notifications import expand_notifications
+from apps.services.send_email import send_email
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(
+    db: AsyncSession,
+    subject: str,
+    receiver: List[str],
+    body: dict,
+    template_name: str,
+    dedupe_key: Optional[str] = None,
+) -> EmailOutbox:
+    """Add an email to the outbox in the caller's transaction
+
+    Nothing is sent until the caller commits, and nothing is sent if it rolls
+    back. Call ``outbox_worker.notify()`` after the commit to deliver it
+    without waiting for the next poll.
+
+    Args:
+        db (AsyncSession): Async database session of the business change
+        subject (str): Email subject
+        receiver (List[str]): Recipients
+        body (dict): Template values
+        template_name (str): Eg. otp_template.html
+        dedupe_key (str, optional): Key for enqueue_email_once
+
+    Returns:
+        EmailOutbox: pending outbox row
+    """
+    email = EmailOutbox(
+        subject=subject,
+        recipients=list(receiver),
+        template_name=template_name,
+        body=body,
+        dedupe_key=dedupe_key,
+        status=EmailStatusEnum.PENDING,
+        attempts=0,
+        next_attempt_at=datetime.now(timezone.utc),
+    )
+    db.add(email)
+    return email
+
+
+def verification_email_key(user_id: int) -> str:
+    """Dedupe key shared by every verification email of a user"""
+    return f"verification:{user_id}"
+
+
+async def enqueue_email_once(
+    db: AsyncSession,
+    dedupe_key: str,
+    window_seconds: int,
+    subject: str,
+    receiver: List[str],
+    body: dict,
+    template_name: str,
+) -> tuple[EmailOutbox, bool]:
+    """Add an email to the outbox unless one with the same key is still
+    pending or was sent less than ``window_seconds`` ago
+
+    The earlier email, and whatever token it carries, stands for both.
+
+    Returns:
+        tuple[EmailOutbox, bool]: outbox row, True if it was added now
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=window_seconds)
+    existing = await db.scalar(
+        select(EmailOutbox)
+        .filter(
+            EmailOutbox.dedupe_key == dedupe_key,
+            or_(
+                EmailOutbox.status == EmailStatusEnum.PENDING,
+                and_(
+                    EmailOutbox.status == EmailStatusEnum.SENT,
+                    EmailOutbox.sent_at >= cutoff,
+                ),
+            ),
+        )
+        .limit(1)
+    )
+    if existing is not None:
+        return existing, False
+
+    email = enqueue_email(
+        db,
+        subject=subject,
+        receiver=receiver,
+        body=body,
+        template_name=template_name,
+        dedupe_key=dedupe_key,
+    )
+    return email, True
+
+
+class EmailOutboxWorker:
+    """Delivers pending outbox emails in the background
+
+    Each round first adds the next ``chunk_size`` recipients of a bulk
+    notification to the outbox, then claims up to ``batch_size`` due emails,
+    lowest priority first, with ``FOR UPDATE SKIP LOCKED``, so several workers
+    can drain the outbox without sending an email twice. They are sent
+    ``concurrency`` at a time and at most ``rate_per_second`` per worker. A
+    failed email is retried with exponential backoff and jitter and marked
+    FAILED after ``max_attempts``. Delivery is at least once: an email sent
+    right before a crash can be sent again.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        concurrency: int,
+        max_attempts: int,
+        backoff_seconds: float,
+        max_backoff_seconds: float,
+        rate_per_second: float,
+        chunk_size: int,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.rate_per_second = rate_per_second
+        self.chunk_size = chunk_size
+        self._wakeup: Optional[asyncio.Event] = None
+        self._next_send = 0.0
+
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def notify(self):
+        """Wake the worker up after committing new outbox emails"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def backoff(self, attempts: int) -> timedelta:
+        delay = min(
+            self.backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds
+        )
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    async def throttle(self):
+        """Wait for the next send slot of ``rate_per_second``"""
+        if not self.rate_per_second:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(self._next_send, now)
+        self._next_send = slot + 1 / self.rate_per_second
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def drain(self, db: AsyncSession) -> int:
+        """Send one batch of due emails
+
+        Returns:
+            int: number of emails attempted
+        """
+        now = datetime.now(timezone.utc)
+        emails = (
+            await db.scalars(
+                select(EmailOutbox)
+                .filter(
+                    EmailOutbox.status == EmailStatusEnum.PENDING,
+                    EmailOutbox.next_attempt_at <= now,
+                )
+                .order_by(
+                    EmailOutbox.priority, EmailOutbox.next_attempt_at, EmailOutbox.id
+                )
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+        if not emails:
+            await db.rollback()
+            return 0
+
+        # Bulk emails only hold the recipient's values, the shared ones are on
+        # their notification
+        notification_ids = {e.notification_id for e in emails if e.notification_id}
+        shared_bodies = {}
+        if notification_ids:
+            shared_bodies = dict(
+                (
+                    await db.execute(
+                        select(Notification.id, Notification.body).filter(
+                            Notification.id.in_(notification_ids)
+                        )
+                    )
+                ).all()
+            )
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(email: EmailOutbox) -> Optional[Exception]:
+            body = {
+                **shared_bodies.get(email.notification_id, {}),
+                **(email.body or {}),
+            }
+            async with semaphore:
+                await self.throttle()
+                try:
+                    await send_email(
+                        subject=email.subject,
+                        receiver=email.recipients,
+                        body=body,
+                        template_name=email.template_name,
+                    )
+                except Exception as e:
+                    return e
+            return None
+
+        errors = await asyncio.gather(*(deliver(email) for email in emails))
+
+        now = datetime.now(timezone.utc)
+        for email, error in zip(emails, errors):
+            email.attempts += 1
+            if error is None:
+                email.status = EmailStatusEnum.SENT
+                email.sent_at = now
+                email.body = None
+                email.last_error = None
+                self.sent += 1
+            elif email.attempts >= self.max_attempts:
+                email.status = EmailStatusEnum.FAILED
+                email.last_error = str(error)
+                self.failed += 1
+                logger.error("Giving up on outbox email %s: %s", email.id, error)
+            else:
+                email.next_attempt_at = now + self.backoff(email.attempts)
+                email.last_error = str(error)
+                self.retried += 1
+                logger.warning(
+                    "Outbox email %s failed, will retry: %s", email.id, error
+                )
+        await db.commit()
+        return len(emails)
+
+    async def run(self, session_maker: async_sessionmaker):
+        """Background task expanding notifications and draining the outbox
+        until cancelled
+
+        Full chunks and batches are followed by the next round right away;
+        otherwise the worker sleeps until ``notify`` or ``poll_interval``,
+        whichever is first.
+        """
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                async with session_maker() as db:
+                    expanded = await expand_notifications(db, self.chunk_size)
+            except Exception:
+                logger.exception("Could not expand notifications")
+                expanded = 0
+            try:
+                async with session_maker() as db:
+                    attempted = await self.drain(db)
+            except Exception:
+                logger.exception("Could not drain the email outbox")
+                attempted = 0
+            if attempted >= self.batch_size or expanded >= self.chunk_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def metrics(self, db: AsyncSession) -> dict:
+        counts = dict(
+            (
+                await db.execute(
+                    select(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(
+                        EmailOutbox.status
+                    )
+                )
+            ).all()
+        )
+        return {
+            "pending": counts.get(EmailStatusEnum.PENDING, 0),
+            "sent": counts.get(EmailStatusEnum.SENT, 0),
+            "failed": counts.get(EmailStatusEnum.FAILED, 0),
+            "worker": {
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+            },
+        }
+
+
+outbox_worker = EmailOutboxWorker(
+    batch_size=settings.EMAIL_OUTBOX_BATCH_SIZE,
+    poll_interval=settings.EMAIL_OUTBOX_POLL_INTERVAL_SECONDS,
+    concurrency=settings.EMAIL_OUTBOX_CONCURRENCY,
+    max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    backoff_seconds=settings.EMAIL_OUTBOX_BACKOFF_SECONDS,
+    max_backoff_seconds=settings.EMAIL_OUTBOX_MAX_BACKOFF_SECONDS,
+    rate_per_second=settings.EMAIL_OUTBOX_RATE_PER_SECOND,
+    chunk_size=settings.NOTIFICATION_CHUNK_SIZE,
+)
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
+from pathlib import Path
+from typing import List, Optional
+
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+from jinja2 import Environment, FileSystemLoader, Template
+
+logger = logging.getLogger(__name__)
+
+
+class MailTemplates:
+    """Email templates compiled once
+
+    ``compile`` loads every template of the folder up front, so sending never
+    touches the disk or the Jinja compiler.
+    """
+
+    def __init__(self, folder: Path):
+        self.environment = Environment(
+            loader=FileSystemLoader(folder), autoescape=True, auto_reload=False
+        )
+        self._templates: dict[str, Template] = {}
+
+    def compile(self) -> int:
+        """Compile every template
+
+        Returns:
+            int: number of templates compiled
+        """
+        for name in self.environment.list_templates():
+            self._templates[name] = self.environment.get_template(name)
+        return len(self._templates)
+
+    def render(self, template_name: str, body: dict) -> str:
+        template = self._templates.get(template_name)
+        if template is None:
+            template = self._templates[template_name] = (
+                self.environment.get_template(template_name)
+            )
+        return template.render(**body)
+
+
+class _Connection:
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPTransport:
+    """Pool of authenticated SMTP connections
+
+    Up to ``pool_size`` connections are opened on demand and kept between
+    messages, so the TCP, TLS and AUTH handshakes are paid once per connection
+    instead of once per email; concurrent sends use different connections. A
+    connection is recycled after ``max_messages`` messages or ``idle_timeout``
+    seconds without use, and a send that finds its connection dropped by the
+    server is retried once on a fresh one.
+    """
+
+    def __init__(
+        self,
+        config: ConnectionConfig,
+        templates: MailTemplates,
+        pool_size: int,
+        max_messages: int,
+        idle_timeout: float,
+    ):
+        self.config = config
+        self.templates = templates
+        self.pool_size = pool_size
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self._idle: list[_Connection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        return self._slots
+
+    def start(self) -> int:
+        """Compile the templates; connections are opened on first use
+
+        Returns:
+            int: number of templates compiled
+        """
+        return self.templates.compile()
+
+    def build_message(
+        self, subject: str, receiver: List[str], html: str
+    ) -> EmailMessage:
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = formataddr(
+            (self.config.MAIL_FROM_NAME or "", str(self.config.MAIL_FROM))
+        )
+        message["To"] = ", ".join(receiver)
+        message.set_content(html, subtype="html")
+        return message
+
+    async def send(
+        self, subject: str, receiver: List[str], body: dict, template_name: str
+    ):
+        """Render a template and send it over a pooled connection
+
+        Raises:
+            aiosmtplib.SMTPException: The server refused the message
+        """
+        html = self.templates.render(template_name, body)
+        await self.send_message(self.build_message(subject, receiver, html))
+
+    async def send_message(self, message: EmailMessage):
+        async with self.slots:
+            connection = await self._acquire()
+            try:
+                try:
+                    await connection.smtp.send_message(message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    await self._discard(connection)
+                    connection = await self._open()
+                    await connection.smtp.send_message(message)
+            except Exception:
+                await self._discard(connection)
+                raise
+            connection.sent += 1
+            connection.last_used = time.monotonic()
+            self.messages_sent += 1
+            if connection.sent >= self.max_messages:
+                await self._discard(connection)
+            else:
+                self._idle.append(connection)
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await self._discard(connection)
+
+    def metrics(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "idle_connections": len(self._idle),
+            "connections_opened": self.connections_opened,
+            "messages_sent": self.messages_sent,
+        }
+
+    async def _acquire(self) -> _Connection:
+        now = time.monotonic()
+        while self._idle:
+            connection = self._idle.pop()
+            if (
+                connection.smtp.is_connected
+                and now - connection.last_used < self.idle_timeout
+            ):
+                return connection
+            await self._discard(connection)
+        return await self._open()
+
+    async def _open(self) -> _Connection:
+        config = self.config
+        smtp = aiosmtplib.SMTP(
+            hostname=config.MAIL_SERVER,
+            port=config.MAIL_PORT,
+            use_tls=config.MAIL_SSL_TLS,
+            start_tls=config.MAIL_STARTTLS,
+            validate_certs=config.VALIDATE_CERTS,
+            timeout=config.TIMEOUT,
+            local_hostname=config.LOCAL_HOSTNAME,
+            cert_bundle=config.CERT_BUNDLE,
+        )
+        await smtp.connect()
+        if config.USE_CREDENTIALS:
+            await smtp.login(
+                config.MAIL_USERNAME, config.MAIL_PASSWORD.get_secret_value()
+            )
+        self.connections_opened += 1
+        return _Connection(smtp)
+
+    async def _discard(self, connection: _Connection):
+        try:
+            if connection.smtp.is_connected:
+                await connection.smtp.quit()
+        except Exception:
+            connection.smtp.close()
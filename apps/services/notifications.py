@@ -0,0 +1,147 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import bindparam, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.apis.v1.users.filter_sort import Filter
+from apps.common.enum import EmailStatusEnum, NotificationStatusEnum
+from apps.core.models import Users
+from apps.core.models.email_outbox import EmailOutbox
+from apps.core.models.notification import Notification
+from apps.core.schemas.notification import (
+    NotificationCreateSchema,
+    NotificationRecipientFilterSchema,
+)
+from apps.utils.database_utils import count
+
+ANNOUNCEMENT_TEMPLATE = "announcement_template.html"
+# Transactional emails use priority 0 and are always sent first
+BULK_PRIORITY = 10
+
+
+def recipients_statement(filters: dict):
+    """Recipients of a notification, with the same filters as the user list
+
+    Returns:
+        tuple[Select, dict]: statement selecting id, email and first name, and
+            its bind values
+    """
+    filter_params = NotificationRecipientFilterSchema(**filters).model_dump()
+    params = Filter().user_params(**filter_params)
+    statement = Filter().filter_users(
+        select(Users.id, Users.email, Users.first_name), **params
+    )
+    return statement.distinct(), params
+
+
+async def create_notification(
+    db: AsyncSession, data: NotificationCreateSchema, created_by: Optional[int]
+) -> Notification:
+    """Add a notification to be fanned out by the outbox worker
+
+    Only the recipient count is computed here; the caller commits and the
+    recipients are added to the outbox in the background.
+    """
+    filters = data.recipients.model_dump(mode="json")
+    statement, params = recipients_statement(filters)
+    notification = Notification(
+        subject=data.subject,
+        template_name=ANNOUNCEMENT_TEMPLATE,
+        body={"subject": data.subject, "message": data.message},
+        filters=filters,
+        created_by=created_by,
+        status=NotificationStatusEnum.EXPANDING,
+        total=await count(db, statement, params),
+        enqueued=0,
+        last_user_id=0,
+    )
+    db.add(notification)
+    return notification
+
+
+async def expand_notifications(db: AsyncSession, chunk_size: int) -> int:
+    """Add the next chunk of recipients of one notification to the outbox
+
+    The notification row is locked with ``SKIP LOCKED`` and the chunk is read
+    by keyset on the user id, so several workers can expand notifications
+    concurrently and an interrupted fan-out resumes where it stopped.
+
+    Returns:
+        int: number of emails added to the outbox
+    """
+    notification = await db.scalar(
+        select(Notification)
+        .filter(Notification.status == NotificationStatusEnum.EXPANDING)
+        .order_by(Notification.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if notification is None:
+        await db.rollback()
+        return 0
+
+    statement, params = recipients_statement(notification.filters)
+    recipients = (
+        await db.execute(
+            statement.filter(Users.id > bindparam("last_user_id"))
+            .order_by(Users.id)
+            .limit(chunk_size),
+            {**params, "last_user_id": notification.last_user_id},
+        )
+    ).all()
+
+    now = datetime.now(timezone.utc)
+    if recipients:
+        await db.execute(
+            insert(EmailOutbox),
+            [
+                {
+                    "subject": notification.subject,
+                    "recipients": [email],
+                    "template_name": notification.template_name,
+                    "body": {"username": (first_name or "").capitalize()},
+                    "status": EmailStatusEnum.PENDING,
+                    "priority": BULK_PRIORITY,
+                    "notification_id": notification.id,
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                }
+                for _, email, first_name in recipients
+            ],
+        )
+        notification.enqueued += len(recipients)
+        notification.last_user_id = recipients[-1][0]
+
+    if len(recipients) < chunk_size:
+        notification.status = NotificationStatusEnum.ENQUEUED
+    await db.commit()
+    return len(recipients)
+
+
+async def notification_progress(db: AsyncSession, notification: Notification) -> dict:
+    """Delivery progress of a notification
+
+    Returns:
+        dict: notification with its pending, sent and failed email counts
+    """
+    counts = dict(
+        (
+            await db.execute(
+                select(EmailOutbox.status, func.count(EmailOutbox.id))
+                .filter(EmailOutbox.notification_id == notification.id)
+                .group_by(EmailOutbox.status)
+            )
+        ).all()
+    )
+    return {
+        "id": notification.id,
+        "subject": notification.subject,
+        "status": notification.status,
+        "total": notification.total,
+        "enqueued": notification.enqueued,
+        "pending": counts.get(EmailStatusEnum.PENDING, 0),
+        "sent": counts.get(EmailStatusEnum.SENT, 0),
+        "failed": counts.get(EmailStatusEnum.FAILED, 0),
+        "created_at": notification.created_at,
+    }
@@ -1,11 +1,11 @@
 from typing import List
 from pathlib import Path
-from fastapi.templating import Jinja2Templates
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+from fastapi_mail import ConnectionConfig
 
 from apps.config import settings
+from apps.services.mail_transport import MailTemplates, SMTPTransport
 
-templates = Jinja2Templates(directory=Path(__file__).parent.parent / "templates")
+TEMPLATE_FOLDER = Path(__file__).parent.parent / "templates"
 
 # For Gmail
 # conf = ConnectionConfig(
@@ -31,7 +31,15 @@ conf = ConnectionConfig(
     MAIL_SERVER="mailhog",
     MAIL_STARTTLS=False,
     MAIL_SSL_TLS=False,
-    TEMPLATE_FOLDER=Path(__file__).parent.parent / "templates",
+    TEMPLATE_FOLDER=TEMPLATE_FOLDER,
+)
+
+mail_transport = SMTPTransport(
+    config=conf,
+    templates=MailTemplates(TEMPLATE_FOLDER),
+    pool_size=settings.MAIL_POOL_SIZE,
+    max_messages=settings.MAIL_MAX_MESSAGES_PER_CONNECTION,
+    idle_timeout=settings.MAIL_IDLE_TIMEOUT_SECONDS,
 )
 
 
@@ -42,18 +50,10 @@ async def send_email(
     subject: str
     body: dict // to send values to template
     template_name: str Eg. otp_template.html
+
+    Raises on delivery failure; routes do not call this directly but go
+    through apps.services.email_outbox, which retries.
     """
-    try:
-        message = MessageSchema(
-            subject=subject,
-            recipients=receiver,
-            subtype="html",
-            template_body=body,
-            template_path=Path(__file__).parent.parent / "templates",
-            template_name=template_name,
-        )
-        fm = FastMail(conf)
-        await fm.send_message(message=message, template_name=template_name)
-        return {"message": "Email sent successfully"}
-    except Exception as e:
-        print("Exception:::", str(e))
+    await mail_transport.send(
+        subject=subject, receiver=receiver, body=body, template_name=template_name
+    )
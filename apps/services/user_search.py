@@ -0,0 +1,116 @@
+from sqlalchemy import Float, Integer, Text, bindparam, func, literal, or_, select
+from sqlalchemy import union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.config import settings
+from apps.core.models.users import (
+    Profile,
+    Users,
+    profile_search_document,
+    user_search_document,
+)
+from apps.utils.database_utils import statement_cache
+
+
+def _result_columns():
+    return (
+        Users.id,
+        Users.first_name,
+        Users.last_name,
+        Users.email,
+        Profile.city,
+        Profile.cell_phone,
+    )
+
+
+def trigram_search_statement():
+    """Users ranked by trigram word similarity, PostgreSQL with pg_trgm
+
+    Each search document is read from its GiST index in order of distance to
+    the query and only the ``limit`` nearest rows of each are kept, so the
+    cost depends on the page size rather than on the number of users. The
+    two candidate lists are merged per user and ranked by their best match.
+    """
+    query = bindparam("q", type_=Text)
+    limit = bindparam("limit", type_=Integer)
+    user_document = user_search_document(Users.first_name, Users.last_name, Users.email)
+    profile_document = profile_search_document(Profile.city, Profile.cell_phone)
+    user_distance = user_document.op("<->>", return_type=Float)(query)
+    profile_distance = profile_document.op("<->>", return_type=Float)(query)
+
+    candidates = union_all(
+        select(Users.id.label("user_id"), user_distance.label("distance"))
+        .order_by(user_distance)
+        .limit(limit),
+        select(Profile.user_id.label("user_id"), profile_distance.label("distance"))
+        .filter(Profile.user_id.is_not(None))
+        .order_by(profile_distance)
+        .limit(limit),
+    ).subquery()
+    best = (
+        select(candidates.c.user_id, func.min(candidates.c.distance).label("distance"))
+        .group_by(candidates.c.user_id)
+        .subquery()
+    )
+
+    return (
+        select(*_result_columns(), (1 - best.c.distance).label("rank"))
+        .join(best, best.c.user_id == Users.id)
+        .outerjoin(Profile, Profile.user_id == Users.id)
+        .filter(best.c.distance <= bindparam("max_distance", type_=Float))
+        .order_by(best.c.distance, Users.id)
+        .limit(limit)
+    )
+
+
+def substring_search_statement():
+    """Users whose search documents contain the query, unranked
+
+    Used on databases without pg_trgm.
+    """
+    pattern = bindparam("pattern", type_=Text)
+    return (
+        select(*_result_columns(), literal(1.0).label("rank"))
+        .outerjoin(Profile, Profile.user_id == Users.id)
+        .filter(
+            or_(
+                user_search_document(
+                    Users.first_name, Users.last_name, Users.email
+                ).ilike(pattern),
+                profile_search_document(Profile.city, Profile.cell_phone).ilike(
+                    pattern
+                ),
+            )
+        )
+        .order_by(Users.id)
+        .limit(bindparam("limit", type_=Integer))
+    )
+
+
+async def search_users(db: AsyncSession, query: str, limit: int) -> list[dict]:
+    """Users matching a free text query on first and last name, email, city
+    and cell phone, best match first
+
+    Args:
+        db (AsyncSession): Async database session
+        query (str): Search text
+        limit (int): Maximum number of users
+
+    Returns:
+        list[dict]: id, names, email, city, cell_phone and rank from 0 to 1
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        statement = statement_cache.get(("user_search",), trigram_search_statement)
+        params = {
+            "q": query,
+            "limit": limit,
+            "max_distance": 1 - settings.USER_SEARCH_MIN_SIMILARITY,
+        }
+    else:
+        statement = statement_cache.get(
+            ("user_search_substring",), substring_search_statement
+        )
+        params = {"pattern": f"%{query}%", "limit": limit}
+
+    result = await db.execute(statement, params)
+    return [dict(row) for row in result.mappings()]
@@ -0,0 +1,221 @@
+"""Rows fetched by the endpoints that load relationships
+
+Relationships are ``lazy="raise_on_sql"``, so every endpoint loads what its
+response needs. These tests create the schema in the throwaway database named
+by ``TEST_DATABASE_URL`` (an async URL, e.g. ``postgresql+asyncpg://...``) and
+are skipped when it is not set. They seed an instructor with students, each
+with a profile, contacts, pickup locations and transactions, inside a
+transaction that is rolled back, call the route handlers, serialize the
+results through the response schemas as FastAPI would, and count the rows
+returned by every SELECT the endpoint ran.
+A relationship an endpoint forgot to load raises; one that is joined back onto
+a list multiplies its rows.
+"""
+
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import apps.core.models  # noqa: F401 registers every table on Base.metadata
+from apps.apis.v1.accounts.transaction_routes import get_transactions
+from apps.apis.v1.users.instructor_routes import list_students
+from apps.apis.v1.users.profile_routes import profile
+from apps.apis.v1.users.user_routes import get_user_sort_filter
+from apps.common.enum import RoleEnum, TransactionMethodEnum
+from apps.config.db.base import Base
+from apps.core.models.transaction import Transaction
+from apps.core.models.users import ContactInformation, PickupLocation, Profile, Users
+from apps.core.schemas.profile import UserProfileGetResponse
+from apps.core.schemas.transaction import (
+    TransactionFilterSchema,
+    TransactionResponseSchemaTotal,
+)
+from apps.core.schemas.user import UserFilterSchema, UserResponseSchemaTotal
+from apps.security.auth import jwt_service
+from apps.security.principal import Principal
+
+pytestmark = pytest.mark.anyio
+
+DOMAIN = "rows-test.example"
+STUDENTS = 15
+TRANSACTIONS = 20
+CONTACTS = 2
+PICKUPS = 2
+LIMIT = 10
+
+
+@pytest.fixture(scope="module")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="module")
+async def session_maker():
+    """Create the schema in the test database and drop it afterwards"""
+    engine = create_async_engine(TEST_DATABASE_URL)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+@pytest.fixture
+async def db(session_maker):
+    async with session_maker() as session:
+        try:
+            yield session
+        finally:
+            await session.rollback()
+
+
+@pytest.fixture
+async def seeded(db):
+    instructor = Users(
+        first_name="instructor",
+        email=f"instructor@{DOMAIN}",
+        password="",
+        role=RoleEnum.INSTRUCTOR,
+    )
+    db.add(instructor)
+    await db.flush()
+
+    for i in range(STUDENTS):
+        student = Users(
+            first_name=f"student{i}",
+            email=f"student{i}@{DOMAIN}",
+            password="",
+            role=RoleEnum.STUDENT,
+            instructor_id=instructor.id,
+        )
+        db.add(student)
+        await db.flush()
+        user_profile = Profile(user_id=student.id, city="austin")
+        db.add(user_profile)
+        await db.flush()
+        db.add_all(
+            [
+                ContactInformation(user_id=user_profile.id, contact_name=f"c{n}")
+                for n in range(CONTACTS)
+            ]
+            + [
+                PickupLocation(user_id=user_profile.id, name=f"p{n}")
+                for n in range(PICKUPS)
+            ]
+            + [
+                Transaction(
+                    user_id=student.id, amount=10, method=TransactionMethodEnum.CASH
+                )
+                for _ in range(TRANSACTIONS)
+            ]
+        )
+    await db.flush()
+    return (
+        Principal(id=instructor.id, email=instructor.email, role=RoleEnum.INSTRUCTOR),
+        Principal(id=student.id, email=student.email, role=RoleEnum.STUDENT),
+    )
+
+
+@dataclass
+class Fetched:
+    statements: int = 0
+    rows: int = 0
+
+
+@asynccontextmanager
+async def fetched(db):
+    """Count the SELECTs run inside the block and the rows they returned"""
+    db.expunge_all()
+    conn = await db.connection()
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            executed.append((statement, parameters))
+
+    event.listen(conn.sync_engine, "before_cursor_execute", record)
+    result = Fetched()
+    try:
+        yield result
+    finally:
+        event.remove(conn.sync_engine, "before_cursor_execute", record)
+
+    result.statements = len(executed)
+    for statement, parameters in executed:
+        result.rows += (
+            await conn.exec_driver_sql(
+                f"SELECT count(*) FROM ({statement}) AS counted", parameters
+            )
+        ).scalar()
+
+
+async def test_get_user_does_not_join_transactions(db, seeded):
+    _, student = seeded
+    async with fetched(db) as rows:
+        user = await jwt_service.get_user(email=student.email, db=db)
+
+    assert user.id == student.id
+    assert (rows.statements, rows.rows) == (1, 1)
+
+
+async def test_user_list(db, seeded):
+    async with fetched(db) as rows:
+        response = await get_user_sort_filter(
+            limit=LIMIT, fields=None, user_filter_params=UserFilterSchema(), db=db
+        )
+        UserResponseSchemaTotal.model_validate(response, from_attributes=True)
+
+    # The page, the row after it and the total
+    assert rows.statements <= 2
+    assert rows.rows <= LIMIT + 2
+
+
+async def test_instructor_students(db, seeded):
+    instructor, _ = seeded
+    async with fetched(db) as rows:
+        response = await list_students(
+            limit=LIMIT, fields=None, current_user=instructor, db=db
+        )
+        UserResponseSchemaTotal.model_validate(response, from_attributes=True)
+
+    assert len(response["users"]) == LIMIT
+    assert rows.statements <= 2
+    assert rows.rows <= LIMIT + 2
+
+
+async def test_transaction_list_joins_only_the_user(db, seeded):
+    async with fetched(db) as rows:
+        response = await get_transactions(
+            limit=LIMIT,
+            fields=None,
+            transactions_filter_params=TransactionFilterSchema(),
+            method=[TransactionMethodEnum.CASH],
+            db=db,
+        )
+        TransactionResponseSchemaTotal.model_validate(response, from_attributes=True)
+
+    assert rows.statements <= 2
+    assert rows.rows <= LIMIT + 2
+
+
+async def test_profile_loads_its_collections_once(db, seeded):
+    _, student = seeded
+    async with fetched(db) as rows:
+        response = await profile(current_user=student, db=db)
+        UserProfileGetResponse.model_validate(response, from_attributes=True)
+
+    # User, schools, transactions, profile, contacts and pickup locations
+    assert rows.statements == 6
+    assert rows.rows == 2 + TRANSACTIONS + CONTACTS + PICKUPS
@@ -1,7 +1,36 @@
-from fastapi import HTTPException
-from sqlalchemy.orm import Session
+import base64
+import binascii
+import enum
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import date, datetime
+from datetime import time as time_of_day
+from typing import Any, Callable, Hashable, Iterable, NamedTuple, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import (
+    Integer,
+    Select,
+    and_,
+    bindparam,
+    func,
+    inspect,
+    literal_column,
+    or_,
+    select,
+    tuple_,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.sql.expression import ClauseElement, Executable
 from sqlalchemy.exc import IntegrityError
 
+from apps.config import settings
+
 
 def create_and_commit(db: Session, model, obj_data):
     try:
@@ -16,3 +45,473 @@ def create_and_commit(db: Session, model, obj_data):
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+
+
+class StatementCache:
+    """Bounded LRU of select statements keyed by their shape
+
+    A statement built once and reused keeps its memoized cache key, so every
+    execution is a SQLAlchemy compiled cache hit and sends identical SQL,
+    which lets asyncpg reuse its server-side prepared statement. Statements
+    stored here must use ``bindparam`` placeholders instead of literal values.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._statements: OrderedDict[Hashable, Select] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, build: Callable[[], Select]) -> Select:
+        with self._lock:
+            statement = self._statements.get(key)
+            if statement is not None:
+                self.hits += 1
+                self._statements.move_to_end(key)
+                return statement
+            self.misses += 1
+
+        statement = build()
+        with self._lock:
+            self._statements[key] = statement
+            while len(self._statements) > self.maxsize:
+                self._statements.popitem(last=False)
+        return statement
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._statements),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+statement_cache = StatementCache(settings.STATEMENT_CACHE_SIZE)
+
+# Derived statements are memoized per source statement so that cached
+# statements keep producing cached count and page statements
+_count_statements: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_page_statements: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_keyset_statements: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+# Sort order of the statements built by keyset_order
+_keysets: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+class Keyset(NamedTuple):
+    """Sort column of a statement and its unique tie-breaker"""
+
+    column: Any
+    tie_breaker: Any
+    descending: bool
+
+    @property
+    def columns(self) -> tuple:
+        if self.column is self.tie_breaker:
+            return (self.tie_breaker,)
+        return (self.column, self.tie_breaker)
+
+    @property
+    def nullable(self) -> bool:
+        return self.column is not self.tie_breaker and bool(
+            self.column.expression.nullable
+        )
+
+
+def keyset_order(
+    statement: Select, column, tie_breaker, descending: bool = False
+) -> Select:
+    """Order a statement by ``column`` then ``tie_breaker`` so it can be paged
+    with a cursor
+
+    NULLs sort after every value in ascending order and before them in
+    descending order, like a PostgreSQL btree index scanned either way.
+
+    Args:
+        statement (Select): Sqlalchemy select statement
+        column: Sort column
+        tie_breaker: Unique column, usually the primary key
+        descending (bool, optional): Defaults to False.
+
+    Returns:
+        Select: Sorted statement
+    """
+    keyset = Keyset(column, tie_breaker, descending)
+    if descending:
+        order_by = [tie_breaker.desc()]
+        if column is not tie_breaker:
+            order_by.insert(0, column.desc().nulls_first())
+    else:
+        order_by = [tie_breaker.asc()]
+        if column is not tie_breaker:
+            order_by.insert(0, column.asc().nulls_last())
+    statement = statement.order_by(*order_by)
+    _keysets[statement] = keyset
+    return statement
+
+
+def load_fields(statement: Select, entity, fields: Optional[Iterable[str]]) -> Select:
+    """Load only the columns of ``entity`` named in ``fields``
+
+    The primary key and the keyset columns are always loaded so that
+    identity and cursors keep working; names that are not columns, eg.
+    relationships, are left to the caller.
+
+    Args:
+        statement (Select): Select of ``entity``, sorted with keyset_order or
+            not
+        entity: Mapped class
+        fields (Iterable[str], optional): Attribute names, None loads all
+
+    Returns:
+        Select: Statement with a load_only option
+    """
+    if not fields:
+        return statement
+    mapper = inspect(entity)
+    columns = [getattr(entity, name) for name in fields if name in mapper.column_attrs]
+    columns.extend(
+        getattr(entity, mapper.get_property_by_column(column).key)
+        for column in mapper.primary_key
+    )
+    keyset = _keysets.get(statement)
+    if keyset is not None:
+        columns.extend(keyset.columns)
+    loaded = statement.options(load_only(*columns))
+    if keyset is not None:
+        _keysets[loaded] = keyset
+    return loaded
+
+
+def count_statement(statement: Select) -> Select:
+    """Count select of a statement, built once per statement object"""
+    count_select = _count_statements.get(statement)
+    if count_select is None:
+        count_select = select(func.count()).select_from(
+            statement.order_by(None).subquery()
+        )  # pylint: disable=not-callable
+        _count_statements[statement] = count_select
+    return count_select
+
+
+def page_statement(statement: Select) -> Select:
+    """Statement with bound ``offset`` / ``limit``, built once per statement"""
+    page_select = _page_statements.get(statement)
+    if page_select is None:
+        page_select = statement.offset(bindparam("offset", type_=Integer)).limit(
+            bindparam("limit", type_=Integer)
+        )
+        _page_statements[statement] = page_select
+    return page_select
+
+
+def keyset_statement(statement: Select, after_null: Optional[bool]) -> Select:
+    """Statement with bound ``limit`` returning the rows after a cursor
+
+    Args:
+        statement (Select): Statement sorted with keyset_order
+        after_null (bool, optional): None for the first page, otherwise whether
+            the cursor's sort value is NULL
+
+    Returns:
+        Select: Page statement, built once per statement and variant
+    """
+    variants = _keyset_statements.setdefault(statement, {})
+    page_select = variants.get(after_null)
+    if page_select is not None:
+        return page_select
+
+    keyset = _keysets[statement]
+    page_select = statement
+    if after_null is not None:
+        column, tie_breaker = keyset.column, keyset.tie_breaker
+        last_id = bindparam("cursor_id", type_=tie_breaker.type)
+        if len(keyset.columns) == 1:
+            after = (
+                tie_breaker < last_id if keyset.descending else tie_breaker > last_id
+            )
+        elif after_null:
+            # NULLs come last ascending and first descending
+            if keyset.descending:
+                after = or_(
+                    and_(column.is_(None), tie_breaker < last_id), column.is_not(None)
+                )
+            else:
+                after = and_(column.is_(None), tie_breaker > last_id)
+        else:
+            row = tuple_(column, tie_breaker)
+            bound = tuple_(bindparam("cursor_value", type_=column.type), last_id)
+            if keyset.descending:
+                after = row < bound
+            elif keyset.nullable:
+                after = or_(row > bound, column.is_(None))
+            else:
+                after = row > bound
+        page_select = page_select.filter(after)
+    page_select = page_select.limit(bindparam("limit", type_=Integer))
+    variants[after_null] = page_select
+    return page_select
+
+
+def _encode_value(value):
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, (date, datetime, time_of_day)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, raw):
+    python_type = column.type.python_type
+    if raw is None or type(raw) is python_type:
+        return raw
+    if issubclass(python_type, enum.Enum):
+        return python_type[raw]
+    if python_type in (date, datetime, time_of_day):
+        return python_type.fromisoformat(raw)
+    return python_type(raw)
+
+
+def encode_cursor(keyset: Keyset, entity) -> str:
+    """Opaque cursor pointing right after ``entity``"""
+    values = [_encode_value(getattr(entity, column.key)) for column in keyset.columns]
+    payload = [keyset.column.key, keyset.descending, values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(keyset: Keyset, cursor: str) -> list:
+    """Sort values of a cursor
+
+    Raises:
+        HTTPException: The cursor is malformed or was issued for another sort
+
+    Returns:
+        list: sort column value then tie-breaker value
+    """
+    try:
+        key, descending, values = json.loads(base64.urlsafe_b64decode(cursor))
+        if key != keyset.column.key or descending != keyset.descending:
+            raise ValueError("Cursor of another sort order")
+        return [
+            _decode_value(column, value)
+            for column, value in zip(keyset.columns, values, strict=True)
+        ]
+    except (binascii.Error, KeyError, TypeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from e
+
+
+async def fetch_one(db: AsyncSession, statement: Select, params: Optional[dict] = None):
+    """Return the first ORM entity of a select statement or None
+
+    Args:
+        db (AsyncSession): Async database session
+        statement (Select): Sqlalchemy select statement
+        params (dict, optional): Values for bindparam placeholders
+
+    Returns:
+        Any: First entity or None
+    """
+    result = await db.execute(statement, params)
+    return result.unique().scalars().first()
+
+
+async def fetch_all(
+    db: AsyncSession, statement: Select, params: Optional[dict] = None
+) -> list:
+    """Return every ORM entity of a select statement
+
+    Args:
+        db (AsyncSession): Async database session
+        statement (Select): Sqlalchemy select statement
+        params (dict, optional): Values for bindparam placeholders
+
+    Returns:
+        list: Entities
+    """
+    result = await db.execute(statement, params)
+    return list(result.unique().scalars().all())
+
+
+async def count(
+    db: AsyncSession, statement: Select, params: Optional[dict] = None
+) -> int:
+    """Count the rows a select statement would return
+
+    Args:
+        db (AsyncSession): Async database session
+        statement (Select): Sqlalchemy select statement
+        params (dict, optional): Values for bindparam placeholders
+
+    Returns:
+        int: Number of rows
+    """
+    return await db.scalar(count_statement(statement), params)
+
+
+class Explain(Executable, ClauseElement):
+    """``EXPLAIN (FORMAT JSON)`` of a statement, PostgreSQL only
+
+    With ``analyze`` the statement is run and the plan has actual row counts
+    and timings.
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    options = "ANALYZE, FORMAT JSON" if element.analyze else "FORMAT JSON"
+    return f"EXPLAIN ({options}) " + compiler.process(element.statement, **kw)
+
+
+class TotalCounter:
+    """Totals of the list endpoints, exact only when that is cheap
+
+    A total is served from a cache keyed by the statement and its filter
+    values for ``ttl`` seconds. Otherwise, on PostgreSQL, the planner's row
+    estimate is read with ``EXPLAIN`` first: below ``exact_threshold`` rows
+    the statement is counted, above it the estimate is returned as is and
+    flagged as not exact. Other databases are always counted.
+    """
+
+    def __init__(self, exact_threshold: int, ttl: float, maxsize: int):
+        self.exact_threshold = exact_threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._totals: OrderedDict[Hashable, tuple[float, int, bool]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.exact = 0
+        self.estimated = 0
+
+    async def total(
+        self, db: AsyncSession, statement: Select, params: Optional[dict] = None
+    ) -> tuple[int, bool]:
+        """Total rows of a statement
+
+        Returns:
+            tuple[int, bool]: total, whether it is an exact count
+        """
+        key = (statement, tuple(sorted((params or {}).items())))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._totals.get(key)
+            if cached is not None and now - cached[0] < self.ttl:
+                self.hits += 1
+                self._totals.move_to_end(key)
+                return cached[1], cached[2]
+
+        total, exact = None, True
+        if db.get_bind().dialect.name == "postgresql":
+            estimate = await self.estimate(db, statement, params)
+            if estimate >= self.exact_threshold:
+                total, exact = estimate, False
+        if total is None:
+            total = await count(db, statement, params)
+
+        with self._lock:
+            if exact:
+                self.exact += 1
+            else:
+                self.estimated += 1
+            self._totals[key] = (now, total, exact)
+            self._totals.move_to_end(key)
+            while len(self._totals) > self.maxsize:
+                self._totals.popitem(last=False)
+        return total, exact
+
+    async def estimate(
+        self, db: AsyncSession, statement: Select, params: Optional[dict] = None
+    ) -> int:
+        """Planner's row estimate of a statement"""
+        rows = select(literal_column("1")).select_from(
+            statement.order_by(None).subquery()
+        )
+        plan = await db.scalar(Explain(rows), params)
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._totals),
+                "hits": self.hits,
+                "exact": self.exact,
+                "estimated": self.estimated,
+            }
+
+
+total_counter = TotalCounter(
+    exact_threshold=settings.COUNT_EXACT_THRESHOLD,
+    ttl=settings.COUNT_CACHE_TTL_SECONDS,
+    maxsize=settings.COUNT_CACHE_SIZE,
+)
+
+
+class Page(NamedTuple):
+    total: int
+    total_exact: bool
+    items: list
+    next_cursor: Optional[str]
+
+
+async def paginate(
+    db: AsyncSession,
+    statement: Select,
+    offset: int,
+    limit: int,
+    params: Optional[dict] = None,
+    cursor: Optional[str] = None,
+) -> Page:
+    """Total a select statement and fetch one page of it
+
+    With a ``cursor`` the page starts right after the row it points to and
+    ``offset`` is ignored, so deep pages cost the same as the first one. The
+    statement must be sorted with keyset_order for cursors to be returned.
+    The total comes from ``total_counter`` and may be an estimate.
+
+    Args:
+        db (AsyncSession): Async database session
+        statement (Select): Filtered and sorted select statement
+        offset (int): Rows to skip
+        limit (int): Page size
+        params (dict, optional): Values for bindparam placeholders
+        cursor (str, optional): next_cursor of the previous page
+
+    Returns:
+        Page: total, whether it is exact, entities of the page, cursor of the
+            next page or None on the last page
+    """
+    total, total_exact = await total_counter.total(db, statement, params)
+    keyset = _keysets.get(statement)
+    # One extra row tells whether there is a next page
+    page_params = {**(params or {}), "limit": limit + 1}
+    if cursor is not None and keyset is not None:
+        values = decode_cursor(keyset, cursor)
+        page_params["cursor_id"] = values[-1]
+        if len(values) > 1:
+            page_params["cursor_value"] = values[0]
+        items = await fetch_all(
+            db, keyset_statement(statement, values[0] is None), page_params
+        )
+    else:
+        page_params["offset"] = offset
+        items = await fetch_all(db, page_statement(statement), page_params)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        if keyset is not None:
+            next_cursor = encode_cursor(keyset, items[-1])
+    return Page(total, total_exact, items, next_cursor)
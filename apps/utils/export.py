@@ -0,0 +1,114 @@
+import csv
+import io
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.common.enum import ExportFormatEnum
+from apps.config import settings
+from apps.utils.sparse_fields import sparse_schema
+
+MEDIA_TYPES = {
+    ExportFormatEnum.CSV: "text/csv",
+    ExportFormatEnum.NDJSON: "application/x-ndjson",
+}
+
+
+def csv_columns(schema: type[BaseModel], prefix: str = "") -> list[str]:
+    """Column names of a schema, nested models flattened to ``user.first_name``"""
+    columns = []
+    for name, info in schema.model_fields.items():
+        if isinstance(info.annotation, type) and issubclass(info.annotation, BaseModel):
+            columns.extend(csv_columns(info.annotation, f"{prefix}{name}."))
+        else:
+            columns.append(f"{prefix}{name}")
+    return columns
+
+
+def _flatten(row: dict, prefix: str = "") -> dict:
+    flat = {}
+    for name, value in row.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{name}."))
+        else:
+            flat[f"{prefix}{name}"] = value
+    return flat
+
+
+async def stream_rows(
+    db: AsyncSession,
+    statement: Select,
+    params: dict,
+    schema: type[BaseModel],
+    export_format: ExportFormatEnum,
+    batch_size: int,
+) -> AsyncIterator[str]:
+    """Serialized rows of ``statement``, one chunk per ``batch_size`` rows
+
+    Rows are read through a server-side cursor and each batch is expunged once
+    written, so memory does not grow with the number of rows.
+    """
+    if export_format == ExportFormatEnum.CSV:
+        columns = csv_columns(schema)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        yield buffer.getvalue()
+
+    result = await db.stream(statement.execution_options(yield_per=batch_size), params)
+    async for partition in result.scalars().partitions():
+        items = [
+            schema.model_validate(entity, from_attributes=True) for entity in partition
+        ]
+        if export_format == ExportFormatEnum.CSV:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(_flatten(item.model_dump(mode="json")) for item in items)
+            chunk = buffer.getvalue()
+        else:
+            chunk = "".join(f"{item.model_dump_json()}\n" for item in items)
+        for entity in partition:
+            db.expunge(entity)
+        yield chunk
+
+
+def export_response(
+    db: AsyncSession,
+    statement: Select,
+    params: dict,
+    schema: type[BaseModel],
+    fields: Optional[tuple[str, ...]],
+    export_format: ExportFormatEnum,
+    filename: str,
+) -> StreamingResponse:
+    """Stream every row of a list statement as CSV or NDJSON
+
+    Args:
+        db (AsyncSession): Session of the request, open until the response
+            has been sent
+        statement (Select): Filtered and sorted statement, without a limit
+        params (dict): Bound parameters of the filters
+        schema (type[BaseModel]): Response schema of one row
+        fields (tuple[str, ...], optional): parse_fields of the request
+        export_format (ExportFormatEnum): csv or ndjson
+        filename (str): Download name, without the extension
+
+    Returns:
+        StreamingResponse: attachment streamed as it is read
+    """
+    if fields:
+        schema = sparse_schema(schema, fields)
+    return StreamingResponse(
+        stream_rows(
+            db, statement, params, schema, export_format, settings.EXPORT_BATCH_SIZE
+        ),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{filename}.{export_format.value}"'
+            )
+        },
+    )
@@ -0,0 +1,86 @@
+from functools import lru_cache
+from typing import Any, Optional, get_args
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel, ConfigDict, create_model
+
+
+def parse_fields(
+    fields: Optional[str], schema: type[BaseModel]
+) -> Optional[tuple[str, ...]]:
+    """Parse a ``?fields=id,first_name`` query param
+
+    Args:
+        fields (str, optional): Comma separated field names
+        schema (type[BaseModel]): Response schema of one item
+
+    Raises:
+        HTTPException: Unknown field
+
+    Returns:
+        tuple[str, ...]: Requested fields in schema order, None for all fields
+    """
+    if not fields:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - schema.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    return tuple(name for name in schema.model_fields if name in names) or None
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(
+    schema: type[BaseModel], fields: tuple[str, ...], items_key: Optional[str] = None
+) -> type[BaseModel]:
+    """``schema`` with only ``fields``
+
+    With ``items_key``, ``schema`` is a page and ``fields`` are kept on each
+    item of its ``items_key`` list instead.
+    """
+    if items_key is None:
+        definitions = {
+            name: (schema.model_fields[name].annotation, schema.model_fields[name])
+            for name in fields
+        }
+    else:
+        definitions = {
+            name: (info.annotation, info) for name, info in schema.model_fields.items()
+        }
+        (item_schema,) = get_args(schema.model_fields[items_key].annotation)
+        definitions[items_key] = (list[sparse_schema(item_schema, fields)], ...)
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions,
+    )
+
+
+def sparse_response(
+    schema: type[BaseModel],
+    fields: tuple[str, ...],
+    content: Any,
+    items_key: Optional[str] = None,
+) -> Response:
+    """JSON response of ``content`` with only the requested fields
+
+    It replaces the endpoint's ``response_model``, which would reject the
+    missing fields, and serializes straight from the ORM objects.
+
+    Args:
+        schema (type[BaseModel]): response_model of the endpoint
+        fields (tuple[str, ...]): parse_fields of the request
+        content (Any): Entity, or page dict with ``items_key``
+        items_key (str, optional): Key of the items of a page, eg. users
+
+    Returns:
+        Response: application/json response
+    """
+    model = sparse_schema(schema, fields, items_key)
+    return Response(
+        content=model.model_validate(content, from_attributes=True).model_dump_json(),
+        media_type="application/json",
+    )
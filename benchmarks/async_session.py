@@ -0,0 +1,81 @@
+"""Compare the async session path against the legacy sync session path
+
+Both variants serve the same filtered, sorted and paginated user listing
+against the database configured in settings. The sync variant reproduces the
+old ``get_db`` / ``Session.query`` route, which Starlette runs in its
+threadpool; the async variant is the real ``/api/user/get`` route.
+
+Usage:
+    python -m benchmarks.async_session --requests 2000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.orm import Session
+
+from apps.apis.v1.users.filter_sort import Filter, Sort
+from apps.config.db.conn import get_db
+from apps.core.models.users import Users
+from apps.core.schemas.user import UserFilterSchema, UserResponseSchemaTotal
+from benchmarks.utils import print_table, run_load
+from main import app as async_app
+
+sync_app = FastAPI()
+
+
+@sync_app.get("/api/user/get", response_model=UserResponseSchemaTotal)
+def legacy_get_user_sort_filter(
+    offset: int = 0,
+    limit: int = 10,
+    user_filter_params: UserFilterSchema = Depends(),
+    db: Session = Depends(get_db),
+):
+    params = Filter().user_params(
+        first_name=user_filter_params.first_name,
+        email=user_filter_params.email,
+        role=user_filter_params.role,
+    )
+    query = Filter().filter_users(db.query(Users), **params).params(**params)
+    query = Sort().sorting_users(
+        query=query, sort=user_filter_params.sort, order=user_filter_params.order
+    )
+    return {
+        "total_count": query.with_entities(Users.id).count(),
+        "users": query.offset(offset).limit(limit).all(),
+    }
+
+
+async def bench(app: FastAPI, path: str, requests: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def call():
+            response = await client.get(path)
+            response.raise_for_status()
+
+        await run_load(
+            call, requests=min(requests, concurrency), concurrency=concurrency
+        )
+        return await run_load(call, requests=requests, concurrency=concurrency)
+
+
+async def main(args):
+    path = f"/api/user/get?limit={args.limit}"
+    rows = []
+    for name, app in (("sync", sync_app), ("async", async_app)):
+        result = await bench(app, path, args.requests, args.concurrency)
+        rows.append({"path": name, **result})
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--limit", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
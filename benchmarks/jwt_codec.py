@@ -0,0 +1,85 @@
+"""Token encode/decode throughput per codec backend and algorithm
+
+Asymmetric algorithms use throwaway keys generated for the run. Backends whose
+library is not installed are skipped.
+
+Usage:
+    python -m benchmarks.jwt_codec --seconds 2
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+from apps.security.tokens import CODECS
+from benchmarks.utils import print_table
+
+CLAIMS = {"id": 1, "email": "user@example.com", "role": "STUDENT"}
+
+
+def generate_key_pair(algorithm: str) -> tuple[str, str]:
+    if algorithm.startswith("ES"):
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem.decode(), public_pem.decode()
+
+
+def rate(operation, seconds: float) -> float:
+    operations = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        operation()
+        operations += 1
+    return operations / (time.perf_counter() - started)
+
+
+def main(args):
+    claims = {**CLAIMS, "exp": datetime.now(timezone.utc) + timedelta(hours=1)}
+    rows = []
+    for algorithm in args.algorithms:
+        if algorithm.startswith("HS"):
+            keys = ("bench-secret-bench-secret-bench-secret",) * 2
+        else:
+            keys = generate_key_pair(algorithm)
+
+        for name in args.backends:
+            try:
+                codec = CODECS[name](algorithm, *keys, key_id="bench")
+            except ValueError as e:
+                print(f"skipping {name}: {e}")
+                continue
+            token = codec.encode(claims)
+            rows.append(
+                {
+                    "backend": name,
+                    "algorithm": algorithm,
+                    "encode_per_sec": round(
+                        rate(lambda: codec.encode(claims), args.seconds)
+                    ),
+                    "decode_per_sec": round(
+                        rate(lambda: codec.decode(token), args.seconds)
+                    ),
+                }
+            )
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="*", default=list(CODECS))
+    parser.add_argument("--algorithms", nargs="*", default=["HS256", "RS256", "ES256"])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    main(parser.parse_args())
@@ -0,0 +1,177 @@
+"""Query plans of the list endpoints, before and after an index migration
+
+Builds the first page statement of each list endpoint with the same filters
+and sorts as the routes and prints its plan: total cost, actual time with
+``--analyze``, and how every table is read. Run it against a database with
+production-like volumes, save the plans, apply the migration and compare:
+
+Usage:
+    python -m benchmarks.list_plans --save plans_before.json
+    alembic upgrade heads
+    python -m benchmarks.list_plans --compare plans_before.json
+
+Only reads are issued, but ``--analyze`` runs every statement.
+"""
+
+import argparse
+import asyncio
+import json
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from apps.apis.v1.users.filter_sort import Filter, Sort
+from apps.common.enum import (
+    AppointmentStatusEnum,
+    RoleFilterEnum,
+    TransactionMethodEnum,
+)
+from apps.config.db.base import async_session_maker
+from apps.core.models.transaction import Transaction
+from apps.core.models.users import InstructorAvailability, StudentAppointment, Users
+from apps.core.schemas.appointment import AppointmentFilterSchema
+from apps.core.schemas.instructor_availability import (
+    InstructorAvailabilityFilterSchema,
+)
+from apps.core.schemas.transaction import TransactionFilterSchema
+from apps.core.schemas.user import UserFilterSchema
+from apps.utils.database_utils import Explain
+from benchmarks.utils import print_table
+
+
+def users(**filters):
+    data = UserFilterSchema(**filters)
+    params = Filter().user_params(**data.model_dump(exclude={"sort", "order"}))
+    statement = Sort().sorting_users(
+        Filter().filter_users(select(Users), **params), data.sort, data.order
+    )
+    return statement, params
+
+
+def appointments(status=(AppointmentStatusEnum.PENDING,), **filters):
+    data = AppointmentFilterSchema(**filters)
+    params = Filter().appointment_params(**data.model_dump(), status=status)
+    statement = Sort().sorting_appointment(
+        Filter().filter_appointment(select(StudentAppointment), **params),
+        data.sort,
+        data.order,
+    )
+    return statement, params
+
+
+def instructor_slots(**filters):
+    data = InstructorAvailabilityFilterSchema(**filters)
+    params = Filter().instructor_availability_params(**data.model_dump())
+    statement = Sort().sort_instructor_availability(
+        Filter().filter_instructor_availability(
+            select(InstructorAvailability), **params
+        ),
+        data.sort,
+        data.order,
+    )
+    return statement, params
+
+
+def transactions(method=(TransactionMethodEnum.CASH,), **filters):
+    data = TransactionFilterSchema(**filters)
+    params = Filter().transaction_params(**data.model_dump(), method=method)
+    query = select(Transaction).options(
+        joinedload(Transaction.user).load_only(
+            Users.first_name, Users.middle_name, Users.last_name
+        )
+    )
+    statement = Sort().sort_transaction(
+        Filter().filter_transaction(query, **params), data.sort, data.order
+    )
+    return statement, params
+
+
+ENDPOINTS = {
+    "users": lambda: users(role=RoleFilterEnum.ALL),
+    "users?role=STUDENT": lambda: users(role=RoleFilterEnum.STUDENT),
+    "users?sort=FIRST_NAME": lambda: users(sort="FIRST_NAME", order="ASC"),
+    "users?first_name=ann": lambda: users(first_name="ann"),
+    "users?city=aus": lambda: users(city="aus"),
+    "appointments": lambda: appointments(),
+    "appointments?student_id=1": lambda: appointments(student_id=1),
+    "appointments?instructor_id=1": lambda: appointments(instructor_id=1),
+    "instructor_slots": lambda: instructor_slots(),
+    "instructor_slots?instructor_id=1": lambda: instructor_slots(instructor_id=1),
+    "transactions": lambda: transactions(),
+    "transactions?user_id=1": lambda: transactions(user_id=1),
+}
+
+
+def scans(plan: dict) -> list[str]:
+    """How each table of a plan is read, eg. 'Index Scan using ix on users'"""
+    found = []
+    if "Relation Name" in plan:
+        access = plan["Node Type"]
+        if "Index Name" in plan:
+            access += f" using {plan['Index Name']}"
+        found.append(f"{access} on {plan['Relation Name']}")
+    for child in plan.get("Plans", []):
+        found.extend(scans(child))
+    return found
+
+
+async def explain(limit: int, analyze: bool) -> dict:
+    plans = {}
+    async with async_session_maker() as db:
+        for name, build in ENDPOINTS.items():
+            statement, params = build()
+            result = await db.scalar(
+                Explain(statement.limit(limit), analyze=analyze), params
+            )
+            if isinstance(result, str):
+                result = json.loads(result)
+            plan = result[0]["Plan"]
+            plans[name] = {
+                "cost": plan["Total Cost"],
+                "ms": plan.get("Actual Total Time"),
+                "scans": scans(plan),
+            }
+        await db.rollback()
+    return plans
+
+
+async def main(args):
+    plans = await explain(args.limit, args.analyze)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(plans, f, indent=2)
+
+    before = {}
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)
+
+    rows = []
+    for name, plan in plans.items():
+        row = {"endpoint": name}
+        if before:
+            old = before.get(name, {})
+            row["cost_before"] = old.get("cost")
+            row["ms_before"] = old.get("ms")
+        row["cost"] = plan["cost"]
+        row["ms"] = plan["ms"]
+        rows.append(row)
+    print_table(rows)
+
+    print()
+    for name, plan in plans.items():
+        print(name)
+        if before:
+            for scan in before.get(name, {}).get("scans", []):
+                print(f"  before: {scan}")
+        for scan in plan["scans"]:
+            print(f"  {'after:  ' if before else ''}{scan}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--analyze", action="store_true")
+    parser.add_argument("--save", help="write the plans to this JSON file")
+    parser.add_argument("--compare", help="plans saved by an earlier --save")
+    asyncio.run(main(parser.parse_args()))
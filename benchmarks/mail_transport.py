@@ -0,0 +1,81 @@
+"""Email throughput of a new FastMail per message versus the pooled transport
+
+Sends real messages to an SMTP sink, by default the MailHog service of
+docker-compose.yml (``docker compose up mailhog``, UI on :8025).
+
+Usage:
+    python -m benchmarks.mail_transport --host localhost --port 1025 \\
+        --messages 500 --concurrency 10
+"""
+
+import argparse
+import asyncio
+
+from fastapi_mail import ConnectionConfig, FastMail, MessageSchema
+
+from apps.services.mail_transport import MailTemplates, SMTPTransport
+from apps.services.send_email import TEMPLATE_FOLDER
+from benchmarks.utils import print_table, run_load
+
+TEMPLATE = "otp_template.html"
+BODY = {"otp": "1234"}
+
+
+async def main(args):
+    config = ConnectionConfig(
+        MAIL_USERNAME="",
+        MAIL_PASSWORD="",
+        MAIL_FROM="benchmark@example.com",
+        MAIL_PORT=args.port,
+        MAIL_SERVER=args.host,
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+        TEMPLATE_FOLDER=TEMPLATE_FOLDER,
+    )
+
+    async def fastmail():
+        message = MessageSchema(
+            subject="Benchmark",
+            recipients=["user@example.com"],
+            subtype="html",
+            template_body=BODY,
+        )
+        await FastMail(config).send_message(message, template_name=TEMPLATE)
+
+    transport = SMTPTransport(
+        config=config,
+        templates=MailTemplates(TEMPLATE_FOLDER),
+        pool_size=args.concurrency,
+        max_messages=args.max_messages,
+        idle_timeout=60,
+    )
+    transport.start()
+
+    async def pooled():
+        await transport.send(
+            subject="Benchmark",
+            receiver=["user@example.com"],
+            body=BODY,
+            template_name=TEMPLATE,
+        )
+
+    rows = []
+    for name, call in (("fastmail_per_message", fastmail), ("pooled", pooled)):
+        result = await run_load(call, args.messages, args.concurrency)
+        rows.append({"transport": name, **result})
+    rows[-1]["connections"] = transport.connections_opened
+    rows[0]["connections"] = args.messages
+    await transport.close()
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--max-messages", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
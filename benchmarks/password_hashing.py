@@ -0,0 +1,82 @@
+"""Report password hashes per second per core for each hashing setting
+
+Every setting is timed on a single thread, so the figures are per core: divide
+the login throughput target by ``verify_per_sec`` to get the number of cores
+hashing needs. argon2 settings are skipped unless argon2-cffi is installed.
+
+Usage:
+    python -m benchmarks.password_hashing --bcrypt-rounds 10 11 12 13 \\
+        --argon2 3:65536:4 2:19456:1 --seconds 3
+"""
+
+import argparse
+import time
+
+from passlib.hash import argon2
+
+from apps.security.hashing import build_context
+from benchmarks.utils import print_table
+
+PASSWORD = "correct horse battery staple"
+
+
+def measure(context, seconds: float) -> dict:
+    hashed = context.hash(PASSWORD)
+
+    def rate(operation) -> float:
+        operations = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            operation()
+            operations += 1
+        return operations / (time.perf_counter() - started)
+
+    hash_rate = rate(lambda: context.hash(PASSWORD))
+    verify_rate = rate(lambda: context.verify(PASSWORD, hashed))
+    return {
+        "hash_per_sec": round(hash_rate, 2),
+        "verify_per_sec": round(verify_rate, 2),
+        "verify_ms": round(1000 / verify_rate, 1),
+    }
+
+
+def main(args):
+    rows = []
+    for rounds in args.bcrypt_rounds:
+        context = build_context(scheme="bcrypt", bcrypt_rounds=rounds)
+        rows.append(
+            {"setting": f"bcrypt rounds={rounds}", **measure(context, args.seconds)}
+        )
+
+    if args.argon2 and not argon2.has_backend():
+        print("argon2-cffi is not installed, skipping argon2 settings")
+    elif args.argon2:
+        for setting in args.argon2:
+            time_cost, memory_cost, parallelism = (int(v) for v in setting.split(":"))
+            context = build_context(
+                scheme="argon2",
+                argon2_time_cost=time_cost,
+                argon2_memory_cost=memory_cost,
+                argon2_parallelism=parallelism,
+            )
+            rows.append(
+                {
+                    "setting": f"argon2 t={time_cost} m={memory_cost} p={parallelism}",
+                    **measure(context, args.seconds),
+                }
+            )
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bcrypt-rounds", type=int, nargs="*", default=[10, 11, 12])
+    parser.add_argument(
+        "--argon2",
+        nargs="*",
+        default=["3:65536:4"],
+        help="time_cost:memory_cost_kib:parallelism",
+    )
+    parser.add_argument("--seconds", type=float, default=2.0)
+    main(parser.parse_args())
@@ -0,0 +1,104 @@
+"""Measure per-request statement overhead of the filtered user listing
+
+Builds and compiles the ``/api/user/get`` statements for a rotating set of
+filter values against the asyncpg dialect, without a database, comparing:
+
+- ``no_cache``: build the statement and compile it from scratch
+- ``compiled_cache``: build the statement, look it up in SQLAlchemy's
+  compiled cache (what every request paid before the statement cache)
+- ``statement_cache``: reuse the statement from ``statement_cache``, then
+  look it up in the compiled cache
+
+Usage:
+    python -m benchmarks.statement_cache --iterations 20000
+"""
+
+import argparse
+import itertools
+import time
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+from sqlalchemy.util import LRUCache
+
+from apps.apis.v1.users.filter_sort import Filter, Sort
+from apps.common.enum import RoleFilterEnum
+from apps.core.models.users import Users
+from apps.utils.database_utils import StatementCache, page_statement
+from benchmarks.utils import percentile, print_table
+
+FILTERS = [
+    {"first_name": "ann", "role": RoleFilterEnum.ALL},
+    {"first_name": "bob", "role": RoleFilterEnum.ALL},
+    {"email": "ann@example.com", "role": RoleFilterEnum.NOT_STUDENT},
+    {"city": "austin", "state": "tx", "role": RoleFilterEnum.ALL},
+    {"city": "boston", "state": "ma", "role": RoleFilterEnum.ALL},
+]
+
+
+def build(params: dict, sort: str, order: str):
+    query = Filter().filter_users(select(Users), **params)
+    return page_statement(Sort().sorting_users(query=query, sort=sort, order=order))
+
+
+def run(name: str, iterations: int, prepare, use_compiled_cache: bool = True) -> dict:
+    dialect = asyncpg_dialect()
+    compiled_cache = LRUCache(1200)
+    hits = 0
+    timings = []
+    filters = itertools.cycle(FILTERS)
+
+    for _ in range(iterations):
+        params = Filter().user_params(**next(filters))
+        started = time.perf_counter()
+        statement = prepare(params)
+        if use_compiled_cache:
+            *_, cache_hit = statement._compile_w_cache(
+                dialect, compiled_cache=compiled_cache, column_keys=[]
+            )
+            hits += cache_hit is dialect.CACHE_HIT
+        else:
+            statement.compile(dialect=dialect)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+
+    return {
+        "variant": name,
+        "iterations": iterations,
+        "mean_us": round(sum(timings) / len(timings), 1),
+        "p50_us": round(percentile(timings, 50), 1),
+        "p99_us": round(percentile(timings, 99), 1),
+        "compiled_hit_rate": round(hits / iterations, 4),
+    }
+
+
+def main(args):
+    statement_cache = StatementCache(maxsize=512)
+
+    def cached(params):
+        return statement_cache.get(
+            ("users", tuple(sorted(params)), "created_at", "desc"),
+            lambda: build(params, "created_at", "desc"),
+        )
+
+    rows = [
+        run(
+            "no_cache",
+            args.iterations,
+            lambda p: build(p, "created_at", "desc"),
+            use_compiled_cache=False,
+        ),
+        run(
+            "compiled_cache",
+            args.iterations,
+            lambda p: build(p, "created_at", "desc"),
+        ),
+        run("statement_cache", args.iterations, cached),
+    ]
+    print_table(rows)
+    print(f"statement cache: {statement_cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,133 @@
+"""Latency of the trigram user search versus the prefix user filters
+
+Seeds ``--users`` users with profiles into the PostgreSQL database configured
+in settings, which must have pg_trgm and the search indexes, then runs the
+same queries through ``search_users`` and through the ``first_name`` /
+``city`` filters of ``/api/user/get``. Seeded rows use the
+``@search-bench.example`` email domain and are removed by ``--cleanup``.
+
+Usage:
+    python -m benchmarks.user_search --users 1000000 --requests 500
+    python -m benchmarks.user_search --cleanup
+"""
+
+import argparse
+import asyncio
+import itertools
+
+from sqlalchemy import select, text
+
+from apps.apis.v1.users.filter_sort import Filter
+from apps.common.enum import RoleFilterEnum
+from apps.config.db.base import async_session_maker
+from apps.core.models.users import Users
+from apps.services.user_search import search_users
+from benchmarks.utils import print_table, run_load
+
+DOMAIN = "search-bench.example"
+FIRST_NAMES = ["olivia", "liam", "emma", "noah", "amelia", "oliver", "sofia"]
+LAST_NAMES = ["smith", "johnson", "garcia", "miller", "davis", "martinez"]
+CITIES = ["austin", "boston", "chicago", "denver", "seattle", "portland"]
+QUERIES = ["olivia", "garcai", "emma mil", "denver", "seatle", "liam@", "5550001"]
+
+SEED_USERS = """
+INSERT INTO users (first_name, last_name, email, password, is_verified, role,
+                   created_at, updated_at, is_active, is_deleted)
+SELECT first_names[1 + i % cardinality(first_names)] || (i % 997),
+       last_names[1 + i % cardinality(last_names)],
+       'user' || i || '@' || CAST(:domain AS text), '', true, 'STUDENT',
+       now(), now(), true, false
+FROM generate_series(1, CAST(:count AS integer)) AS i,
+     CAST(:first_names AS text[]) AS first_names,
+     CAST(:last_names AS text[]) AS last_names
+"""
+
+SEED_PROFILES = """
+INSERT INTO user_profiles (user_id, city, cell_phone, created_at, updated_at,
+                           is_active, is_deleted)
+SELECT id, cities[1 + id % cardinality(cities)], 5550000000 + id, now(),
+       now(), true, false
+FROM users, CAST(:cities AS text[]) AS cities
+WHERE email LIKE '%@' || CAST(:domain AS text)
+"""
+
+
+async def seed(count: int):
+    async with async_session_maker() as db:
+        existing = await db.scalar(
+            text(
+                "SELECT count(*) FROM users"
+                " WHERE email LIKE '%@' || CAST(:domain AS text)"
+            ),
+            {"domain": DOMAIN},
+        )
+        if existing >= count:
+            return
+        await cleanup()
+        await db.execute(
+            text(SEED_USERS),
+            {
+                "first_names": FIRST_NAMES,
+                "last_names": LAST_NAMES,
+                "domain": DOMAIN,
+                "count": count,
+            },
+        )
+        await db.execute(text(SEED_PROFILES), {"cities": CITIES, "domain": DOMAIN})
+        await db.execute(text("ANALYZE users, user_profiles"))
+        await db.commit()
+
+
+async def cleanup():
+    async with async_session_maker() as db:
+        bench_users = (
+            "SELECT id FROM users WHERE email LIKE '%@' || CAST(:domain AS text)"
+        )
+        await db.execute(
+            text(f"DELETE FROM user_profiles WHERE user_id IN ({bench_users})"),
+            {"domain": DOMAIN},
+        )
+        await db.execute(
+            text(f"DELETE FROM users WHERE id IN ({bench_users})"),
+            {"domain": DOMAIN},
+        )
+        await db.commit()
+
+
+async def main(args):
+    if args.cleanup:
+        await cleanup()
+        return
+    await seed(args.users)
+
+    queries = itertools.cycle(QUERIES)
+
+    async def trigram():
+        async with async_session_maker() as db:
+            await search_users(db, next(queries), args.limit)
+
+    async def prefix():
+        query = next(queries)
+        async with async_session_maker() as db:
+            for key in ("first_name", "city"):
+                params = Filter().user_params(
+                    **{key: query, "role": RoleFilterEnum.ALL}
+                )
+                statement = Filter().filter_users(select(Users.id), **params)
+                await db.execute(statement.limit(args.limit), params)
+
+    rows = []
+    for name, call in (("prefix_filter", prefix), ("trigram_search", trigram)):
+        result = await run_load(call, args.requests, args.concurrency)
+        rows.append({"path": name, "users": args.users, **result})
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--cleanup", action="store_true")
+    asyncio.run(main(parser.parse_args()))
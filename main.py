@@ -1,4 +1,6 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -15,17 +17,63 @@ from apps.apis.v1.appointment.instructor_availability import (
 )
 from apps.apis.v1.accounts.transaction_routes import router as transaction_router
 from apps.apis.v1.users.school_routes import router as school_router
+from apps.apis.v1.admin.metrics_routes import router as admin_metrics_router
+from apps.apis.v1.notifications.routes import router as notification_router
 
 from apps.config import settings
+from apps.config.db.base import async_session_maker
+from apps.config.db.routing import pin_primary_after_write
+from apps.config.db.telemetry import track_request_queries
+from apps.security.hashing import password_hasher
+from apps.security.email_filter import email_filter, sync_email_filter
+from apps.security.otp_store import purge_expired_otps
+from apps.security.revocation import revocation_store, sync_revocations
+from apps.security.tokens import jwks, token_codec
+from apps.services.email_outbox import outbox_worker
+from apps.services.send_email import mail_transport
 from fastapi.openapi.docs import get_swagger_ui_html
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with async_session_maker() as db:
+        await revocation_store.load(db)
+        if settings.EMAIL_FILTER_ENABLED:
+            await email_filter.load(db)
+    revocation_sync = asyncio.create_task(
+        sync_revocations(async_session_maker, settings.REVOCATION_SYNC_INTERVAL_SECONDS)
+    )
+    email_filter_sync = (
+        asyncio.create_task(
+            sync_email_filter(
+                async_session_maker, settings.EMAIL_FILTER_SYNC_INTERVAL_SECONDS
+            )
+        )
+        if settings.EMAIL_FILTER_ENABLED
+        else None
+    )
+    otp_purge = asyncio.create_task(
+        purge_expired_otps(async_session_maker, settings.OTP_PURGE_INTERVAL_SECONDS)
+    )
+    mail_transport.start()
+    email_outbox = asyncio.create_task(outbox_worker.run(async_session_maker))
+    yield
+    email_outbox.cancel()
+    await mail_transport.close()
+    otp_purge.cancel()
+    revocation_sync.cancel()
+    if email_filter_sync is not None:
+        email_filter_sync.cancel()
+    password_hasher.shutdown()
+
+
 def get_application():
     app = FastAPI(
         title=settings.PROJECT_NAME,
         debug=settings.DEBUG,
         version=settings.VERSION,
         description=settings.PROJECT_DESCRIPTION,
+        lifespan=lifespan,
     )
 
     if not os.path.exists(settings.MEDIA_PATH):
@@ -54,6 +102,9 @@ def get_application():
         allow_headers=["*"],
     )
 
+    app.middleware("http")(pin_primary_after_write)
+    app.middleware("http")(track_request_queries)
+
     return app
 
 
@@ -79,8 +130,19 @@ app.include_router(
 )
 app.include_router(transaction_router, prefix="/api", tags=["account"])
 app.include_router(school_router, prefix="/api", tags=["school"])
+app.include_router(admin_metrics_router, prefix="/api", tags=["admin"])
+app.include_router(notification_router, prefix="/api", tags=["notifications"])
 
 
 @app.get("/")
 async def home():
     return {"status": f"{settings.APP_ENV} is runnings"}
+
+
+@app.get("/.well-known/jwks.json")
+async def jwks_document():
+    """Public keys verifying the tokens this API issues
+
+    Empty while tokens are signed with the shared HMAC secret.
+    """
+    return jwks(token_codec)
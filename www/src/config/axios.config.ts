@@ -31,6 +31,27 @@ instance.interceptors.request.use(
   }
 );
 
+// Refresh tokens are rotated: every refresh returns a new refresh token and
+// revokes the one sent, so requests failing with 401 at the same time share
+// a single refresh instead of replaying the same token
+let refreshing: Promise<string> | null = null;
+
+const refreshAccessToken = (refreshToken: string): Promise<string> => {
+  if (!refreshing) {
+    refreshing = axios
+      .post(`${API_URL}/auth/token/refresh-token?refresh_token=${refreshToken}`)
+      .then((response) => {
+        localStorage.setItem("access_token", response.data.access_token);
+        localStorage.setItem("refresh_token", response.data.refresh_token);
+        return response.data.access_token;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+};
+
 instance.interceptors.response.use(
   (response) => {
     return response;
@@ -41,16 +62,13 @@ instance.interceptors.response.use(
       originalRequest._retry = true;
       const refreshToken = localStorage.getItem("refresh_token");
       if (refreshToken) {
-        const response = await axios.post(
-          `${API_URL}/auth/token/refresh-token?refresh_token=${refreshToken}`
-        );
-        if (response.status === 200) {
-          localStorage.setItem("access_token", response.data.access_token);
-          return instance(originalRequest);
-        }
-        if (response.status === 401) {
+        try {
+          await refreshAccessToken(refreshToken);
+        } catch (refreshError) {
           redirectToLogin();
+          return Promise.reject(refreshError);
         }
+        return instance(originalRequest);
       }
     }
     if (error.response.status === 403) {
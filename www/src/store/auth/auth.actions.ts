@@ -203,12 +203,14 @@ export const forgetPasswordReset =
 
 /**
  * Verify the OTP (One Time Password) by sending it to the server.
+ * @param {string} email - The email the OTP was sent to.
  * @param {string} otp - The One Time Password to verify.
  * @param {Dispatch} dispatch - The dispatch function from Redux.
  * @returns None
  */
 export const verifyOTP =
-  (otp: string, cb: () => void) => async (dispatch: Dispatch) => {
+  (email: string, otp: string, cb: () => void) =>
+  async (dispatch: Dispatch) => {
     try {
       dispatch({
         type: AuthType.VERIFY_OTP_START,
@@ -221,6 +223,7 @@ export const verifyOTP =
       };
 
       const formData = new FormData();
+      formData.append("email", email);
       formData.append("otp", otp);
 
       const { data } = await axiosConfig.post(
@@ -251,7 +254,7 @@ export const verifyOTP =
 /**
  * Resets the password by sending a POST request to the server with the new password.
  * Dispatches actions based on the success or failure of the password reset operation.
- * @param {any} formValue - The form data containing the new password.
+ * @param {any} formValue - The form data containing the email, the OTP and the new password.
  * @param {any} cb - Callback function to be executed after the password reset operation.
  * @param {any} dispatch - The dispatch function provided by Redux.
  * @returns None
@@ -74,6 +74,7 @@ const ResetPasswordView = () => {
         ) => {
           try {
             const formData = {
+              email: values?.email,
               otp: values?.otp,
               new_password: values?.password,
               confirm_password: values?.password,
@@ -210,7 +211,7 @@ const ResetPasswordView = () => {
                       color="primary"
                       onClick={() => {
                         dispatch(
-                          verifyOTP(values?.otp, () => {
+                          verifyOTP(values?.email, values?.otp, () => {
                             setFieldValue("activeStep", 3);
                           })
                         );